@@ -23,6 +23,8 @@ from .base import *
 from .tag import *
 from .trop_cyclone import *
 from .tc_tracks import *
+from .tc_tracks_packed import *
 from .tc_tracks_forecast import *
 from .tc_rainfield import *
+from .tc_windfield_cache import *
 from .storm_europe import *
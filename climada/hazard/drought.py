@@ -26,6 +26,8 @@ __all__ = ['Drought']
 
 import os
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 import numpy as np
 import xarray as xr
 import pandas as pd
@@ -159,8 +161,13 @@ class Drought(Hazard):
         return spei_matrix
 
 
-    def setup(self):
-        """Set up the hazard drought"""
+    def setup(self, n_threads=1):
+        """Set up the hazard drought
+
+        Parameters:
+            n_threads (int, optional): number of threads detecting the drought
+                events of blocks of centroids. Default: 1
+        """
         #self.tag = TagHazard(HAZ_TYPE, 'TEST')
 
         try:
@@ -200,7 +207,8 @@ class Drought(Hazard):
         spei_3d = self.__read_indices_spei(dataset)
         spei_2d = self.__traslate_matrix(spei_3d)
 
-        intensity_matrix_min = self.__get_intensity_from_2d(spei_2d, self.intensity_definition)
+        intensity_matrix_min = self.__get_intensity_from_2d(spei_2d, self.intensity_definition,
+                                                            n_threads)
         self.hazard_def(intensity_matrix_min)
 
         return self
@@ -210,33 +218,15 @@ class Drought(Hazard):
         """return hazard intensity as a simple threshold on the SPEI values
         Parameters: see read_indices_spei, just call before
         Returns: matrix
-        sparse.csr_matrix
+        np.array (timesteps x centroids)
         """
-
-        intensity_thres = self.threshold
-
         n_centroids = spei_3d.shape[1] * spei_3d.shape[2]
         n_timesteps = spei_3d.shape[0]
-        spei_2d = np.zeros((n_timesteps, n_centroids))
-
-
-        for i in range(n_timesteps):
-
-            one_event_1d = spei_3d[i, :, :]
 
-            # get rid of nan's
-            nan_pos = np.isnan(one_event_1d)
-            one_event_1d[nan_pos] = 0
+        # get rid of nan's and apply threshold
+        spei_2d = np.where(np.isnan(spei_3d) | (spei_3d > self.threshold), 0, spei_3d)
 
-            # apply threshold
-            non_drought_pos = np.where(one_event_1d > intensity_thres)
-            one_event_1d[non_drought_pos] = 0
-
-            one_event_array = one_event_1d.reshape(n_centroids)
-
-            spei_2d[i, :] = one_event_array
-
-        return spei_2d
+        return spei_2d.reshape(n_timesteps, n_centroids).astype(float)
 
 
     def hazard_def(self, intensity_matrix):
@@ -259,19 +249,9 @@ class Drought(Hazard):
 
         self.units = 'SPEI'
 
-        # fill centroids th bad way (there must be a code like grid...)
-        lat_2d = np.zeros([self.lat_vector.shape[0], self.lon_vector.shape[0]])
-        lon_2d = np.zeros([self.lat_vector.shape[0], self.lon_vector.shape[0]])
-        n_centroids = self.lat_vector.shape[0] * self.lon_vector.shape[0]
-        for lat_i in range(0, self.lat_vector.shape[0]):
-            for lon_i in range(0, self.lon_vector.shape[0]):
-                lat_2d[lat_i, lon_i] = self.lat_vector[lat_i]
-                lon_2d[lat_i, lon_i] = self.lon_vector[lon_i]
-
-        lon_1d = lon_2d.reshape(n_centroids,)
-        lat_1d = lat_2d.reshape(n_centroids,)
-
-        self.centroids.set_lat_lon(lat_1d, lon_1d)
+        # centroids of the grid, row by row
+        lon_2d, lat_2d = np.meshgrid(self.lon_vector, self.lat_vector)
+        self.centroids.set_lat_lon(lat_2d.reshape(-1), lon_2d.reshape(-1))
 
         self.event_id = np.arange(1, self.n_years + 1, 1)
         # frequency set when all eventsavailable
@@ -296,7 +276,7 @@ class Drought(Hazard):
         return self
 
 
-    def __get_intensity_from_2d(self, spei_2d, intensity_definition=1):
+    def __get_intensity_from_2d(self, spei_2d, intensity_definition=1, n_threads=1):
         """Parameters: the 2D matrix called 'spei_2D' defined in
         intensity_from_spei, which containes every time and spacial resolution
         pixel with either the SPEI value or zero if the pixel value doesn't
@@ -306,13 +286,9 @@ class Drought(Hazard):
         The intensity is simply the maximum value for
         the event."""
 
-        #n_centroids = spei_2d.shape[1]
-
         time = pd.to_datetime(self.time_vector)
         first_year = time[0].year + 1
 
-        #first_month = time[0].month
-
         # index_offset to get index of january of first year considered
         index_offset = 12 - time[0].month + 1
 
@@ -329,42 +305,32 @@ class Drought(Hazard):
 
 
         n_years = last_year - first_year + 1  # the first year not counted
-        #years_vector = np.arange(first_year, last_year)
         self.date = np.arange(first_year, last_year)
         self.n_years = n_years
 
-        intensity_min_matrix = np.zeros((n_years, spei_2d.shape[1]))
-        intensity_sum_matrix = np.zeros((n_years, spei_2d.shape[1]))
-        intensity_sum_without_th_matrix = np.zeros((n_years, spei_2d.shape[1]))
-        date_start_matrix = np.zeros((n_years, spei_2d.shape[1]))
-        date_end_matrix = np.zeros((n_years, spei_2d.shape[1]))
-
-
-        time = time[index_offset - 3: index_offset + 12 * n_years - 3]
         self.time_vector = self.time_vector[index_offset - 3: index_offset +
                                             12 * n_years - 3]
+        spei_2d = spei_2d[index_offset - 3: index_offset + 12 * n_years - 3, :]
+
+        # drought events of blocks of centroids
+        spei_blocks = [spei_2d[:, block] for block in
+                       np.array_split(np.arange(spei_2d.shape[1]), max(n_threads, 1))
+                       if block.size]
+        events_block = partial(_drought_events, time_vector=self.time_vector,
+                               threshold=self.threshold, first_year=first_year,
+                               n_years=n_years)
+        if n_threads > 1:
+            with ThreadPoolExecutor(n_threads) as executor:
+                events = list(executor.map(events_block, spei_blocks))
+        else:
+            events = list(map(events_block, spei_blocks))
+        [intensity_min_matrix, intensity_sum_matrix, intensity_sum_without_th_matrix,
+         date_start_matrix, date_end_matrix] = [
+             np.hstack([ev_block[i_var] for ev_block in events] + [np.zeros((n_years, 0))])
+             for i_var in range(5)]
 
-        for pixel in range(spei_2d.shape[1]):
-
-            array_time_centroid = spei_2d[index_offset - 3: index_offset +
-                                          12 * n_years - 3, pixel]
-
-
-            list_events = self.__create_list(array_time_centroid)
-
-            [intmin, intsum, intsumthr, start, end] = self.__read_list(
-                list_events, np.arange(first_year, last_year), first_year)
-
-            intensity_min_matrix[:, pixel] = intmin
-            intensity_sum_matrix[:, pixel] = intsum
-            intensity_sum_without_th_matrix[:, pixel] = intsumthr
-            date_start_matrix[:, pixel] = start
-            date_end_matrix[:, pixel] = end
-
-            #self.date_start = date_start_matrix
-            self.date_end = date_end_matrix
-            self.date_start = sparse.csr_matrix(date_start_matrix)
-
+        self.date_end = date_end_matrix
+        self.date_start = sparse.csr_matrix(date_start_matrix)
 
         if intensity_definition == 1:
             return intensity_min_matrix
@@ -375,113 +341,6 @@ class Drought(Hazard):
         return intensity_sum_matrix
 
 
-    def __create_list(self, array_time_in_centroid):
-        """Return a list of all the events exceeding the threshold.
-        The list contains start end date, the minimum value, the sum (integral)
-        and the sum minus threshold"""
-
-        event = 0
-        min_spei = 0
-        sum_spei = 0
-        sum_spei_thr = []
-
-        start_time = []
-        end_time = []
-
-        list_events_info = list()
-        # create a list with every event exeeding the threshold
-        for time_idx in range(len(array_time_in_centroid)):
-        # for time_idx in enumerate(array_time_in_centroid):
-
-            if array_time_in_centroid[time_idx] == 0:
-
-                if event:
-                    event = 0
-                    list_events_info.append([start_time, end_time, min_spei,
-                                             sum_spei, sum_spei_thr])
-                    min_spei = 0
-                    sum_spei = 0
-                    sum_spei_thr = 0
-
-            else:
-                if event:
-                    end_time = self.time_vector[time_idx]
-                    sum_spei += array_time_in_centroid[time_idx]
-                    sum_spei_thr += (array_time_in_centroid[time_idx] - self.threshold)
-                    if array_time_in_centroid[time_idx] < min_spei:
-                        min_spei = array_time_in_centroid[time_idx]
-
-                else:
-                    start_time = self.time_vector[time_idx]
-                    end_time = self.time_vector[time_idx]
-                    min_spei = array_time_in_centroid[time_idx]
-                    sum_spei = array_time_in_centroid[time_idx]
-                    sum_spei_thr = sum_spei - self.threshold
-
-                    event = 1
-
-        return list_events_info
-
-
-    def __read_list(self, list_events_info, years_vector, first_year):
-        """read the list created in method __create_list and choose the
-        events to include in the hazard set. For every year maximum one
-        event is taken, the one with the lowest spei value on it"""
-
-        intensity_min_array = np.zeros((self.n_years))
-        intensity_sum_array = np.zeros((self.n_years))
-        intensity_sum_thr_array = np.zeros((self.n_years))
-        date_start_array = np.zeros((self.n_years))
-        date_end_array = np.zeros((self.n_years))
-
-        year_offset = first_year
-        min_spei_offset = 0
-
-
-
-        for idx_event in range(0, len(list_events_info)):
-
-            start = list_events_info[idx_event][0]
-            end = list_events_info[idx_event][1]
-
-            min_spei = list_events_info[idx_event][2]
-            sum_spei = list_events_info[idx_event][3]
-            sum_spei_thr = list_events_info[idx_event][4]
-
-
-            year_start = pd.to_datetime(list_events_info[idx_event][0]).year
-            month_start = pd.to_datetime(list_events_info[idx_event][0]).month
-
-            if month_start > 10:
-                year_start += 1
-
-            idx_year = np.where(years_vector == year_start)
-
-            if year_offset == year_start:
-                if min_spei < min_spei_offset:
-                    intensity_min_array[idx_year] = min_spei
-                    intensity_sum_array[idx_year] = sum_spei
-                    intensity_sum_thr_array[idx_year] = sum_spei_thr
-                    date_start_array[idx_year] = datetime64_to_ordinal(start)
-                    date_end_array[idx_year] = datetime64_to_ordinal(end)
-
-                    min_spei_offset = min_spei
-
-            else:
-                intensity_min_array[idx_year] = min_spei
-                intensity_sum_array[idx_year] = sum_spei
-                intensity_sum_thr_array[idx_year] = sum_spei_thr
-                date_start_array[idx_year] = datetime64_to_ordinal(start)
-                date_end_array[idx_year] = datetime64_to_ordinal(end)
-
-                min_spei_offset = min_spei
-
-            year_offset = year_start
-
-        return intensity_min_array, intensity_sum_array, \
-            intensity_sum_thr_array, date_start_array, date_end_array
-
-
     def plot_intensity_drought(self, event=None):
         """plot drought intensity"""
 
@@ -580,3 +439,70 @@ class Drought(Hazard):
                             vmax=enddate, snap="true")
         plt.ylabel('Date')
         plt.yticks(dates, list_dates)
+
+def _drought_events(spei_2d, time_vector, threshold, first_year, n_years):
+    """Drought events of every centroid as runs of consecutive months with
+    SPEI below the threshold (nonzero values of spei_2d), and for every year and
+    centroid the event with the lowest SPEI (the first one if tied). Events start in
+    the year of the first month, November and December count for the next year. Runs
+    still lasting at the last month are not events.
+
+    Parameters:
+        spei_2d (np.array): SPEI below the threshold, zero otherwise, per month
+            (time_vector) and centroid
+        time_vector (np.array): month of every row of spei_2d, datetime64
+        threshold (float): SPEI threshold
+        first_year (int): first year of events
+        n_years (int): number of years, the last one has no events
+
+    Returns:
+        intensity_min, intensity_sum, intensity_sum_thr, date_start, date_end
+        (np.array): minimum, sum, and sum minus threshold of the SPEI, start and end
+        date (ordinal) of the event of every year and centroid
+    """
+    n_time, n_centr = spei_2d.shape
+    out = [np.zeros((n_years, n_centr)) for _ in range(5)]
+
+    # runs of nonzero values along time, flattened by centroid
+    drought = np.zeros((n_centr, n_time + 2), np.int8)
+    drought[:, 1:-1] = spei_2d.T != 0
+    centr_start, time_start = np.nonzero(np.diff(drought, axis=1) == 1)
+    _, time_end = np.nonzero(np.diff(drought, axis=1) == -1)
+    # time_end: first month after the run, unfinished runs are dropped
+    finished = time_end < n_time
+    centr_start, time_start, time_end = \
+        centr_start[finished], time_start[finished], time_end[finished]
+    if not centr_start.size:
+        return out
+
+    spei_flat = spei_2d.T.reshape(-1)
+    bounds = np.column_stack([centr_start * n_time + time_start,
+                              centr_start * n_time + time_end]).reshape(-1)
+    min_spei = np.minimum.reduceat(spei_flat, bounds)[::2]
+    sum_spei = np.add.reduceat(spei_flat, bounds)[::2]
+    sum_spei_thr = np.add.reduceat(spei_flat - threshold, bounds)[::2]
+
+    time = pd.to_datetime(time_vector)
+    year = time.year.values + (time.month.values > 10)
+    year_start = year[time_start]
+
+    # event with lowest SPEI per centroid and year, the first one if tied
+    order = np.lexsort((np.arange(min_spei.size), min_spei, year_start, centr_start))
+    first = np.ones(order.size, bool)
+    first[1:] = (centr_start[order][1:] != centr_start[order][:-1]) \
+                | (year_start[order][1:] != year_start[order][:-1])
+    sel = order[first]
+    # events of the first year are only kept below 0 if no event started before
+    earlier = np.zeros(sel.size, bool)
+    earlier[1:] = centr_start[sel][1:] == centr_start[sel][:-1]
+    sel = sel[(year_start[sel] != first_year) | earlier | (min_spei[sel] < 0)]
+    sel = sel[(year_start[sel] >= first_year) & (year_start[sel] < first_year + n_years - 1)]
+
+    ordinal = np.array(datetime64_to_ordinal(time_vector), float)
+    row, col = year_start[sel] - first_year, centr_start[sel]
+    out[0][row, col] = min_spei[sel]
+    out[1][row, col] = sum_spei[sel]
+    out[2][row, col] = sum_spei_thr[sel]
+    out[3][row, col] = ordinal[time_start[sel]]
+    out[4][row, col] = ordinal[time_end[sel] - 1]
+    return out
@@ -22,15 +22,18 @@ WORK IN PROGRESS
 
 __all__ = ['LowFlow']
 
+import hashlib
 import logging
 import os
 import copy
+import tempfile
 import datetime as dt
 import cftime
 import xarray as xr
 import geopandas as gpd
 import numpy as np
 import numba
+import dask
 
 from sklearn.cluster import DBSCAN
 from sklearn.neighbors import BallTree
@@ -80,13 +83,12 @@ TARGET_YEARRANGE = (2001, 2005)
 BBOX = (-180, -85, 180, 85)
 """default quasi-global geographical bounding box: [lon_min, lat_min, lon_max, lat_max]"""
 
-# reducing these two parameters decreases memory load but increases computation time:
-BBOX_WIDTH = 75
-"""default width and height of geographical bounding boxes for loop in degree lat/lon.
-i.e., the bounding box is split into square boxes with maximum size BBOX_WIDTH*BBOX_WIDTH
-(avoid memory usage spike)"""
-INTENSITY_STEP = 300
-"""max. number of events to be written to hazard.intensity matrix at once
+# reducing these parameters decreases memory load but increases computation time:
+CHUNK_MB = 100
+"""approximate size in MB of the chunks of daily discharge data (full time series of a
+block of grid cells) computed at once by dask (avoid memory usage spike)"""
+CLUSTER_TILE = 100
+"""default number of grid rows (lat) per tile in the connected components clustering
 (avoid memory usage spike)"""
 
 class LowFlow(Hazard):
@@ -105,6 +107,10 @@ class LowFlow(Hazard):
             to be counted as connected points during clustering, default = 2
         min_samples (1): Minimum amount of data points in one cluster to consider as event,
             default = 1.
+        clus_engine (str): clustering of the grid cells, 'dbscan' (2D DBSCAN clusters
+            in lat/lon, lat/time and lon/time, combined) or 'components' (connected
+            components of the grid cells within clus_thresh_xy and clus_thresh_t,
+            computed in tiles of the grid), default = 'dbscan'
         date_start (np.array(int)): for each event, the date of the first month
             of the event (ordinal)
             Note: Hazard attribute 'date' contains the date of maximum event intensity.
@@ -117,6 +123,7 @@ class LowFlow(Hazard):
     clus_thresh_t = 1 # Default = 1: months with intensity<min_intensity interrupt event
     clus_thresh_xy = 2 # Default = 2: allows 1 cell gap and diagonal connection
     min_samples = 1 # Default = 1: no filtering of small events with this default
+    clus_engine = 'dbscan' # Default = 'dbscan': 2D DBSCAN clusters combined in 3D
     resolution = .5 # Default = .5: in agreement with resolution of data from ISIMIP 1-3
 
 
@@ -135,7 +142,7 @@ class LowFlow(Hazard):
                     yearrange_ref=REFERENCE_YEARRANGE, gh_model=None, cl_model=None,
                     scenario='historical', scenario_ref='historical', soc='histsoc',
                     soc_ref='histsoc', fn_str_var=FN_STR_VAR, keep_dis_data=False,
-                    yearchunks='default', mask_threshold=('mean', 1)):
+                    yearchunks='default', mask_threshold=('mean', 1), cache_dir=None):
         """Wrapper to fill hazard from NetCDF file containing variable dis (daily),
         e.g. as provided from from ISIMIP Water Sectior (Global):
             https://esg.pik-potsdam.de/search/isimip/
@@ -198,6 +205,10 @@ class LowFlow(Hazard):
                 values below 0.3 are ignored. default: ('mean', 1}). Set to None for
                 no threshold.
                 Provide a list of tuples for multiple thresholds.
+            cache_dir (str, optional): directory where the percentile and mean
+                discharge grids of the reference period are cached and reused,
+                per model, scenario, reference year range, percentile, bbox
+                and source files. Changed source files are read again.
         raises:
             NameError
         """
@@ -221,7 +232,7 @@ class LowFlow(Hazard):
         self.lowflow_df, centroids_import = data_preprocessing_percentile(
             percentile, yearrange, yearrange_ref, input_dir, gh_model, cl_model,
             scenario, scenario_ref, soc, soc_ref, fn_str_var, bbox, min_days_per_month,
-            keep_dis_data, yearchunks, mask_threshold)
+            keep_dis_data, yearchunks, mask_threshold, cache_dir)
 
         if centr_handling == 'full_hazard':
             centroids = centroids_import
@@ -270,7 +281,9 @@ class LowFlow(Hazard):
         """Compute intensity and populate intensity matrix.
         For each event, if more than one points of
         data have the same coordinates, take the sum of days below threshold
-        of these points (duration as accumulated intensity).
+        of these points (duration as accumulated intensity). Every data point
+        is mapped to its closest centroid once and the days below threshold
+        are summed per event and centroid in one sparse matrix.
 
         Parameters:
             uniq_ev (list of str): list of unique cluster IDs
@@ -279,29 +292,23 @@ class LowFlow(Hazard):
             num_centroids (int): Number of centroids
 
         Returns:
-            intensity_mat (sparse.lilmatrix): intensity values as sparse matrix
+            intensity_mat (sparse.csr_matrix): intensity values as sparse matrix
         """
         tree_centr = BallTree(coord, metric='chebyshev')
-        # steps: list of steps to be written to intensity matrix at once:
-        steps = list(np.arange(0, len(uniq_ev) - 1, INTENSITY_STEP)) + [len(uniq_ev)]
-        if len(steps) == 1:
-            intensity_list = [self._intensity_one_cluster(tree_centr, cl_id, res_centr, num_centr)
-                  for cl_id in uniq_ev]
-            return sparse.csr_matrix(intensity_list)
-        # step_range: list of tuples containing the unique IDs to be written to
-        # the intensity matrix in one step
-        step_range = [tuple(uniq_ev[stp:steps[idx+1]]) for idx, stp in enumerate(steps[0:-1])]
-        for idx, stp in enumerate(step_range):
-            intensity_list = []
-            for cl_id in stp:
-                intensity_list.append(
-                 self._intensity_one_cluster(tree_centr, cl_id, res_centr, num_centr))
-            if not idx:
-                intensity_mat = sparse.lil_matrix(intensity_list)
-            else:
-                intensity_mat = sparse.vstack((intensity_mat,
-                                               sparse.csr_matrix(intensity_list)))
-        return intensity_mat
+        lat_lon_uni, lat_lon_cpy = np.unique(self.lowflow_df[['lat', 'lon']].values,
+                                             return_inverse=True, axis=0)
+        # closest centroid of every unique (lat, lon), -1 if none within the pixel
+        dist, ind = tree_centr.query(lat_lon_uni, k=1)
+        ind = np.where(dist[:, 0] <= res_centr / 2, ind[:, 0], -1)
+        centr_idx = ind[lat_lon_cpy.reshape(-1)]
+
+        ev_idx = np.searchsorted(uniq_ev, self.lowflow_df['cluster_id'].values)
+        in_centr = centr_idx >= 0
+        # duplicate (event, centroid) entries are summed
+        return sparse.coo_matrix(
+            (self.lowflow_df['ndays'].values[in_centr].astype(float),
+             (ev_idx[in_centr], centr_idx[in_centr])),
+            shape=(len(uniq_ev), num_centr)).tocsr()
 
     def _set_dates(self, uniq_ev):
         """Set dates of maximum intensity (date) as well as start and end dates
@@ -310,15 +317,15 @@ class LowFlow(Hazard):
         Parameters:
             uniq_ev (list): list of unique cluster IDs
         """
-        self.date = np.zeros(uniq_ev.size, int)
-        self.date_start = np.zeros(uniq_ev.size, int)
-        self.date_end = np.zeros(uniq_ev.size, int)
-        for ev_idx, ev_id in enumerate(uniq_ev):
-            # set event date to date of maximum intensity (ndays)
-            self.date[ev_idx] = self.lowflow_df[self.lowflow_df.cluster_id == ev_id]\
-                .groupby('dtime')['ndays'].sum().idxmax()
-            self.date_start[ev_idx] = self.lowflow_df[self.lowflow_df.cluster_id == ev_id].dtime.min()
-            self.date_end[ev_idx] = self.lowflow_df[self.lowflow_df.cluster_id == ev_id].dtime.max()
+        # days below threshold per event and date, sorted by event and date
+        ev_dtime = self.lowflow_df.groupby(['cluster_id', 'dtime'])['ndays'].sum()\
+            .reset_index()
+        ev_groups = ev_dtime.groupby('cluster_id')
+        # set event date to date of maximum intensity (ndays), the first one if tied
+        self.date = ev_dtime.dtime.values[ev_groups['ndays'].idxmax()[uniq_ev].values]\
+            .astype(int)
+        self.date_start = ev_groups['dtime'].min()[uniq_ev].values.astype(int)
+        self.date_end = ev_groups['dtime'].max()[uniq_ev].values.astype(int)
 
     def events_from_clusters(self, centroids):
         """Initiate hazard events from connected clusters found in self.lowflow_df
@@ -352,7 +359,8 @@ class LowFlow(Hazard):
         self.fraction = self.intensity.copy()
         self.fraction.data.fill(1.0)
 
-    def identify_clusters(self, clus_thresh_xy=None, clus_thresh_t=None, min_samples=None):
+    def identify_clusters(self, clus_thresh_xy=None, clus_thresh_t=None, min_samples=None,
+                          clus_engine=None):
         """call clustering functions to identify the clusters inside the dataframe
 
         Optional parameters:
@@ -362,6 +370,8 @@ class LowFlow(Hazard):
                 to be counted as connected points during clustering
             min_samples (int): new value or minimum amount of data points in one
                 cluster to retain the cluster as an event, smaller clusters will be ignored
+                (only used by clus_engine 'dbscan')
+            clus_engine (str): new value of clustering engine, 'dbscan' or 'components'
         Returns
             pandas.DataFrame
         """
@@ -371,6 +381,17 @@ class LowFlow(Hazard):
             self.clus_thresh_xy = clus_thresh_xy
         if clus_thresh_t:
             self.clus_thresh_t = clus_thresh_t
+        if clus_engine:
+            self.clus_engine = clus_engine
+
+        if self.clus_engine == 'components':
+            LOGGER.debug('Computing 3D connected components.')
+            self.lowflow_df['cluster_id'] = _components_clustering(
+                self.lowflow_df, self.resolution, self.clus_thresh_xy, self.clus_thresh_t)
+            return self.lowflow_df
+        if self.clus_engine != 'dbscan':
+            LOGGER.error('Unknown clustering engine: %s', self.clus_engine)
+            raise ValueError
 
         self.lowflow_df['cluster_id'] = np.zeros(len(self.lowflow_df), dtype=int)
         LOGGER.debug('Computing 3D clusters.')
@@ -479,67 +500,6 @@ class LowFlow(Hazard):
             return (res_centr[0] + res_centr[1]) / 2
         return res_centr[0]
 
-    def _intensity_one_cluster(self, tree_centr, cluster_id, res_centr, num_centr):
-        """For a given cluster, fill in an intensity np.array with the summed intensity
-        at each centroid.
-
-        Parameters:
-            cluster_id (int): id of the selected cluster
-            tree_centr (object) BallTree instance created from centroids' coordinates
-            res_centr (float): resolution of centroids in degree
-            num_centr (int): number of centroids
-
-        Returns:
-            intensity_cl (np.array): summed intensity of cluster at each centroids
-        """
-        LOGGER.debug('Number of days below threshold corresponding to event %s.', str(cluster_id))
-        temp_data = self.lowflow_df.reindex(
-            index=np.argwhere(np.array(self.lowflow_df['cluster_id'] == cluster_id)).reshape(-1),
-            columns=['lat', 'lon', 'ndays'])
-        # Identifies the unique (lat,lon) points of the lowflow_df dataframe -> lat_lon_uni
-        # Set the same index value for each duplicate (lat,lon) points -> lat_lon_cpy
-        lat_lon_uni, lat_lon_cpy = np.unique(temp_data[['lat', 'lon']].values,
-                                             return_inverse=True, axis=0)
-        index_uni = np.unique(lat_lon_cpy, axis=0)
-        # Search closest centroid for each point
-        ind, _ = tree_centr.query_radius(lat_lon_uni, r=res_centr / 2, count_only=False,
-                                         return_distance=True, sort_results=True)
-        ind = np.array([ind_i[0] if ind_i.size else -1 for ind_i in ind])
-        intensity_cl = _fill_intensity(num_centr, ind, index_uni, lat_lon_cpy,
-                                       temp_data['ndays'].values)
-        return intensity_cl
-
-    @staticmethod
-    def _intensity_one_cluster_pool(lowflow_df, tree_centr, cluster_id, res_centr, num_centr):
-        """For a given cluster, fill in an intensity np.array with the summed intensity
-        at each centroid. Version for self.pool = True
-
-        Parameters:
-            lowflow_df (DataFrame)
-            tree_centr (object): BallTree instance created from centroids' coordinates
-            cluster_id (int): id of the selected cluster
-            res_centr (float): resolution of centroids in degree
-            num_centr (int): number of centroids
-
-        Returns:
-            intensity_cl (np.array): summed intensity of cluster at each centroids
-
-        """
-        LOGGER.debug('Number of days below threshold corresponding to event %s.', str(cluster_id))
-        temp_data = lowflow_df.reindex(
-            index=np.argwhere(np.array(lowflow_df['cluster_id'] == cluster_id)).reshape(-1),
-            columns=['lat', 'lon', 'ndays'])
-
-        lat_lon_uni, lat_lon_cpy = np.unique(temp_data[['lat', 'lon']].values,
-                                             return_inverse=True, axis=0)
-        index_uni = np.unique(lat_lon_cpy, axis=0)
-        ind, _ = tree_centr.query_radius(lat_lon_uni, r=res_centr / 2, count_only=False,
-                                         return_distance=True, sort_results=True)
-        ind = np.array([ind_i[0] if ind_i.size else -1 for ind_i in ind])
-        intensity_cl = _fill_intensity(num_centr, ind, index_uni, lat_lon_cpy,
-                                       temp_data['ndays'].values)
-        return intensity_cl
-
 def _init_centroids(dis_xarray, centr_res_factor=1):
     """Get centroids from the firms dataset and refactor them.
 
@@ -610,14 +570,141 @@ def unique_clusters(lowflow_df):
     lowflow_df.cluster_id = lowflow_df.cluster_id.astype(int)
     return lowflow_df
 
+def _components_clustering(lowflow_df, res_data, clus_thresh_xy, clus_thresh_t,
+                           tile_size=CLUSTER_TILE):
+    """Connected components of the grid cells of lowflow_df in (time, lat, lon).
+    Two cells are connected if they are in the same month and at most clus_thresh_xy
+    cells apart, or if they share lat or lon and are within the ellipse of
+    clus_thresh_xy cells and clus_thresh_t months (as the DBSCAN clustering in
+    LowFlow._df_clustering). The connections are computed for tiles of tile_size
+    grid rows at a time and the labels merged over all tiles.
+
+    Parameters:
+        lowflow_df (dataframe): dataset obtained from ISIMIP data, with lat, lon,
+            dt_month and iter_ev
+        res_data (float): input data grid resolution in degrees
+        clus_thresh_xy (int): clustering distance threshold in space
+        clus_thresh_t (int): clustering distance threshold in time
+        tile_size (int, optional): number of grid rows (lat) per tile
+
+    Returns:
+        cluster_id (np.array): cluster of every row of lowflow_df, numbered from 1 in
+            order of appearance; -1 for rows not iterated (iter_ev)
+    """
+    cluster_id = np.zeros(len(lowflow_df), int) - 1
+    sel_rows = np.argwhere(lowflow_df['iter_ev'].values).reshape(-1)
+    if not sel_rows.size:
+        return cluster_id
+
+    # integer (lat, lon, month) index on the grid
+    grid = np.zeros((3, sel_rows.size), int)
+    for i_var, var in enumerate(['lat', 'lon', 'dt_month']):
+        values = lowflow_df[var].values[sel_rows]
+        step = 1 if var == 'dt_month' else res_data
+        grid[i_var] = np.round((values - values.min()) / step).astype(int)
+    grid_size = grid.max(axis=1) + 1
+    key = np.ravel_multi_index(tuple(grid), tuple(grid_size))
+    key_order = np.argsort(key, kind='stable')
+    key_sort = key[key_order]
+
+    offsets = _cluster_offsets(clus_thresh_xy, clus_thresh_t)
+    parent = np.arange(sel_rows.size)
+    for lat_start in range(0, grid_size[0], tile_size):
+        tile = np.argwhere((grid[0] >= lat_start)
+                           & (grid[0] < lat_start + tile_size)).reshape(-1)
+        for offset in offsets:
+            # neighbours may lie in the next tile, the union merges them
+            neigh = grid[:, tile] + offset[:, None]
+            valid = np.all((neigh >= 0) & (neigh < grid_size[:, None]), axis=0)
+            neigh_key = np.ravel_multi_index(tuple(neigh[:, valid]), tuple(grid_size))
+            pos = np.minimum(np.searchsorted(key_sort, neigh_key), key_sort.size - 1)
+            found = key_sort[pos] == neigh_key
+            _union_points(parent, tile[valid][found], key_order[pos[found]])
+
+    root = _find_roots(parent)
+    # number clusters in order of appearance
+    _, first_row, root_inv = np.unique(root, return_index=True, return_inverse=True)
+    rank = np.argsort(np.argsort(first_row))
+    cluster_id[sel_rows] = rank[root_inv] + 1
+    return cluster_id
+
+def _cluster_offsets(clus_thresh_xy, clus_thresh_t):
+    """(lat, lon, month) offsets of the connected grid cells in one direction
+
+    Parameters:
+        clus_thresh_xy (int): clustering distance threshold in space
+        clus_thresh_t (int): clustering distance threshold in time
+
+    Returns:
+        np.array (n_offsets x 3)
+    """
+    max_xy, max_t = int(np.floor(clus_thresh_xy)), int(np.floor(clus_thresh_t))
+    offsets = list()
+    for d_t in range(0, max_t + 1):
+        for d_lat in range(-max_xy, max_xy + 1):
+            for d_lon in range(-max_xy, max_xy + 1):
+                if (d_t, d_lat, d_lon) <= (0, 0, 0):
+                    continue
+                if d_t == 0:
+                    connected = d_lat ** 2 + d_lon ** 2 <= clus_thresh_xy ** 2 + 1e-9
+                elif d_lat == 0 or d_lon == 0:
+                    connected = (d_lat ** 2 + d_lon ** 2) / clus_thresh_xy ** 2 \
+                                + d_t ** 2 / clus_thresh_t ** 2 <= 1 + 1e-9
+                else:
+                    connected = False
+                if connected:
+                    offsets.append((d_lat, d_lon, d_t))
+    return np.array(offsets, int).reshape(-1, 3)
+
+@numba.njit
+def _union_points(parent, points, neighbours):
+    """join the sets of connected points (union-find with path halving)
+
+    Parameters:
+        parent (np.array of int): parent point of every point, modified
+        points (np.array of int): points connected to neighbours
+        neighbours (np.array of int): neighbour of every point
+    """
+    for idx in range(points.size):
+        root_a, root_b = points[idx], neighbours[idx]
+        while parent[root_a] != root_a:
+            parent[root_a] = parent[parent[root_a]]
+            root_a = parent[root_a]
+        while parent[root_b] != root_b:
+            parent[root_b] = parent[parent[root_b]]
+            root_b = parent[root_b]
+        if root_a < root_b:
+            parent[root_b] = root_a
+        elif root_b < root_a:
+            parent[root_a] = root_b
+
+@numba.njit
+def _find_roots(parent):
+    """root point of the set of every point
+
+    Parameters:
+        parent (np.array of int): parent point of every point
+
+    Returns:
+        np.array of int
+    """
+    root = np.empty_like(parent)
+    for idx in range(parent.size):
+        root_idx = idx
+        while parent[root_idx] != root_idx:
+            root_idx = parent[root_idx]
+        root[idx] = root_idx
+    return root
+
 def data_preprocessing_percentile(percentile, yearrange, yearrange_ref,
                                    input_dir, gh_model, cl_model, scenario,
                                    scenario_ref, soc, soc_ref, fn_str_var, bbox,
                                    min_days_per_month, keep_dis_data, yearchunks,
-                                   mask_threshold):
+                                   mask_threshold, cache_dir=None):
     """load data and reference data and calculate monthly percentiles
     then extract intensity based on days below threshold
     returns geopandas dataframe
+    The discharge data is read lazily and processed in chunks with dask.
 
     Parameters:
         c.f. parameters in LowFlow.set_from_nc()
@@ -634,7 +721,8 @@ def data_preprocessing_percentile(percentile, yearrange, yearrange_ref,
                                                        fn_str_var, bbox,
                                                        yearchunks,
                                                        mask_threshold=mask_threshold,
-                                                       keep_dis_data=keep_dis_data)
+                                                       keep_dis_data=keep_dis_data,
+                                                       cache_dir=cache_dir)
     first_file = True
     if yearchunks == 'default':
         yearchunks = YEARCHUNKS[scenario]
@@ -648,7 +736,7 @@ def data_preprocessing_percentile(percentile, yearrange, yearrange_ref,
                 (max(yearrange[0], int(yearchunk[0:4])),
                  min(yearrange[-1], int(yearchunk[-4:]))),
                 input_dir, gh_model, cl_model,
-                scenario, soc, fn_str_var, bbox, [yearchunk])
+                scenario, soc, fn_str_var, bbox, [yearchunk], chunk_mb=CHUNK_MB)
             data_chunk = _days_below_threshold_per_month(data_chunk, threshold_grid, mean_ref,
                                                          min_days_per_month, keep_dis_data)
             if first_file:
@@ -662,42 +750,76 @@ def data_preprocessing_percentile(percentile, yearrange, yearrange_ref,
     return dataf.reset_index(drop=True), centroids
 
 def _read_and_combine_nc(yearrange, input_dir, gh_model, cl_model, scenario,
-                         soc, fn_str_var, bbox, yearchunks):
+                         soc, fn_str_var, bbox, yearchunks, chunk_mb=None):
     """Import and combine data from nc files
 
     Parameters:
         c.f. parameters in LowFlow.set_from_nc()
 
+    Optional Parameters:
+        chunk_mb (float): if set, the data is read lazily as dask arrays with chunks
+            of the full time series of blocks of grid cells of about chunk_mb MB
+
     Returns:
         dis_xarray (xarray)
     """
     first_file = True
-    if yearchunks == 'default':
-        yearchunks = YEARCHUNKS[scenario]
-    for yearchunk in yearchunks:
-        # skip if file is not required, i.e., not in yearrange:
-        if int(yearchunk[0:4]) > yearrange[1] or int(yearchunk[-4:]) < yearrange[0]:
-            continue
-        if scenario == 'hist':
-            bias_corr = 'nobc'
-        else:
-            bias_corr = 'ewembi'
-
-        filename = os.path.join(input_dir, \
-                                f'{gh_model}_{cl_model}_{bias_corr}_{scenario}_{soc}_{fn_str_var}_{yearchunk}.nc'
-                                )
+    for filename in _nc_file_names(yearrange, input_dir, gh_model, cl_model, scenario,
+                                   soc, fn_str_var, yearchunks):
         if not os.path.isfile(filename):
             LOGGER.error('Netcdf file not found: %s', filename)
+        dis_single = _read_single_nc(filename, yearrange, bbox)
+        if chunk_mb:
+            dis_single = dis_single.chunk(_chunk_sizes(dis_single, chunk_mb))
         if first_file:
-            dis_xarray = _read_single_nc(filename, yearrange, bbox)
+            dis_xarray = dis_single
             first_file = False
         else:
-            dis_xarray = dis_xarray.combine_first(_read_single_nc(filename, yearrange, bbox))
+            dis_xarray = dis_xarray.combine_first(dis_single)
 
+    if chunk_mb:
+        # full time series in every chunk
+        dis_xarray = dis_xarray.chunk(_chunk_sizes(dis_xarray, chunk_mb))
     # set negative discharge values to zero (debugging of input data):
-    dis_xarray.dis.values[dis_xarray.dis.values < 0] = 0
+    dis_xarray['dis'] = dis_xarray.dis.where(~(dis_xarray.dis < 0), 0)
     return dis_xarray
 
+def _nc_file_names(yearrange, input_dir, gh_model, cl_model, scenario, soc,
+                   fn_str_var, yearchunks):
+    """Names of the nc files of the year chunks overlapping the year range
+
+    Parameters:
+        c.f. parameters in LowFlow.set_from_nc()
+
+    Returns:
+        list(str)
+    """
+    if yearchunks == 'default':
+        yearchunks = YEARCHUNKS[scenario]
+    if scenario == 'hist':
+        bias_corr = 'nobc'
+    else:
+        bias_corr = 'ewembi'
+    # skip if file is not required, i.e., not in yearrange:
+    return [os.path.join(input_dir, f'{gh_model}_{cl_model}_{bias_corr}_{scenario}_{soc}_'
+                                    f'{fn_str_var}_{yearchunk}.nc')
+            for yearchunk in yearchunks
+            if int(yearchunk[0:4]) <= yearrange[1] and int(yearchunk[-4:]) >= yearrange[0]]
+
+def _chunk_sizes(dis_xarray, chunk_mb=CHUNK_MB):
+    """chunks of the full time series of square blocks of grid cells
+
+    Parameters:
+        dis_xarray (xarray): data with dimensions time, lat and lon
+        chunk_mb (float): approximate size of a chunk in MB
+
+    Returns:
+        dict
+    """
+    n_cells = chunk_mb * 1024 ** 2 / 8 / max(dis_xarray.time.size, 1)
+    side = max(int(np.sqrt(n_cells)), 1)
+    return {'time': -1, 'lat': side, 'lon': side}
+
 def _read_single_nc(filename, yearrange, bbox):
     """Import data from single nc file, return as xarray
 
@@ -751,47 +873,20 @@ def _xarray_reduce(dis_xarray, fun=None, percentile=None):
     if fun == 'mean':
         return dis_xarray.mean(dim='time')
     if fun[0] == 'p':
-        return dis_xarray.reduce(np.nanpercentile, dim='time', q=percentile)
+        # chunk by chunk with dask arrays (time must not be chunked)
+        return xr.apply_ufunc(np.nanpercentile, dis_xarray, input_core_dims=[['time']],
+                              kwargs={'q': percentile, 'axis': -1}, dask='parallelized',
+                              output_dtypes=[float])
     return None
 
-def _split_bbox(bbox, width=BBOX_WIDTH):
-    """split bounding box into squares, return new set of bounding boxes
-    Note: Could this function be a candidate for climada.util in the future?
-    
-    Parameters:
-        bbox (tuple of float): geographical bounding box in the form:
-            (lon_min, lat_min, lon_max, lat_max)
-
-    Optional Parameters:
-        width (float): width and height of geographical bounding boxes for loop in degree lat/lon.
-        i.e., the bounding box is split into square boxes with maximum size BBOX_WIDTH*BBOX_WIDTH
-
-    Returns:
-        bbox_list (list): list of bounding boxes of the same format as bbox
-    """
-    if not bbox:
-        lon_min, lat_min, lon_max, lat_max = (-180, -85, 180, 85)
-    else:
-        lon_min, lat_min, lon_max, lat_max = bbox
-    lons = [lon_min] + \
-        [int(idc) for idc in np.arange(np.ceil(lon_min+width-1),
-                                       np.floor(lon_max-width+1), width)] + [lon_max]
-    lats = [lat_min] + \
-        [int(idc) for idc in np.arange(np.ceil(lat_min+width-1),
-                                       np.floor(lat_max-width+1), width)] + [lat_max]
-    bbox_list = list()
-    for ilon, _ in enumerate(lons[:-1]):
-        for ilat, _ in enumerate(lats[:-1]):
-            bbox_list.append([lons[ilon], lats[ilat], lons[ilon+1], lats[ilat+1]])
-    return bbox_list
-
 def _compute_threshold_grid(percentile, yearrange_ref, input_dir, gh_model, cl_model,
                             scenario, soc, fn_str_var, bbox, yearchunks,
-                            mask_threshold=None, keep_dis_data=False):
+                            mask_threshold=None, keep_dis_data=False, cache_dir=None):
     """given model run and year range specification, this function
     returns the x-th percentile for every pixel over a given
     time horizon (based on daily data) [all-year round percentiles!],
     as well as the mean at each grid cell.
+    Both are computed in one pass over chunks of the lazily read data.
 
     Parameters:
         c.f. parameters in LowFlow.set_from_nc()
@@ -799,6 +894,9 @@ def _compute_threshold_grid(percentile, yearrange_ref, input_dir, gh_model, cl_m
     Optional parameters:
         mask_threshold (tuple or list), Threshold(s) of below which the
             grid is masked out. e.g. ('mean', 1.)
+        cache_dir (str): directory of the cached grids (before masking). The
+            name of a cached file contains a hash of the paths and
+            modification times of the source nc files.
 
     Returns:
         p_grid (xarray): grid with dis of given percentile (1-timestep)
@@ -808,23 +906,42 @@ def _compute_threshold_grid(percentile, yearrange_ref, input_dir, gh_model, cl_m
                 percentile, yearrange_ref[0], yearrange_ref[1])
     if isinstance(mask_threshold, tuple):
         mask_threshold = [mask_threshold]
-    bbox = _split_bbox(bbox)
-    p_grid = []
-    mean_grid = []
-    # loop over coordinate bounding boxes to save memory:
-    for box in bbox:
+
+    cache_file = None
+    if cache_dir:
+        bbox_str = '_'.join(str(coord) for coord in bbox) if bbox else 'global'
+        hasher = hashlib.sha1()
+        for filename in _nc_file_names(yearrange_ref, input_dir, gh_model, cl_model,
+                                       scenario, soc, fn_str_var, yearchunks):
+            hasher.update(os.path.abspath(filename).encode())
+            if os.path.isfile(filename):
+                hasher.update(np.int64(os.stat(filename).st_mtime_ns).tobytes())
+        cache_file = os.path.join(cache_dir, f'{gh_model}_{cl_model}_{scenario}_{soc}_'
+                                  f'{fn_str_var}_{yearrange_ref[0]}_{yearrange_ref[1]}_'
+                                  f'Q{percentile}_{bbox_str}_{hasher.hexdigest()[:12]}.nc')
+        os.makedirs(cache_dir, exist_ok=True)
+    if cache_file and os.path.isfile(cache_file):
+        LOGGER.info('Reading threshold grid from %s', cache_file)
+        with xr.open_dataset(cache_file) as grids:
+            grids = grids.load()
+    else:
         dis_xarray = _read_and_combine_nc(yearrange_ref, input_dir, gh_model, cl_model,
-                                    scenario, soc, fn_str_var, box, yearchunks)
-        if dis_xarray.dis.data.size: # only if data is not empty
-            p_grid += [_xarray_reduce(dis_xarray, fun='p', percentile=percentile)]
-            # only compute mean_grid if required by user or mask_threshold:
-            if keep_dis_data or (mask_threshold and True in ['mean' in x for x in mask_threshold]):
-                mean_grid += [_xarray_reduce(dis_xarray, fun='mean')]
-
-    del dis_xarray
-    p_grid = xr.combine_by_coords(p_grid)
-    if mean_grid:
-        mean_grid = xr.combine_by_coords(mean_grid)
+                                          scenario, soc, fn_str_var, bbox, yearchunks,
+                                          chunk_mb=CHUNK_MB)
+        p_grid = _xarray_reduce(dis_xarray, fun='p', percentile=percentile)
+        mean_grid = _xarray_reduce(dis_xarray, fun='mean')
+        p_grid, mean_grid = dask.compute(p_grid, mean_grid)
+        del dis_xarray
+        grids = p_grid.assign(dis_mean=mean_grid.dis)
+        if cache_file:
+            LOGGER.info('Writing threshold grid to %s', cache_file)
+            file_desc, fn_tmp = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+            os.close(file_desc)
+            grids.to_netcdf(fn_tmp)
+            os.replace(fn_tmp, cache_file)
+
+    p_grid = grids[['dis']]
+    mean_grid = grids[['dis_mean']].rename({'dis_mean': 'dis'})
 
     if isinstance(mask_threshold, list):
         for crit in mask_threshold:
@@ -862,11 +979,10 @@ def _days_below_threshold_per_month(dis_xarray, threshold_grid, mean_ref,
     if keep_dis_data:
         data_low = dis_xarray.where(data_threshold < 0) / mean_ref
         data_low = data_low.resample(time='1M').mean()
-    data_threshold.dis.values[data_threshold.dis.values >= 0] = 0
-    data_threshold.dis.values[data_threshold.dis.values < 0] = 1
-    data_threshold = data_threshold.resample(time='1M').sum()
-    data_threshold.dis.values[data_threshold.dis.values < min_days_per_month] = 0
-    data_threshold = data_threshold.rename({'dis': 'ndays'})
+    # number of days below threshold per month, lazily for dask arrays
+    ndays = (data_threshold.dis < 0).resample(time='1M').sum()
+    ndays = ndays.where(ndays >= min_days_per_month, 0).astype(data_threshold.dis.dtype)
+    data_threshold = ndays.to_dataset(name='ndays')
     if keep_dis_data:
         data_threshold['relative_dis'] = data_low['dis']
     return data_threshold.where(data_threshold['ndays'] > 0)
@@ -890,24 +1006,3 @@ def _xarray_to_geopandas(dis_xarray):
     dataf['dt_month'] = dataf['time'].apply(lambda x: x.year * 12 + x.month)
     return gpd.GeoDataFrame(dataf, geometry=[Point(x, y) for x, y in zip(dataf['lon'],
                                                                          dataf['lat'])])
-
-@numba.njit
-def _fill_intensity(num_centr, ind, index_uni, lat_lon_cpy, intensity_raw):
-    """fill intensity list for a single cluster
-
-    Parameters:
-        num_centr (int): total number of centroids
-        ind (list): list of centroid indices  in cluster
-        lat_lon_cpy (array of int): index according to (lat, lon) in intensity_raw
-        intensity_raw (array of int): array of ndays values at each data point in cluster
-
-    Returns:
-        list with summed ndays (=intensity) per geographical point (lat, lon)
-    """
-
-    intensity_cl = np.zeros((1, num_centr), dtype=numba.float64)
-    for idx in range(index_uni.size):
-        if ind[idx] != -1:
-            intensity_cl[0, ind[idx]] = \
-                np.sum(intensity_raw[lat_lon_cpy == index_uni[idx]])
-    return intensity_cl[0]
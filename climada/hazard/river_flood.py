@@ -23,6 +23,9 @@ __all__ = ['RiverFlood']
 
 import logging
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 import numpy as np
 import scipy as sp
 import xarray as xr
@@ -30,8 +33,8 @@ import pandas as pd
 import geopandas as gpd
 import datetime as dt
 from datetime import date
-from rasterio.warp import Resampling
-import copy
+import rasterio
+from rasterio.windows import Window
 from climada.util.constants import RIVER_FLOOD_REGIONS_CSV
 from climada.util.coordinates import get_region_gridpoints,\
                                      region2isos, country_iso2natid
@@ -73,7 +76,7 @@ class RiverFlood(Hazard):
 
     def set_from_nc(self, dph_path=None, frc_path=None, origin=False,
                     centroids=None, countries=None, reg=None, shape=None, ISINatIDGrid=False,
-                    years=[2000]):
+                    years=[2000], n_threads=1):
         """Wrapper to fill hazard from nc_flood file
         Parameters:
             dph_path (string): Flood file to read (depth)
@@ -87,6 +90,9 @@ class RiverFlood(Hazard):
                 are ignored)
             ISINatIDGrid (Bool): Indicates whether ISIMIP_NatIDGrid is used
             years (int list): years that are considered
+            n_threads (int, optional): number of threads reading the bands of
+                the window covering the centroids, with centroids or
+                ISINatIDGrid. Default: 1
 
         raises:
             NameError
@@ -115,22 +121,13 @@ class RiverFlood(Hazard):
             if ISINatIDGrid:
 
                 dest_centroids = RiverFlood._select_exact_area(countries, reg)[0]
-                meta_centroids = copy.copy(dest_centroids)
-                meta_centroids.set_lat_lon_to_meta()
-
-                self.set_raster(files_intensity=[dph_path],
-                                files_fraction=[frc_path], band=bands.tolist(),
-                                transform=meta_centroids.meta['transform'],
-                                width=meta_centroids.meta['width'],
-                                height=meta_centroids.meta['height'],
-                                resampling=Resampling.nearest)
-                x_i = ((dest_centroids.lon - self.centroids.meta['transform'][2]) /
-                       self.centroids.meta['transform'][0]).astype(int)
-                y_i = ((dest_centroids.lat - self.centroids.meta['transform'][5]) /
-                       self.centroids.meta['transform'][4]).astype(int)
-
-                fraction = self.fraction[:, y_i * self.centroids.meta['width'] + x_i]
-                intensity = self.intensity[:, y_i * self.centroids.meta['width'] + x_i]
+                with _RasterHandles() as handles:
+                    fraction = _read_raster_points(frc_path, bands.tolist(),
+                                                   dest_centroids.lat, dest_centroids.lon,
+                                                   n_threads, handles)
+                    intensity = _read_raster_points(dph_path, bands.tolist(),
+                                                    dest_centroids.lat, dest_centroids.lon,
+                                                    n_threads, handles)
 
                 self.centroids = dest_centroids
                 self.intensity = sp.sparse.csr_matrix(intensity)
@@ -182,14 +179,11 @@ class RiverFlood(Hazard):
             # else:
             if centroids.meta:
                 centroids.set_meta_to_lat_lon()
-            metafrc, fraction = read_raster(frc_path, band=bands.tolist())
-            metaint, intensity = read_raster(dph_path, band=bands.tolist())
-            x_i = ((centroids.lon - metafrc['transform'][2]) /
-                   metafrc['transform'][0]).astype(int)
-            y_i = ((centroids.lat - metafrc['transform'][5]) /
-                   metafrc['transform'][4]).astype(int)
-            fraction = fraction[:, y_i * metafrc['width'] + x_i]
-            intensity = intensity[:, y_i * metaint['width'] + x_i]
+            with _RasterHandles() as handles:
+                fraction = _read_raster_points(frc_path, bands.tolist(), centroids.lat,
+                                               centroids.lon, n_threads, handles)
+                intensity = _read_raster_points(dph_path, bands.tolist(), centroids.lat,
+                                                centroids.lon, n_threads, handles)
             self.centroids = centroids
             self.intensity = sp.sparse.csr_matrix(intensity)
             self.fraction = sp.sparse.csr_matrix(fraction)
@@ -371,3 +365,108 @@ class RiverFlood(Hazard):
         centroids.id = np.arange(centroids.lon.shape[0])
         # centroids.set_region_id()
         return centroids, country_isos, natIDs
+
+def _open_raster(file_name):
+    """Open a raster file with rasterio, gzipped files through /vsigzip/.
+
+    Parameters:
+        file_name (str): name of the raster file
+
+    Returns:
+        rasterio.io.DatasetReader
+    """
+    if os.path.splitext(file_name)[1] == '.gz':
+        return rasterio.open('/vsigzip/' + file_name, 'r')
+    return rasterio.open(file_name, 'r')
+
+class _RasterHandles():
+    """Raster files opened once per thread and kept open until closed, since
+    rasterio datasets must not be shared between threads. Use as context
+    manager to close all datasets at the end."""
+
+    def __init__(self):
+        self._handles = dict()
+        self._lock = threading.Lock()
+
+    def get(self, file_name):
+        """Dataset of the file for the calling thread, opened on first use.
+
+        Parameters:
+            file_name (str): name of the raster file
+
+        Returns:
+            rasterio.io.DatasetReader
+        """
+        key = (file_name, threading.get_ident())
+        src = self._handles.get(key)
+        if src is None:
+            src = _open_raster(file_name)
+            with self._lock:
+                self._handles[key] = src
+        return src
+
+    def close(self):
+        """Close all datasets."""
+        with self._lock:
+            for src in self._handles.values():
+                src.close()
+            self._handles.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+def _read_raster_points(file_name, bands, lat, lon, n_threads=1, handles=None):
+    """Read bands of a raster file at the pixels containing the given points.
+    Only the window covering the points is read, masked values are set to 0.
+    The calling thread reads the first part of the bands, every other thread
+    one further part.
+
+    Parameters:
+        file_name (str): name of the raster file
+        bands (list(int)): bands to read
+        lat (np.array): latitude of every point
+        lon (np.array): longitude of every point
+        n_threads (int, optional): number of threads reading bands. Default: 1
+        handles (_RasterHandles, optional): open datasets to reuse, closed by
+            the caller. Default: datasets opened and closed in this call
+
+    Returns:
+        np.array (bands x points)
+    """
+    LOGGER.info('Reading %s', file_name)
+    lat, lon = np.asarray(lat), np.asarray(lon)
+    if not lat.size or not len(bands):
+        return np.zeros((len(bands), lat.size))
+    if handles is None:
+        with _RasterHandles() as handles:
+            return _read_raster_points(file_name, bands, lat, lon, n_threads, handles)
+
+    transform = handles.get(file_name).transform
+    col = np.floor((lon - transform.c) / transform.a).astype(int)
+    row = np.floor((lat - transform.f) / transform.e).astype(int)
+    window = Window(col.min(), row.min(), col.max() - col.min() + 1,
+                    row.max() - row.min() + 1)
+    read_bands = partial(_read_bands_points, handles, file_name, window,
+                         row - row.min(), col - col.min())
+    if n_threads > 1 and len(bands) > 1:
+        band_parts = np.array_split(bands, min(n_threads, len(bands)))
+        with ThreadPoolExecutor(len(band_parts) - 1) as executor:
+            data = executor.map(read_bands, [part.tolist() for part in band_parts[1:]])
+            data = [read_bands(band_parts[0].tolist())] + list(data)
+    else:
+        data = [read_bands(bands)]
+    return np.concatenate(data)
+
+def _read_bands_points(handles, file_name, window, row, col, bands):
+    """Read bands of a raster file in a window at the given pixels of the
+    window, masked values are set to 0.
+
+    Returns:
+        np.array (bands x points)
+    """
+    src = handles.get(file_name)
+    return np.stack([src.read(band, window=window, masked=True).filled(0)[row, col]
+                     for band in bands])
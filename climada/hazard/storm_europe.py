@@ -22,7 +22,11 @@ Define StormEurope class.
 __all__ = ['StormEurope']
 
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 import numpy as np
+import h5py
 import xarray as xr
 import pandas as pd
 import matplotlib.pyplot as plt
@@ -46,6 +50,9 @@ HAZ_TYPE = 'WS'
 N_PROB_EVENTS = 5 * 6
 """Number of events per historic event in probabilistic dataset"""
 
+_NC_LOCK = threading.Lock()
+"""Serializes netCDF file access, the netCDF library is not thread safe"""
+
 
 class StormEurope(Hazard):
     """A hazard set containing european winter storm events. Historic storm
@@ -77,7 +84,7 @@ class StormEurope(Hazard):
     def read_footprints(self, path, description=None,
                         ref_raster=None, centroids=None,
                         files_omit='fp_era20c_1990012515_701_0.nc',
-                        combine_threshold=None):
+                        combine_threshold=None, n_threads=1):
         """Clear instance and read WISC footprints into it. Read Assumes that
         all footprints have the same coordinates as the first file listed/first
         file in dir.
@@ -102,6 +109,8 @@ class StormEurope(Hazard):
                 of two events is smaller or equal to this threshold, the two
                 events are combined into one.
                 Default is None, Advised for WISC is 2
+            n_threads (int, optional): number of threads reading the
+                footprints. Default: 1
         """
 
         self.clear()
@@ -123,15 +132,43 @@ class StormEurope(Hazard):
 
         LOGGER.info('Commencing to iterate over netCDF files.')
 
+        read_names = list()
         for file_name in file_names:
             if any(fo in file_name for fo in files_omit):
                 LOGGER.info("Omitting file %s", file_name)
                 continue
-            new_haz = self._read_one_nc(file_name, centroids)
-            if new_haz is not None:
-                self.append(new_haz)
+            read_names.append(file_name)
 
-        self.event_id = np.arange(1, len(self.event_id) + 1)
+        read_args = (read_names, [centroids.size] * len(read_names),
+                     [self.intensity_thres] * len(read_names))
+        if n_threads > 1 and len(read_names) > 1:
+            with ThreadPoolExecutor(n_threads) as executor:
+                footprints = list(executor.map(_read_footprint, *read_args))
+        else:
+            footprints = list(map(_read_footprint, *read_args))
+        footprints = [footprint for footprint in footprints if footprint is not None]
+
+        # assemble the events at once
+        indptr = np.zeros(len(footprints) + 1, int)
+        np.cumsum([footprint['indices'].size for footprint in footprints],
+                  out=indptr[1:])
+        indices = np.concatenate([footprint['indices'] for footprint in footprints]
+                                 + [np.zeros(0, int)])
+        data = np.concatenate([footprint['data'] for footprint in footprints]
+                              + [np.zeros(0, footprints[0]['data'].dtype
+                                          if footprints else float)])
+        self.units = 'm/s'
+        self.centroids = centroids
+        self.intensity = sparse.csr_matrix((data, indices, indptr),
+                                           shape=(len(footprints), centroids.size))
+        self.fraction = self.intensity.copy()
+        self.fraction.data.fill(1)
+        self.event_name = [footprint['name'] for footprint in footprints]
+        self.date = np.array([footprint['date'] for footprint in footprints], int)
+        self.ssi_wisc = np.array([footprint['ssi'] for footprint in footprints], float)
+        self.orig = np.ones(len(footprints), bool)
+
+        self.event_id = np.arange(1, len(footprints) + 1)
         self.frequency = np.divide(
             np.ones_like(self.date),
             (last_year(self.date) - first_year(self.date))
@@ -146,16 +183,17 @@ class StormEurope(Hazard):
 
         if combine_threshold is not None:
             LOGGER.info('Combining events with small difference in date.')
-            difference_date = np.diff(self.date)
-            for event_id_i in self.event_id[
-                    np.append(difference_date <= combine_threshold, False)]:
-                event_ids = [event_id_i, event_id_i + 1]
-                self._combine_events(event_ids)
+            # runs of events with small differences of the sorted dates
+            order = np.argsort(self.date, kind='stable')
+            new_run = np.ones(order.size, bool)
+            new_run[1:] = np.diff(self.date[order]) > combine_threshold
+            runs = np.split(self.event_id[order], np.nonzero(new_run)[0][1:])
+            runs = [run for run in runs if run.size > 1]
+            if runs:
+                self._combine_events(runs)
 
     def _read_one_nc(self, file_name, centroids):
         """Read a single WISC footprint. Assumes a time dimension of length 1.
-        Omits a footprint if another file with the same timestamp has already
-        been read.
 
         Parameters:
             file_name (str): Absolute or relative path to *.nc
@@ -165,28 +203,18 @@ class StormEurope(Hazard):
         Returns:
             new_haz (StormEurope): Hazard instance for one single storm.
        """
-        ncdf = xr.open_dataset(file_name)
-
-        if centroids.size != (ncdf.sizes['latitude'] * ncdf.sizes['longitude']):
-            ncdf.close()
-            LOGGER.warning(('Centroids size doesn\'t match NCDF dimensions. '
-                            'Omitting file %s.'), file_name)
+        footprint = _read_footprint(file_name, centroids.size, self.intensity_thres)
+        if footprint is None:
             return None
 
-        # xarray does not penalise repeated assignments, see
-        # http://xarray.pydata.org/en/stable/data-structures.html
-        stacked = ncdf.max_wind_gust.stack(
-            intensity=('latitude', 'longitude', 'time')
-        )
-        stacked = stacked.where(stacked > self.intensity_thres)
-        stacked = stacked.fillna(0)
-
         # fill in values from netCDF
         new_haz = StormEurope()
-        new_haz.event_name = [ncdf.storm_name]
-        new_haz.date = np.array([datetime64_to_ordinal(ncdf.time.data[0])])
-        new_haz.intensity = sparse.csr_matrix(stacked)
-        new_haz.ssi_wisc = np.array([float(ncdf.ssi)])
+        new_haz.event_name = [footprint['name']]
+        new_haz.date = np.array([footprint['date']])
+        new_haz.intensity = sparse.csr_matrix(
+            (footprint['data'], footprint['indices'], [0, footprint['indices'].size]),
+            shape=(1, centroids.size))
+        new_haz.ssi_wisc = np.array([footprint['ssi']])
 
         # fill in default values
         new_haz.centroids = centroids
@@ -195,8 +223,6 @@ class StormEurope(Hazard):
         new_haz.fraction = new_haz.intensity.copy().tocsr()
         new_haz.fraction.data.fill(1)
         new_haz.orig = np.array([True])
-
-        ncdf.close()
         return new_haz
 
     @staticmethod
@@ -231,46 +257,51 @@ class StormEurope(Hazard):
         return cent
 
     def _combine_events(self, event_ids):
-        """combine the intensities of two events using max and adjust event_id, event_name,
-        date etc of the hazard
-
-        the event_ids must be consecutive for the event_name field to behave correctly
+        """combine the intensities of groups of events using max and adjust
+        event_id, event_name, date etc of the hazard. The combined events are
+        appended after the other events, with new event ids.
 
         Parameters:
-            event_ids (array): two consecutive event ids
+            event_ids (list(array)): event ids of every group of events to
+                combine, the names are joined in this order
         """
-        select_event_ids = np.isin(self.event_id, event_ids)
-        select_other_events = np.invert(select_event_ids)
-        intensity_tmp = self.intensity[select_event_ids, :].max(axis=0)
-        self.intensity = self.intensity[select_other_events, :]
-        self.intensity = sparse.vstack([self.intensity, sparse.csr_matrix(intensity_tmp)])
-        self.event_id = np.append(self.event_id[select_other_events], self.event_id.max() + 1)
+        pos = {ev_id: i_ev for i_ev, ev_id in enumerate(self.event_id)}
+        groups = [np.array([pos[ev_id] for ev_id in group], int) for group in event_ids]
+        group_pos = np.concatenate(groups)
+        select_other_events = np.ones(self.event_id.size, bool)
+        select_other_events[group_pos] = False
+        n_other = np.count_nonzero(select_other_events)
+
+        # new row of every event: other events first, then the combined ones
+        new_row = np.zeros(self.event_id.size, int)
+        new_row[select_other_events] = np.arange(n_other)
+        new_row[group_pos] = n_other + np.repeat(np.arange(len(groups)),
+                                                 [group.size for group in groups])
+        n_rows = n_other + len(groups)
+        self.intensity = _max_rows(self.intensity, new_row, n_rows)
+        self.fraction = _max_rows(self.fraction, new_row, n_rows)
+
+        self.event_id = np.append(self.event_id[select_other_events],
+                                  self.event_id.max() + 1 + np.arange(len(groups)))
         self.date = np.append(self.date[select_other_events],
-                              np.round(self.date[select_event_ids].mean()))
-        name_2 = self.event_name.pop(np.where(select_event_ids)[0][1])
-        name_1 = self.event_name.pop(np.where(select_event_ids)[0][0])
-        self.event_name.append(name_1 + '_' + name_2)
-        fraction_tmp = self.fraction[select_event_ids, :].max(axis=0)
-        self.fraction = self.fraction[select_other_events, :]
-        self.fraction = sparse.vstack([self.fraction, sparse.csr_matrix(fraction_tmp)])
-
+                              np.round([self.date[group].mean() for group in groups]).astype(self.date.dtype))
+        self.event_name = [name for name, other in zip(self.event_name, select_other_events)
+                           if other] \
+                          + ['_'.join(self.event_name[i_ev] for i_ev in group)
+                             for group in groups]
         self.frequency = np.append(self.frequency[select_other_events],
-                                   self.frequency[select_event_ids].mean())
+                                   [self.frequency[group].mean() for group in groups])
         self.orig = np.append(self.orig[select_other_events],
-                              self.orig[select_event_ids].max())
-        if self.ssi_wisc.size > 0:
-            self.ssi_wisc = np.append(self.ssi_wisc[select_other_events],
-                                      np.nan)
-        if self.ssi.size > 0:
-            self.ssi = np.append(self.ssi[select_other_events],
-                                 np.nan)
-        if self.ssi_full_area.size > 0:
-            self.ssi_full_area = np.append(self.ssi_full_area[select_other_events],
-                                           np.nan)
+                              [self.orig[group].max() for group in groups])
+        for var_name in ['ssi_wisc', 'ssi', 'ssi_full_area']:
+            var_val = getattr(self, var_name)
+            if var_val.size > 0:
+                setattr(self, var_name, np.append(var_val[select_other_events],
+                                                  np.full(len(groups), np.nan)))
         self.check()
 
     def calc_ssi(self, method='dawkins', intensity=None, on_land=True,
-                 threshold=None, sel_cen=None):
+                 threshold=None, sel_cen=None, chunk_size=None):
         """Calculate the SSI, method must either be 'dawkins' or 'wisc_gust'.
 
         'dawkins', after Dawkins et al. (2016),
@@ -300,6 +331,8 @@ class StormEurope(Hazard):
                 definition. Cannot be lower than the read-in value.
             sel_cen (np.array, bool): A boolean vector selecting centroids.
                 Takes precendence over on_land.
+            chunk_size (int, optional): number of events computed at once,
+                to limit memory with large probabilistic sets. Default: all
 
         Attributes:
             self.ssi_dawkins (np.array): SSI per event
@@ -307,17 +340,14 @@ class StormEurope(Hazard):
         if intensity is not None:
             if not isinstance(intensity, sparse.csr_matrix):
                 intensity = sparse.csr_matrix(intensity)
-            else:
-                pass
         else:
             intensity = self.intensity
 
         if threshold is not None:
             assert threshold >= self.intensity_thres, \
                 'threshold cannot be below threshold upon read_footprint'
-            intensity = intensity.multiply(intensity > threshold)
         else:
-            intensity = intensity.multiply(intensity > self.intensity_thres)
+            threshold = self.intensity_thres
 
         cent = self.centroids
 
@@ -329,19 +359,13 @@ class StormEurope(Hazard):
             sel_cen = np.ones_like(cent.area_pixel, dtype=bool)
 
         ssi = np.zeros(intensity.shape[0])
-
-        if method == 'dawkins':
-            area_c = cent.area_pixel / 1000 / 1000 * sel_cen
-            for i, inten_i in enumerate(intensity):
-                ssi_i = area_c * inten_i.power(3).todense().T
-                # matrix crossproduct (row x column vector)
-                ssi[i] = ssi_i.item(0)
-
-        elif method == 'wisc_gust':
-            for i, inten_i in enumerate(intensity[:, sel_cen]):
-                area = np.sum(cent.area_pixel[inten_i.indices]) / 1000 / 1000
-                inten_mean = np.mean(inten_i)
-                ssi[i] = area * np.power(inten_mean, 3)
+        if chunk_size is None:
+            chunk_size = max(intensity.shape[0], 1)
+        for i_chunk in range(0, intensity.shape[0], chunk_size):
+            inten_chunk = intensity[i_chunk:i_chunk + chunk_size]
+            inten_chunk = inten_chunk.multiply(inten_chunk > threshold).tocsr()
+            ssi[i_chunk:i_chunk + chunk_size] = _ssi_events(
+                inten_chunk, cent.area_pixel, sel_cen, method)
 
         return ssi
 
@@ -396,7 +420,7 @@ class StormEurope(Hazard):
         return fig, axs
 
     def generate_prob_storms(self, reg_id=528, spatial_shift=4, ssi_args={},
-                             **kwargs):
+                             n_threads=1, **kwargs):
         """Generates a new hazard set with one original and 29 probabilistic
         storms per historic storm. This represents a partial implementation of
         the Monte-Carlo method described in section 2.2 of Schwierz et al.
@@ -405,12 +429,13 @@ class StormEurope(Hazard):
         random alterations to the intensity.
 
         In a first step, the original intensity and five additional intensities
-        are saved to an array. In a second step, those 6 possible intensity
-        levels are shifted by n raster pixels into each direction (N/S/E/W).
+        are computed. In a second step, those 6 possible intensity levels are
+        shifted by n raster pixels into each direction (N/S/E/W). Only the
+        cells with intensity are computed, one sparse block per historic
+        storm. Use write_prob_storms to write large hazard sets to file while
+        they are generated.
 
         Caveats:
-            - Memory safety is an issue; trial with the entire dataset resulted
-              in 60GB of swap memory being used...
             - Can only use numeric region_id for country selection
             - Drops event names as provided by WISC
 
@@ -419,13 +444,94 @@ class StormEurope(Hazard):
                 countries we want the generated hazard set to be returned for.
             spatial_shift (int): amount of raster pixels to shift by
             ssi_args (dict): A dictionary of arguments passed to calc_ssi
+            n_threads (int, optional): number of threads generating the
+                storms of the historic storms. Default: 1
             **kwargs: keyword arguments passed on to self._hist2prob()
 
         Returns:
             new_haz (StormEurope): A new hazard set for the given country.
                 Centroid attributes are preserved. self.orig attribute is set
                 to True for original storms (event_id ending in 00). Also
-                contains a ssi_prob attribute,
+                contains a ssi_prob attribute.
+        """
+        new_haz, sel_cen = self._prob_storms_init(reg_id, spatial_shift)
+
+        LOGGER.info('Commencing probabilistic calculations')
+        blocks = list()
+        for index, (intensity_prob, ssi) in enumerate(self._prob_storms_blocks(
+                sel_cen, spatial_shift, ssi_args, n_threads, self.size, **kwargs)):
+            # indices for return matrix
+            start = index * N_PROB_EVENTS
+            end = (index + 1) * N_PROB_EVENTS
+            new_haz.ssi_full_area[start:end] = ssi
+            blocks.append(intensity_prob)
+
+        new_haz.intensity = sparse.vstack(blocks, format='csr') if blocks \
+                            else new_haz.intensity
+        new_haz.fraction = new_haz.intensity.copy()
+        new_haz.fraction.data.fill(1)
+
+        new_haz.check()
+
+        return new_haz
+
+    def write_prob_storms(self, file_name, reg_id=528, spatial_shift=4,
+                          ssi_args={}, n_threads=1, **kwargs):
+        """Write the hazard set of generate_prob_storms to an hdf5 file while
+        it is generated, instead of keeping it in memory. The events of
+        n_threads historic storms at a time are appended to the file. Read it
+        with read_hdf5.
+
+        Parameters:
+            file_name (str): hdf5 file name
+            region_id (int, list of ints, or None): iso_n3 code of the
+                countries we want the generated hazard set to be returned for.
+            spatial_shift (int): amount of raster pixels to shift by
+            ssi_args (dict): A dictionary of arguments passed to calc_ssi
+            n_threads (int, optional): number of threads generating the
+                storms of the historic storms. Default: 1
+            **kwargs: keyword arguments passed on to self._hist2prob()
+        """
+        new_haz, sel_cen = self._prob_storms_init(reg_id, spatial_shift)
+
+        # write all but the events, which are appended block by block
+        new_haz.check()
+        new_haz.write_hdf5(file_name)
+        with h5py.File(file_name, 'r+') as hf_data:
+            for var_name in ['intensity', 'fraction']:
+                for comp, dtype in [('data', float), ('indices', np.int32),
+                                    ('indptr', np.int64)]:
+                    del hf_data[var_name][comp]
+                    hf_data[var_name].create_dataset(comp, (0,), dtype=dtype,
+                                                     maxshape=(None,), chunks=True)
+                hf_data[var_name]['indptr'].resize((new_haz.size + 1,))
+
+            LOGGER.info('Commencing probabilistic calculations')
+            # a batch of historic storms at a time bounds the memory
+            for index, (intensity_prob, ssi) in enumerate(self._prob_storms_blocks(
+                    sel_cen, spatial_shift, ssi_args, n_threads, max(n_threads, 1),
+                    **kwargs)):
+                start = index * N_PROB_EVENTS
+                end = (index + 1) * N_PROB_EVENTS
+                new_haz.ssi_full_area[start:end] = ssi
+                for var_name in ['intensity', 'fraction']:
+                    _append_csr_rows(hf_data[var_name], intensity_prob, start,
+                                     var_name == 'fraction')
+
+            hf_data['ssi_full_area'][:] = new_haz.ssi_full_area
+
+    def _prob_storms_init(self, reg_id, spatial_shift):
+        """Probabilistic hazard set of generate_prob_storms without events
+        intensity.
+
+        Parameters:
+            region_id (int, list of ints, or None): see generate_prob_storms
+            spatial_shift (int): amount of raster pixels to shift by
+
+        Returns:
+            new_haz (StormEurope): hazard set with empty intensity and
+                fraction
+            sel_cen (np.array): bool vector selecting the targeted centroids
         """
         # bool vector selecting the targeted centroids
         if reg_id is not None:
@@ -443,29 +549,13 @@ class StormEurope(Hazard):
             ] = True
             sel_cen = sel_cen.reshape(self.centroids.size)
 
-        # init probabilistic array
         n_out = N_PROB_EVENTS * self.size
-        intensity_prob = sparse.lil_matrix((n_out, np.count_nonzero(sel_cen)))
-        ssi = np.zeros(n_out)
-
-        LOGGER.info('Commencing probabilistic calculations')
-        for index, intensity1d in enumerate(self.intensity):
-            # indices for return matrix
-            start = index * N_PROB_EVENTS
-            end = (index + 1) * N_PROB_EVENTS
-
-            intensity_prob[start:end, :], ssi[start:end] =\
-                self._hist2prob(
-                    intensity1d,
-                    sel_cen,
-                    spatial_shift,
-                    ssi_args,
-                    **kwargs)
+        n_sel = np.count_nonzero(sel_cen)
 
         LOGGER.info('Generating new StormEurope instance')
         new_haz = StormEurope()
-        new_haz.intensity = sparse.csr_matrix(intensity_prob)
-        new_haz.ssi_full_area = ssi
+        new_haz.intensity = sparse.csr_matrix((n_out, n_sel))
+        new_haz.ssi_full_area = np.zeros(n_out)
 
         # don't use synthetic dates; just repeat the historic dates
         new_haz.date = np.repeat(self.date, N_PROB_EVENTS)
@@ -487,20 +577,47 @@ class StormEurope(Hazard):
             description='WISC probabilistic hazard set according to Schwierz et al.'
         )
 
-        new_haz.fraction = new_haz.intensity.copy().tocsr()
-        new_haz.fraction.data.fill(1)
+        new_haz.fraction = new_haz.intensity.copy()
         new_haz.orig = (new_haz.event_id % 100 == 0)
+        return new_haz, sel_cen
 
-        new_haz.check()
+    def _prob_storms_blocks(self, sel_cen, spatial_shift, ssi_args, n_threads,
+                            batch_size, **kwargs):
+        """Generate the probabilistic storms of every historic storm in order,
+        see _hist2prob.
 
-        return new_haz
+        Parameters:
+            sel_cen (np.array): bool vector selecting the targeted centroids
+            spatial_shift (int): amount of raster pixels to shift by
+            ssi_args (dict): A dictionary of arguments passed to calc_ssi
+            n_threads (int): number of threads. Without thread pool if 1.
+            batch_size (int): number of historic storms submitted to the
+                threads at a time
+            **kwargs: keyword arguments passed on to self._hist2prob()
+
+        Returns:
+            generator of (sparse.csr_matrix, np.array): intensity and ssi of
+                the probabilistic storms of every historic storm
+        """
+        hist2prob = partial(self._hist2prob, sel_cen=sel_cen,
+                            spatial_shift=spatial_shift, ssi_args=ssi_args, **kwargs)
+        if n_threads <= 1:
+            for index in range(self.size):
+                yield hist2prob(self.intensity[index])
+            return
+        with ThreadPoolExecutor(n_threads) as executor:
+            for i_batch in range(0, self.size, batch_size):
+                batch = [self.intensity[index] for index in
+                         range(i_batch, min(i_batch + batch_size, self.size))]
+                yield from executor.map(hist2prob, batch)
 
     def _hist2prob(self, intensity1d, sel_cen, spatial_shift, ssi_args={},
                    power=1.15, scale=0.0225):
         """Internal function, intended to be called from generate_prob_storms.
         Generates six permutations based on one historical storm event, which
         it then moves around by spatial_shift gridpoints to the east, west, and
-        north.
+        north. Only the cells with intensity are computed; cells shifted in
+        from outside the raster have no intensity.
 
         Parameters
         ----------
@@ -519,61 +636,157 @@ class StormEurope(Hazard):
 
         Returns
         -------
-        intensity : np.array
+        intensity : scipy.sparse.csr_matrix
             Synthetic intensities of shape (N_PROB_EVENTS, length(sel_cen))
         ssi : np.array
             SSI per synthetic event according to provided method.
         """
-        shape_ndarray = tuple([N_PROB_EVENTS]) + self.centroids.shape
-
-        # reshape to the raster that the data represents
-        intensity2d = intensity1d.reshape(self.centroids.shape)
-
-        # scipy.sparse.csr.csr_matrix elementwise methods (to avoid this:
-        # https://github.com/ContinuumIO/anaconda-issues/issues/9129 )
-        intensity2d_sqrt = intensity2d.power(1.0 / power).todense()
-        intensity2d_pwr = intensity2d.power(power).todense()
-        intensity2d = intensity2d.todense()
-
-        # intermediary 3d array: (lat, lon, events)
-        intensity3d_prob = np.ndarray(shape_ndarray)
+        n_lat, n_lon = self.centroids.shape
+        intensity1d = sparse.csr_matrix(intensity1d)
+        inten = intensity1d.data
 
         # the six variants of intensity transformation
-        # 1. translation only
-        intensity3d_prob[0] = intensity2d
-
-        # 2. and 3. plusminus scaled sqrt
-        intensity3d_prob[1] = intensity2d - (scale * intensity2d_sqrt)
-        intensity3d_prob[2] = intensity2d + (scale * intensity2d_sqrt)
-
-        # 4. and 5. plusminus scaled power
-        intensity3d_prob[3] = intensity2d - (scale * intensity2d_pwr)
-        intensity3d_prob[4] = intensity2d + (scale * intensity2d_pwr)
-
-        # 6. minus scaled sqrt and pwr
-        intensity3d_prob[5] = (intensity2d
-                               - (0.5 * scale * intensity2d_pwr)
-                               - (0.5 * scale * intensity2d_sqrt))
-
-        # spatial shifts
-        # northward
-        intensity3d_prob[6:12, :-spatial_shift, :] = \
-            intensity3d_prob[0:6, spatial_shift:, :]
-        # southward
-        intensity3d_prob[12:18, spatial_shift:, :] = \
-            intensity3d_prob[0:6, :-spatial_shift, :]
-        # eastward
-        intensity3d_prob[18:24, :, spatial_shift:] = \
-            intensity3d_prob[0:6, :, :-spatial_shift]
-        # westward
-        intensity3d_prob[24:30, :, :-spatial_shift] = \
-            intensity3d_prob[0:6, :, spatial_shift:]
-
-        intensity_out = intensity3d_prob.reshape(
-            N_PROB_EVENTS,
-            np.prod(self.centroids.shape)
-        )
+        inten_sqrt = scale * np.power(inten, 1.0 / power)
+        inten_pwr = scale * np.power(inten, power)
+        variants = [
+            # 1. translation only
+            inten,
+            # 2. and 3. plusminus scaled sqrt
+            inten - inten_sqrt,
+            inten + inten_sqrt,
+            # 4. and 5. plusminus scaled power
+            inten - inten_pwr,
+            inten + inten_pwr,
+            # 6. minus scaled sqrt and pwr
+            inten - 0.5 * inten_pwr - 0.5 * inten_sqrt,
+        ]
+
+        # spatial shifts of the raster cells: none, northward, southward,
+        # eastward, westward
+        lat_idx, lon_idx = np.divmod(intensity1d.indices, n_lon)
+        indices, data, counts = list(), list(), list()
+        for shift_lat, shift_lon in [(0, 0), (-spatial_shift, 0), (spatial_shift, 0),
+                                     (0, spatial_shift), (0, -spatial_shift)]:
+            lat_shift, lon_shift = lat_idx + shift_lat, lon_idx + shift_lon
+            valid = (lat_shift >= 0) & (lat_shift < n_lat) \
+                    & (lon_shift >= 0) & (lon_shift < n_lon)
+            cen_shift = lat_shift[valid] * n_lon + lon_shift[valid]
+            for variant in variants:
+                indices.append(cen_shift)
+                data.append(variant[valid])
+                counts.append(cen_shift.size)
+
+        indptr = np.zeros(N_PROB_EVENTS + 1, int)
+        np.cumsum(counts, out=indptr[1:])
+        intensity_out = sparse.csr_matrix(
+            (np.concatenate(data).astype(float), np.concatenate(indices), indptr),
+            shape=(N_PROB_EVENTS, n_lat * n_lon))
+        intensity_out.eliminate_zeros()
 
         ssi = self.calc_ssi(intensity=intensity_out, **ssi_args)
 
         return intensity_out[:, sel_cen], ssi
+
+def _max_rows(matrix, new_row, n_rows):
+    """Maximum of the rows of a sparse matrix with the same new row.
+
+    Parameters:
+        matrix (sparse.csr_matrix): matrix with non-negative values
+        new_row (np.array): new row of every row of matrix
+        n_rows (int): number of new rows
+
+    Returns:
+        sparse.csr_matrix
+    """
+    coo = matrix.tocoo()
+    row = new_row[coo.row]
+    order = np.lexsort((coo.col, row))
+    row, col, data = row[order], coo.col[order], coo.data[order]
+    first = np.ones(row.size, bool)
+    first[1:] = (row[1:] != row[:-1]) | (col[1:] != col[:-1])
+    first = np.nonzero(first)[0]
+    if data.size:
+        data = np.maximum.reduceat(data, first)
+    return sparse.csr_matrix((data, (row[first], col[first])),
+                             shape=(n_rows, matrix.shape[1]))
+
+def _append_csr_rows(hf_csr, rows, start, fill_one=False):
+    """Append rows to a sparse matrix written in hdf5 as in Hazard.write_hdf5,
+    with resizable data and indices.
+
+    Parameters:
+        hf_csr (h5py.Group): sparse matrix with data, indices and indptr
+        rows (sparse.csr_matrix): rows to append
+        start (int): index of the first row
+        fill_one (bool, optional): write ones instead of the values of rows
+    """
+    nnz = hf_csr['data'].size
+    for comp, values in [('data', np.ones(rows.nnz) if fill_one else rows.data),
+                         ('indices', rows.indices)]:
+        hf_csr[comp].resize((nnz + rows.nnz,))
+        hf_csr[comp][nnz:] = values
+    hf_csr['indptr'][start + 1:start + 1 + rows.shape[0]] = nnz + rows.indptr[1:]
+
+def _ssi_events(intensity, area_pixel, sel_cen, method):
+    """SSI of every event of an intensity matrix above threshold.
+
+    Parameters:
+        intensity (sparse.csr_matrix): intensity above threshold
+        area_pixel (np.array): area of every centroid in m2
+        sel_cen (np.array): mask of centroids used
+        method (str): 'dawkins' or 'wisc_gust', see StormEurope.calc_ssi
+
+    Returns:
+        np.array
+    """
+    ssi = np.zeros(intensity.shape[0])
+    if method == 'dawkins':
+        area_c = area_pixel / 1000 / 1000 * sel_cen
+        ssi = intensity.power(3).dot(area_c)
+
+    elif method == 'wisc_gust':
+        inten_sel = intensity[:, sel_cen]
+        # area of the cells above threshold, indexed as the selected cells
+        above = sparse.csr_matrix((np.ones(inten_sel.nnz), inten_sel.indices,
+                                   inten_sel.indptr), shape=inten_sel.shape)
+        area = above.dot(area_pixel[:inten_sel.shape[1]]) / 1000 / 1000
+        inten_mean = np.asarray(inten_sel.mean(axis=1)).ravel()
+        ssi = area * np.power(inten_mean, 3)
+
+    return ssi
+
+def _read_footprint(file_name, centr_size, intensity_thres):
+    """Read the intensity above threshold of a single WISC footprint, as
+    sparse row. Assumes a time dimension of length 1.
+
+    Parameters:
+        file_name (str): Absolute or relative path to *.nc
+        centr_size (int): number of centroids, to validate the size of the
+            footprint
+        intensity_thres (float): intensity threshold for storage
+
+    Returns:
+        dict: name, date, ssi, indices and data of the footprint, or None if
+        the size of the footprint does not match
+    """
+    with _NC_LOCK, xr.open_dataset(file_name) as ncdf:
+        if centr_size != (ncdf.sizes['latitude'] * ncdf.sizes['longitude']):
+            LOGGER.warning(('Centroids size doesn\'t match NCDF dimensions. '
+                            'Omitting file %s.'), file_name)
+            return None
+
+        # same order of values as stacked latitude, longitude and time
+        values = ncdf.max_wind_gust.transpose('latitude', 'longitude', 'time')\
+                                   .values.ravel()
+        name = ncdf.storm_name
+        date = datetime64_to_ordinal(ncdf.time.data[0])
+        ssi = float(ncdf.ssi)
+
+    indices = np.nonzero(values > intensity_thres)[0]
+    return {
+        'name': name,
+        'date': date,
+        'ssi': ssi,
+        'indices': indices,
+        'data': values[indices],
+    }
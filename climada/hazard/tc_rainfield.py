@@ -17,7 +17,9 @@ __all__ = ['TCRain']
 
 import itertools
 import logging
+import copy
 import datetime as dt
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 from numba import jit
 from scipy import sparse
@@ -25,12 +27,19 @@ from scipy import sparse
 from climada.hazard.base import Hazard
 from climada.hazard.trop_cyclone import TropCyclone
 from climada.hazard.tag import Tag as TagHazard
+from climada.hazard.tc_tracks_packed import PackedTracks
 from climada.hazard.centroids.centr import Centroids
 
 LOGGER = logging.getLogger(__name__)
 
 HAZ_TYPE = 'TR'
 
+WIND_TO_KN = {'kn': 1., 'km/h': 1 / 1.852, 'mph': 1 / 1.151, 'm/s': 3600 / 1852}
+"""Factors converting max sustained wind to knots"""
+
+MAX_GRID_CELLS = 1e7
+"""Maximum number of cells of the grid indexing the centroids"""
+
 class TCRain(Hazard):
     """Contains rainfall from tropical cyclone events."""
 
@@ -49,9 +58,10 @@ class TCRain(Hazard):
             self.pool = None
 
     def set_from_tracks(self, tracks, centroids=None, dist_degree=3,
-                        description=''):
+                        description='', n_threads=1):
         """Computes rainfield from tracks based on the RCLIPER model.
-        Parallel process.
+        The tracks are processed in chunks, in parallel processes if a pool
+        is set, otherwise in threads sharing the centroids.
         Parameters:
             tracks (TCTracks): tracks of events
             centroids (Centroids, optional): Centroids where to model TC.
@@ -59,7 +69,8 @@ class TCRain(Hazard):
             disr_degree (int): distance (in degrees) from node within which
                                the rainfield is processed (default 3 deg,~300km)
             description (str, optional): description of the events
-
+            n_threads (int, optional): number of threads used if no pool is
+                set. Default: 1
         """
         num_tracks = tracks.size
         if centroids is None:
@@ -70,27 +81,35 @@ class TCRain(Hazard):
 
         LOGGER.info('Mapping %s tracks to %s centroids.', str(tracks.size),
                     str(centroids.size))
-        if self.pool:
-            chunksize = min(num_tracks // self.pool.ncpus, 1000)
-            tc_haz = self.pool.map(self._set_from_track, tracks.data,
-                                   itertools.repeat(centroids, num_tracks),
-                                   itertools.repeat(dist_degree, num_tracks),
-                                   itertools.repeat(self.intensity_thres, num_tracks),
-                                   chunksize=chunksize)
+        t_lat, t_lon, t_wind, offsets = _track_nodes(tracks.data)
+        centr = _centroids_grid(centroids.lat, centroids.lon, dist_degree)
+
+        n_workers = self.pool.ncpus if self.pool else max(n_threads, 1)
+        bounds = np.unique(np.linspace(0, num_tracks, 4 * n_workers + 1).astype(int))
+        chunks = [(t_lat[offsets[start]:offsets[end]], t_lon[offsets[start]:offsets[end]],
+                   t_wind[offsets[start]:offsets[end]],
+                   offsets[start:end + 1] - offsets[start])
+                  for start, end in zip(bounds[:-1], bounds[1:])]
+        chunk_args = [[chunk[i_arg] for chunk in chunks] for i_arg in range(4)] \
+                     + [itertools.repeat(arg, len(chunks))
+                        for arg in centr + (dist_degree, self.intensity_thres)]
+        if self.pool and len(chunks) > 1:
+            inten = self.pool.map(_rain_chunk, *chunk_args)
+        elif n_workers > 1 and len(chunks) > 1:
+            with ThreadPoolExecutor(n_workers) as executor:
+                inten = list(executor.map(_rain_chunk, *chunk_args))
         else:
-            tc_haz = list()
-            for track in tracks.data:
-                tc_haz.append(self._set_from_track(track, centroids,
-                                                   dist_degree=dist_degree,
-                                                   intensity=self.intensity_thres))
-        LOGGER.debug('Append events.')
-        self.concatenate(tc_haz)
+            inten = list(map(_rain_chunk, *chunk_args))
+        inten = sparse.vstack(inten, format='csr') if inten \
+                else sparse.csr_matrix((0, centroids.size))
+
+        LOGGER.debug('Set events.')
+        self._set_events(tracks.data, copy.deepcopy(centroids), inten)
         LOGGER.debug('Compute frequency.')
         TropCyclone.frequency_from_tracks(self, tracks.data)
         self.tag.description = description
 
     @staticmethod
-    @jit(forceobj=True)
     def _set_from_track(track, centroids, dist_degree=3, intensity=0.1):
         """Set hazard from track and centroids.
         Parameters:
@@ -104,25 +123,47 @@ class TCRain(Hazard):
             TCRain
         """
         new_haz = TCRain()
-        new_haz.tag = TagHazard(HAZ_TYPE, 'IBTrACS: ' + track.name)
-        new_haz.intensity = rainfield_from_track(track, centroids,
-                                                 dist_degree, intensity)
-        new_haz.units = 'mm'
-        new_haz.centroids = centroids
-        new_haz.event_id = np.array([1])
+        new_haz._set_events([track], centroids, rainfield_from_track(
+            track, centroids, dist_degree, intensity))
+        return new_haz
+
+    def _set_events(self, tracks, centroids, intensity):
+        """Set the events of the tracks with given intensity. Frequency is set
+        to one for every event, see set_from_tracks.
+        Parameters:
+            tracks (list(xr.Dataset) or PackedTracks): tropical cyclone tracks
+            centroids (Centroids): Centroids instance.
+            intensity (sparse.csr_matrix): rainfall of every track
+        """
+        if isinstance(tracks, PackedTracks):
+            attrs = {attr: tracks.attrs[attr].tolist()
+                     for attr in ['name', 'sid', 'orig_event_flag', 'category', 'basin']}
+            first_time = tracks.time[tracks.offsets[:-1]]
+        else:
+            attrs = {attr: [track.attrs[attr] for track in tracks]
+                     for attr in ['name', 'sid', 'orig_event_flag', 'category', 'basin']}
+            first_time = np.array([track.time.values[0] for track in tracks],
+                                  'datetime64[ns]')
+        file_names = ['IBTrACS: ' + name for name in attrs['name']]
+        self.tag = TagHazard(HAZ_TYPE, file_names[0] if len(file_names) == 1
+                             else file_names)
+        if len(file_names) > 1:
+            self.tag.description = [''] * len(file_names)
+        self.units = 'mm'
+        self.centroids = centroids
+        self.intensity = intensity
+        self.event_id = np.arange(1, len(file_names) + 1)
         # frequency set when all tracks available
-        new_haz.frequency = np.array([1])
-        new_haz.event_name = [track.sid]
-        new_haz.fraction = new_haz.intensity.copy()
-        new_haz.fraction.data.fill(1)
+        self.frequency = np.ones(len(file_names))
+        self.event_name = attrs['sid']
+        self.fraction = intensity.copy()
+        self.fraction.data.fill(1)
         # store date of start
-        new_haz.date = np.array([dt.datetime(
-            track.time.dt.year[0], track.time.dt.month[0],
-            track.time.dt.day[0]).toordinal()])
-        new_haz.orig = np.array([track.orig_event_flag])
-        new_haz.category = np.array([track.category])
-        new_haz.basin = [track.basin]
-        return new_haz
+        self.date = first_time.astype('datetime64[D]').astype(int) \
+                    + dt.date(1970, 1, 1).toordinal()
+        self.orig = np.array(attrs['orig_event_flag'], bool)
+        self.category = np.array(attrs['category'], int)
+        self.basin = attrs['basin']
 
 def rainfield_from_track(track, centroids, dist_degree=3, intensity=0.1):
     """Compute rainfield for track at centroids.
@@ -133,63 +174,165 @@ def rainfield_from_track(track, centroids, dist_degree=3, intensity=0.1):
                            the rainfield is processed (default 3 deg,~300km)
         intensity (int): min intensity threshold below which values are not
                          considered
+    Returns:
+        sparse.csr_matrix
     """
-    dlon, dlat = dist_degree, dist_degree
-
-    n_track_nodes = len(track.lat)
-    n_centroids = len(centroids.lat)
-    cos_centroids_lat = np.cos(centroids.lat / 180 * np.pi)
-
-    rainsum = np.zeros(n_centroids)
-
-    # transform wind speed in knots
-    if track.max_sustained_wind_unit == 'kn':
-        pass
-    elif track.max_sustained_wind_unit == 'km/h':
-        track.max_sustained_wind /= 1.852
-    elif track.max_sustained_wind_unit == 'mph':
-        track.max_sustained_wind /= 1.151
-    elif track.max_sustained_wind_unit == 'm/s':
-        track.max_sustained_wind /= (1000 * 60 * 60)
-        track.max_sustained_wind /= 1.852
-
-    track.attrs['max_sustained_wind_unit'] = 'kn'
-
-    lats = track.lat.values
-    lons = track.lon.values
-
-    for node in range(n_track_nodes):
-        inreach = (np.abs(centroids.lat - lats[node]) < dlat) \
-                & (np.abs(centroids.lon - lons[node]) < dlon)
+    t_lat, t_lon, t_wind, offsets = _track_nodes([track])
+    return _rain_chunk(t_lat, t_lon, t_wind, offsets,
+                       *_centroids_grid(centroids.lat, centroids.lon, dist_degree),
+                       dist_degree, intensity)
 
-        if inreach.any():
-            pos = np.where(inreach)[0]
-
-            fradius_km = np.zeros(n_centroids)
-            dd = ((lons[node] - centroids.lon[pos]) * cos_centroids_lat[pos])**2 \
-                + (lats[node] - centroids.lat[pos])**2
-
-            fradius_km[pos] = np.sqrt(dd) * 111.12
-
-            rainsum += _RCLIPER(track.max_sustained_wind.values[node],
-                                inreach, fradius_km)
-
-    rainsum[rainsum < intensity] = 0
-
-    return sparse.csr_matrix(rainsum)
-
-def _RCLIPER(fmaxwind_kn, inreach, radius_km):
+def _track_nodes(tracks):
+    """Coordinates and max sustained wind in knots of the nodes of all tracks.
+    Parameters:
+        tracks (list(xr.Dataset) or PackedTracks): tropical cyclone tracks
+    Returns:
+        lat, lon, wind (np.array), offsets (np.array, node offsets of the tracks)
+    Raises:
+        ValueError
+    """
+    if isinstance(tracks, PackedTracks):
+        units = tracks.attrs['max_sustained_wind_unit']
+        lat, lon = tracks.nodes['lat'], tracks.nodes['lon']
+        wind = tracks.nodes['max_sustained_wind']
+        offsets = tracks.offsets
+    else:
+        units = np.array([track.max_sustained_wind_unit for track in tracks])
+        lat = np.concatenate([track.lat.values for track in tracks] + [np.zeros(0)])
+        lon = np.concatenate([track.lon.values for track in tracks] + [np.zeros(0)])
+        wind = np.concatenate([track.max_sustained_wind.values for track in tracks]
+                              + [np.zeros(0)])
+        offsets = np.zeros(len(tracks) + 1, int)
+        np.cumsum([track.time.size for track in tracks], out=offsets[1:])
+    unknown = np.setdiff1d(units, list(WIND_TO_KN))
+    if unknown.size:
+        LOGGER.error('Unit not recognised %s.', unknown[0])
+        raise ValueError
+    factor = np.array([WIND_TO_KN[unit] for unit in units.tolist()])
+    wind_kn = wind * np.repeat(factor, np.diff(offsets))
+    return (lat.astype(float), lon.astype(float), wind_kn.astype(float),
+            offsets.astype(np.int64))
+
+def _centroids_grid(lat, lon, cell_size):
+    """Index of centroids by cells of a regular grid.
+    Parameters:
+        lat (np.array): latitude of centroids
+        lon (np.array): longitude of centroids
+        cell_size (float): cell size in degrees (at least)
+    Returns:
+        lat, lon, cos_lat (np.array), grid (np.array: lat0, lon0, cell_size,
+        n_rows, n_cols), cell_start (np.array, position of first centroid of
+        every cell in cell_centr), cell_centr (np.array, centroids ordered by
+        cell)
+    """
+    lat, lon = np.asarray(lat, float), np.asarray(lon, float)
+    cos_lat = np.cos(lat / 180 * np.pi)
+    valid = (np.isfinite(lat) & np.isfinite(lon)).nonzero()[0]
+    if not valid.size:
+        return (lat, lon, cos_lat, np.array([0., 0., 1., 0., 0.]),
+                np.zeros(1, np.int64), np.zeros(0, np.int64))
+    lat0, lon0 = lat[valid].min(), lon[valid].min()
+    span = max(lat[valid].max() - lat0, lon[valid].max() - lon0)
+    cell_size = max(cell_size, span / np.sqrt(MAX_GRID_CELLS), 1e-6)
+    rows = ((lat[valid] - lat0) // cell_size).astype(np.int64)
+    cols = ((lon[valid] - lon0) // cell_size).astype(np.int64)
+    n_rows, n_cols = rows.max() + 1, cols.max() + 1
+    cell = rows * n_cols + cols
+    cell_start = np.zeros(n_rows * n_cols + 1, np.int64)
+    np.cumsum(np.bincount(cell, minlength=n_rows * n_cols), out=cell_start[1:])
+    cell_centr = valid[np.argsort(cell, kind='stable')].astype(np.int64)
+    grid = np.array([lat0, lon0, cell_size, n_rows, n_cols], float)
+    return lat, lon, cos_lat, grid, cell_start, cell_centr
+
+def _rain_chunk(t_lat, t_lon, t_wind, offsets, c_lat, c_lon, cos_c_lat, grid,
+                cell_start, cell_centr, dist_degree, intensity):
+    """Rainfield of tracks at centroids indexed with _centroids_grid.
+    Parameters:
+        t_lat, t_lon, t_wind (np.array): lat, lon and max sustained wind in
+            knots of the nodes of all tracks
+        offsets (np.array): node offsets of the tracks
+        c_lat, c_lon, cos_c_lat, grid, cell_start, cell_centr: see
+            _centroids_grid
+        dist_degree (float): distance (in degrees) from node within which
+            the rainfield is processed
+        intensity (float): min intensity threshold below which values are not
+            considered
+    Returns:
+        sparse.csr_matrix (tracks x centroids)
+    """
+    indptr, indices, data = _rain_tracks(t_lat, t_lon, t_wind, offsets, c_lat, c_lon,
+                                         cos_c_lat, grid, cell_start, cell_centr,
+                                         float(dist_degree), float(intensity))
+    inten = sparse.csr_matrix((data, indices, indptr),
+                              shape=(offsets.size - 1, c_lat.size))
+    inten.sort_indices()
+    return inten
+
+@jit(nopython=True, nogil=True)
+def _rain_tracks(t_lat, t_lon, t_wind, offsets, c_lat, c_lon, cos_c_lat, grid,
+                 cell_start, cell_centr, dist_degree, intensity):
+    """Sum RCLIPER rain rates of the nodes of every track at the centroids
+    in reach, looking up the centroids in the grid cells around every node.
+    Returns the rainfields of the tracks as csr arrays indptr, indices,
+    data."""
+    lat0, lon0, cell_size = grid[0], grid[1], grid[2]
+    n_rows, n_cols = int(grid[3]), int(grid[4])
+    n_tracks = offsets.size - 1
+    rainsum = np.zeros(c_lat.size)
+    touched = np.zeros(c_lat.size, np.bool_)
+    touched_idx = np.zeros(c_lat.size, np.int64)
+    indptr = np.zeros(n_tracks + 1, np.int64)
+    indices = np.zeros(1024, np.int64)
+    data = np.zeros(1024)
+    n_nz = 0
+    for i_track in range(n_tracks):
+        n_touched = 0
+        for node in range(offsets[i_track], offsets[i_track + 1]):
+            n_lat, n_lon = t_lat[node], t_lon[node]
+            if not (np.isfinite(n_lat) and np.isfinite(n_lon)) or n_rows == 0:
+                continue
+            row_0 = max(int(np.floor((n_lat - dist_degree - lat0) / cell_size)), 0)
+            row_1 = min(int(np.floor((n_lat + dist_degree - lat0) / cell_size)), n_rows - 1)
+            col_0 = max(int(np.floor((n_lon - dist_degree - lon0) / cell_size)), 0)
+            col_1 = min(int(np.floor((n_lon + dist_degree - lon0) / cell_size)), n_cols - 1)
+            for row in range(row_0, row_1 + 1):
+                for i_cell in range(row * n_cols + col_0, row * n_cols + col_1 + 1):
+                    for i_pos in range(cell_start[i_cell], cell_start[i_cell + 1]):
+                        i_centr = cell_centr[i_pos]
+                        if abs(c_lat[i_centr] - n_lat) >= dist_degree \
+                        or abs(c_lon[i_centr] - n_lon) >= dist_degree:
+                            continue
+                        d_lon = (n_lon - c_lon[i_centr]) * cos_c_lat[i_centr]
+                        d_lat = n_lat - c_lat[i_centr]
+                        radius_km = np.sqrt(d_lon**2 + d_lat**2) * 111.12
+                        if not touched[i_centr]:
+                            touched[i_centr] = True
+                            touched_idx[n_touched] = i_centr
+                            n_touched += 1
+                        rainsum[i_centr] += _rcliper(t_wind[node], radius_km)
+
+        for i_touched in range(n_touched):
+            i_centr = touched_idx[i_touched]
+            if rainsum[i_centr] >= intensity and rainsum[i_centr] != 0:
+                if n_nz == indices.size:
+                    indices = np.concatenate((indices, np.zeros(n_nz, np.int64)))
+                    data = np.concatenate((data, np.zeros(n_nz)))
+                indices[n_nz] = i_centr
+                data[n_nz] = rainsum[i_centr]
+                n_nz += 1
+            rainsum[i_centr] = 0
+            touched[i_centr] = False
+        indptr[i_track + 1] = n_nz
+    return indptr, indices[:n_nz], data[:n_nz]
+
+@jit(nopython=True, nogil=True)
+def _rcliper(fmaxwind_kn, radius_km):
     """Calculate rainrate in mm/h based on RCLIPER given windspeed (kn) at
     a specific node
     Parameters:
         fmaxwind_kn (float): maximum sustained wind at specific node
-        inreach (np.array, boolean): 1 if centroid is within dist_degree,
-                                         0 otherwise
-        radius_km (np.array): distance to node for every centroid
+        radius_km (float): distance to node of a centroid
     """
-
-    rainrate = np.zeros(len(inreach))
-
     # Define Coefficients (CLIPER NHC bias adjusted (Tuleya, 2007))
     a1 = -1.1  # inch per day
     a2 = -1.6  # inch per day
@@ -208,14 +351,13 @@ def _RCLIPER(fmaxwind_kn, inreach, radius_km):
     rm = a3 + b3 * u_norm_kn
     r0 = a4 + b4 * u_norm_kn
 
-    i = (radius_km <= rm) & inreach
-    ii = (radius_km > rm) & inreach
-
     # Calculate R-Cliper symmetric rain rate in mm/h
-    rainrate[i] = (T0 + (Tm - T0) * (radius_km[i] / rm)) / 24. * 25.4
-    rainrate[ii] = (Tm * np.exp(-(radius_km[ii] - rm) / r0)) / 24. * 25.4
-
-    rainrate[np.isnan(rainrate)] = 0
-    rainrate[rainrate < 0] = 0
-
+    rainrate = 0.
+    if radius_km <= rm:
+        rainrate = (T0 + (Tm - T0) * (radius_km / rm)) / 24. * 25.4
+    elif radius_km > rm:
+        rainrate = (Tm * np.exp(-(radius_km - rm) / r0)) / 24. * 25.4
+
+    if np.isnan(rainrate) or rainrate < 0:
+        return 0.
     return rainrate
@@ -24,10 +24,11 @@ __all__ = ['CAT_NAMES', 'SAFFIR_SIM_CAT', 'TCTracks', 'set_category']
 import os
 import glob
 import shutil
+import itertools
+import tempfile
 import logging
 import warnings
 import datetime as dt
-import itertools
 import numpy as np
 import matplotlib.cm as cm_mp
 from matplotlib.lines import Line2D
@@ -36,10 +37,9 @@ from matplotlib.colors import BoundaryNorm, ListedColormap
 import cartopy.crs as ccrs
 import pandas as pd
 import xarray as xr
-from sklearn.neighbors import DistanceMetric
 import netCDF4 as nc
-from numba import jit
 import scipy.io.matlab as matlab
+from scipy import interpolate
 import statsmodels.api as sm
 
 from climada.util import ureg
@@ -48,6 +48,7 @@ from climada.util.constants import EARTH_RADIUS_KM, SYSTEM_DIR
 from climada.util.files_handler import get_file_names, download_ftp
 import climada.util.plot as u_plot
 import climada.hazard.tc_tracks_synth
+from climada.hazard.tc_tracks_packed import PackedTracks, group_tracks
 
 LOGGER = logging.getLogger(__name__)
 
@@ -77,6 +78,12 @@ s. https://www.ncdc.noaa.gov/ibtracs/index.php?name=ib-v4-access"""
 IBTRACS_FILE = 'IBTrACS.ALL.v04r00.nc'
 """IBTrACS v4.0 file all"""
 
+IBTRACS_CACHE_DIR = os.path.join(SYSTEM_DIR, 'ibtracs_cache')
+"""Folder of the preprocessed IBTrACS tracks, see read_ibtracs_netcdf"""
+
+IBTRACS_CACHE_VERSION = '1'
+"""Version of the format of the preprocessed IBTrACS tracks"""
+
 IBTRACS_AGENCIES = [
     'wmo', 'usa', 'tokyo', 'newdelhi', 'reunion', 'bom', 'nadi', 'wellington',
     'cma', 'hko', 'ds824', 'td9636', 'td9635', 'neumann', 'mlc',
@@ -112,6 +119,10 @@ EMANUEL_RMW_CORR_FACTOR = 2.0
 """Kerry Emanuel track files in this list require a correction: The radius of
     maximum wind (rmstore) needs to be multiplied by factor 2."""
 
+TRACK_INDEX_ATTRS = ['sid', 'name', 'basin', 'category', 'year']
+"""Track attributes indexed for get_track and subset. year is the year of the
+first time step."""
+
 class TCTracks():
     """Contains tropical cyclone tracks.
 
@@ -138,6 +149,14 @@ class TCTracks():
             computed during processing:
                 - on_land
                 - dist_since_lf
+            After `pack`, data is a PackedTracks instance which is indexed
+            and iterated like the list, see `pack`.
+            The tracks are indexed by the attributes in TRACK_INDEX_ATTRS for
+            `get_track` and `subset`. The index is extended when tracks are
+            appended and rebuilt when data is set or changed otherwise, or
+            when a matching track does not have the looked up value anymore.
+            Call `reindex` after changing attributes of tracks in place for
+            the tracks to be found by their new values.
     """
     def __init__(self, pool=None):
         """Empty constructor. Read csv IBTrACS files if provided."""
@@ -148,16 +167,130 @@ class TCTracks():
         else:
             self.pool = None
 
+    @property
+    def data(self):
+        """Tropical cyclone tracks, see class attributes"""
+        return self._data
+
+    @data.setter
+    def data(self, data):
+        if not isinstance(data, (PackedTracks, _TrackList)):
+            data = _TrackList(data)
+        self._data = data
+        self.reindex()
+
+    def reindex(self):
+        """Drop the index of the track attributes, it is rebuilt on the next
+        `get_track` or `subset`."""
+        self._index = None
+        self._index_size = 0
+        self._index_changes = None
+
+    def _track_index(self):
+        """Index of the tracks: for every attribute of TRACK_INDEX_ATTRS a
+        dict of the indices of the tracks by attribute value. Tracks added to
+        the list since the last call are indexed.
+
+        Returns:
+            dict(dict(list(int)))
+        """
+        n_changes = None if self.is_packed else self.data.n_changes
+        if self._index is None or self._index_size > self.size \
+           or self._index_changes != n_changes:
+            self._index = {attr: dict() for attr in TRACK_INDEX_ATTRS}
+            self._index_size = 0
+            self._index_changes = n_changes
+        if self._index_size == self.size:
+            return self._index
+
+        new_idx = np.arange(self._index_size, self.size)
+        for attr, attr_values in self._index_values(new_idx).items():
+            attr_index = self._index[attr]
+            for i_track, value in zip(new_idx.tolist(), attr_values):
+                attr_index.setdefault(_index_key(value), []).append(i_track)
+        self._index_size = self.size
+        return self._index
+
+    def _index_values(self, track_idx):
+        """Values of the attributes of TRACK_INDEX_ATTRS of given tracks.
+
+        Parameters:
+            track_idx (np.array): indices of the tracks
+
+        Returns:
+            dict(list or np.array)
+        """
+        if self.is_packed:
+            values = {attr: self.data.attrs[attr][track_idx]
+                      for attr in TRACK_INDEX_ATTRS if attr in self.data.attrs}
+            first = self.data.offsets[track_idx]
+            valid = first < self.data.offsets[track_idx + 1]
+            values['year'] = np.full(track_idx.size, None, object)
+            values['year'][valid] = _datetime_year(self.data.time[first[valid]])
+        else:
+            tracks = [self.data[i_track] for i_track in track_idx]
+            values = {attr: [track.attrs.get(attr) for track in tracks]
+                      for attr in TRACK_INDEX_ATTRS}
+            values['year'] = [int(_datetime_year(track.time.values[0])) if track.time.size
+                              else None for track in tracks]
+        return values
+
+    def _index_match(self, attr, value):
+        """Indices of the tracks with given value of an indexed attribute. The
+        index is rebuilt if one of the indexed tracks has another value now.
+
+        Parameters:
+            attr (str): attribute of TRACK_INDEX_ATTRS
+            value: attribute value
+
+        Returns:
+            list(int)
+        """
+        key = _index_key(value)
+        match = self._track_index()[attr].get(key, [])
+        if match and any(_index_key(val) != key for val in
+                         self._index_values(np.array(match, int))[attr]):
+            self.reindex()
+            match = self._track_index()[attr].get(key, [])
+        return match
+
     def append(self, tracks):
         """Append tracks to current.
 
         Parameters:
-            tracks (xarray.Dataset or list(xarray.Dataset)): tracks to append.
+            tracks (xarray.Dataset or list(xarray.Dataset) or TCTracks): tracks
+                to append.
         """
-        if not isinstance(tracks, list):
+        if isinstance(tracks, TCTracks):
+            tracks = list(tracks.data)
+        elif not isinstance(tracks, list):
             tracks = [tracks]
+        self.unpack()
         self.data.extend(tracks)
 
+    def pack(self):
+        """Store the tracks in concatenated node arrays (see PackedTracks)
+        instead of a list of xarray.Dataset. Indexing and iterating data still
+        gives xarray.Dataset tracks, but these are views built on access:
+        changes to their attributes are lost. Use `unpack` before modifying
+        tracks in place.
+
+        Raises:
+            ValueError
+        """
+        if not isinstance(self.data, PackedTracks):
+            self.data = PackedTracks(self.data)
+
+    def unpack(self):
+        """Store the tracks as list of xarray.Dataset again, see `pack`."""
+        if isinstance(self.data, PackedTracks):
+            self.data = self.data.to_list()
+
+    @property
+    def is_packed(self):
+        """Whether the tracks are stored in concatenated node arrays"""
+        return isinstance(self.data, PackedTracks)
+
     def get_track(self, track_name=None):
         """Get track with provided name. Return all tracks if no name provided.
         Returns the first matching track based on the assumption that no other
@@ -175,18 +308,17 @@ class TCTracks():
                 return self.data[0]
             return self.data
 
-        for track in self.data:
-            if track.name == track_name:
-                return track
-            if hasattr(track, 'sid') and track.sid == track_name:
-                return track
+        match = self._index_match('name', track_name) + self._index_match('sid', track_name)
+        if match:
+            return self.data[min(match)]
 
         LOGGER.info('No track with name or sid %s found.', track_name)
         return []
 
     def subset(self, filterdict):
         """Subset tracks based on attributes. Currently only uses exact matches.
-        Returns a new instance.
+        Returns a new instance. Filters on the attributes of TRACK_INDEX_ATTRS
+        use the index of the tracks.
 
         Parameters:
             filterdict (dict): Of the form {'sid': 'pattern', ...}. Although
@@ -194,17 +326,31 @@ class TCTracks():
                 magnitude should come first.
         """
         out = self.__class__(self.pool)
-        out.data = self.data
-
+        select = None
         for key, pattern in filterdict.items():
-            out.data = [ds for ds in out.data if ds.attrs[key] == pattern]
-
+            if key in TRACK_INDEX_ATTRS:
+                match = self._index_match(key, pattern)
+            elif self.is_packed:
+                match = np.nonzero(self.data.attrs[key] == pattern)[0]
+            else:
+                match = [i_track for i_track, track in enumerate(self.data)
+                         if track.attrs[key] == pattern]
+            select = set(match) if select is None else select.intersection(match)
+        if select is None:
+            out.data = self.data
+            return out
+
+        select = np.array(sorted(select), int)
+        if self.is_packed:
+            out.data = self.data.select(select)
+        else:
+            out.data = [self.data[i_track] for i_track in select]
         return out
 
     def read_ibtracs_netcdf(self, provider=None, storm_id=None,
                             year_range=None, basin=None, estimate_missing=False,
                             correct_pres=False,
-                            file_name='IBTrACS.ALL.v04r00.nc'):
+                            file_name='IBTrACS.ALL.v04r00.nc', use_cache=False):
         """Fill from raw ibtracs v04. Removes nans in coordinates, central
         pressure and removes repeated times data. Fills nans of environmental_pressure
         and radius_max_wind. Checks environmental_pressure > central_pressure.
@@ -226,6 +372,11 @@ class TCTracks():
                 `estimate_missing` instead!
             file_name (str, optional): name of netcdf file to be dowloaded or located
                 at climada/data/system. Default: 'IBTrACS.ALL.v04r00.nc'.
+            use_cache (bool, optional): read the tracks from a preprocessed
+                local store of all the tracks of the file, which is written
+                on first use for each provider and estimate_missing, and
+                rewritten when the file changes. The tracks are packed
+                (see `pack`). Default: False
         """
         if correct_pres:
             LOGGER.warning("`correct_pres` is deprecated. "
@@ -243,159 +394,35 @@ class TCTracks():
                              'climada_python/data/system/', IBTRACS_URL)
                 raise err
 
-        ibtracs_ds = xr.open_dataset(fn_nc)
-        match = np.ones(ibtracs_ds.sid.shape[0], dtype=bool)
-        if storm_id:
-            if not isinstance(storm_id, list):
-                storm_id = [storm_id]
-            match &= ibtracs_ds.sid.isin([i.encode() for i in storm_id])
-            if np.count_nonzero(match) == 0:
-                LOGGER.info('No tracks with given IDs %s.', storm_id)
-        else:
+        if storm_id and not isinstance(storm_id, list):
+            storm_id = [storm_id]
+        if not storm_id:
             year_range = year_range if year_range else (1980, 2018)
-        if year_range:
-            years = ibtracs_ds.sid.str.slice(0, 4).astype(int)
-            match &= (years >= year_range[0]) & (years <= year_range[1])
-            if np.count_nonzero(match) == 0:
-                LOGGER.info('No tracks in time range (%s, %s).', *year_range)
-        if basin:
-            match &= (ibtracs_ds.basin == basin.encode()).any(dim='date_time')
-            if np.count_nonzero(match) == 0:
-                LOGGER.info('No tracks in basin %s.', basin)
 
-        if np.count_nonzero(match) == 0:
-            LOGGER.info('There are no tracks matching the specified requirements.')
-            self.data = []
+        if use_cache:
+            with xr.open_dataset(_ibtracs_cache(fn_nc, provider, estimate_missing)) \
+                    as cache_ds:
+                match = _ibtracs_match(cache_ds.sid.values.astype(str), storm_id, year_range,
+                                       lambda bas: np.array([
+                                           bas in st_bas.split()
+                                           for st_bas in cache_ds.ibtracs_basins.values
+                                           .astype(str)
+                                       ], bool),
+                                       basin)
+                if np.count_nonzero(match) > 0:
+                    # reads the nodes of the selected tracks into memory
+                    self.data = PackedTracks.from_dataset(cache_ds, match)
             return
 
-        ibtracs_ds = ibtracs_ds.sel(storm=match)
-        ibtracs_ds['valid_t'] = ibtracs_ds.time.notnull()
-        valid_st = ibtracs_ds.valid_t.any(dim="date_time")
-        invalid_st = np.nonzero(~valid_st.data)[0]
-        if invalid_st.size > 0:
-            st_ids = ', '.join(ibtracs_ds.sid.sel(storm=invalid_st).astype(str).data)
-            LOGGER.warning('No valid timestamps found for %s.', st_ids)
-            ibtracs_ds = ibtracs_ds.sel(storm=valid_st)
-
-        if not provider:
-            agency_pref, track_agency_ix = ibtracs_track_agency(ibtracs_ds)
-
-        for var in ['wind', 'pres', 'rmw', 'poci', 'roci']:
-            if provider:
-                # enforce use of specified provider's data points
-                ibtracs_ds[var] = ibtracs_ds[f'{provider}_{var}']
-            else:
-                # array of values in order of preference
-                cols = [f'{a}_{var}' for a in agency_pref]
-                cols = [col for col in cols if col in ibtracs_ds.data_vars.keys()]
-                all_vals = ibtracs_ds[cols].to_array(dim='agency')
-                preferred_ix = all_vals.notnull().argmax(dim='agency')
-
-                if var in ['wind', 'pres']:
-                    # choice: wmo -> wmo_agency/usa_agency -> preferred
-                    ibtracs_ds[var] = ibtracs_ds['wmo_' + var] \
-                        .fillna(all_vals.isel(agency=track_agency_ix)) \
-                        .fillna(all_vals.isel(agency=preferred_ix))
-                else:
-                    ibtracs_ds[var] = all_vals.isel(agency=preferred_ix)
-        ibtracs_ds = ibtracs_ds[['sid', 'name', 'basin', 'lat', 'lon', 'time', 'valid_t',
-                                 'wind', 'pres', 'rmw', 'roci', 'poci']]
-
-        if estimate_missing:
-            ibtracs_ds['pres'][:] = _estimate_pressure(ibtracs_ds.pres,
-                                                       ibtracs_ds.lat, ibtracs_ds.lon,
-                                                       ibtracs_ds.wind)
-            ibtracs_ds['wind'][:] = _estimate_vmax(ibtracs_ds.wind,
-                                                   ibtracs_ds.lat, ibtracs_ds.lon,
-                                                   ibtracs_ds.pres)
-
-        ibtracs_ds['valid_t'] &= ibtracs_ds.wind.notnull() & ibtracs_ds.pres.notnull()
-        valid_st = ibtracs_ds.valid_t.any(dim="date_time")
-        invalid_st = np.nonzero(~valid_st.data)[0]
-        if invalid_st.size > 0:
-            st_ids = ', '.join(ibtracs_ds.sid.sel(storm=invalid_st).astype(str).data)
-            LOGGER.warning('No valid wind/pressure values found for %s.', st_ids)
-            ibtracs_ds = ibtracs_ds.sel(storm=valid_st)
-
-        max_wind = ibtracs_ds.wind.max(dim="date_time").data.ravel()
-        category_test = (max_wind[:, None] < np.array(SAFFIR_SIM_CAT)[None])
-        category = np.argmax(category_test, axis=1) - 1
-        basin_map = {b.encode("utf-8"): v for b, v in BASIN_ENV_PRESSURE.items()}
-        basin_fun = lambda b: basin_map[b]
-
-        ibtracs_ds['id_no'] = (ibtracs_ds.sid.str.replace(b'N', b'0')
-                               .str.replace(b'S', b'1')
-                               .astype(float))
-        ibtracs_ds['time_step'] = xr.zeros_like(ibtracs_ds.time, dtype=float)
-        ibtracs_ds['time_step'][:, 1:] = (ibtracs_ds.time.diff(dim="date_time")
-                                          / np.timedelta64(1, 's'))
-        ibtracs_ds['time_step'][:, 0] = ibtracs_ds.time_step[:, 1]
-        provider = provider if provider else 'ibtracs'
-
-        last_perc = 0
-        all_tracks = []
-        for i_track, t_msk in enumerate(ibtracs_ds.valid_t.data):
-            perc = 100 * len(all_tracks) / ibtracs_ds.sid.size
-            if perc - last_perc >= 10:
-                LOGGER.info("Progress: %d%%", perc)
-                last_perc = perc
-            track_ds = ibtracs_ds.sel(storm=i_track, date_time=t_msk)
-            st_penv = xr.apply_ufunc(basin_fun, track_ds.basin, vectorize=True)
-            track_ds['time'][:1] = track_ds.time[:1].dt.floor('H')
-            if track_ds.time.size > 1:
-                track_ds['time_step'][0] = (track_ds.time[1] - track_ds.time[0]) \
-                                      / np.timedelta64(1, 's')
-
-            with warnings.catch_warnings():
-                # See https://github.com/pydata/xarray/issues/4167
-                warnings.simplefilter(action="ignore", category=FutureWarning)
-
-                track_ds['rmw'] = track_ds.rmw \
-                    .ffill(dim='date_time', limit=1) \
-                    .bfill(dim='date_time', limit=1) \
-                    .fillna(0)
-                track_ds['roci'] = track_ds.roci \
-                    .ffill(dim='date_time', limit=1) \
-                    .bfill(dim='date_time', limit=1) \
-                    .fillna(0)
-                track_ds['poci'] = track_ds.poci \
-                    .ffill(dim='date_time', limit=4) \
-                    .bfill(dim='date_time', limit=4)
-                # this is the most time consuming line in the processing:
-                track_ds['poci'] = track_ds.poci.fillna(st_penv)
-
-            if estimate_missing:
-                track_ds['rmw'][:] = estimate_rmw(track_ds.rmw.values, track_ds.pres.values)
-                track_ds['roci'][:] = estimate_roci(track_ds.roci.values, track_ds.rmw.values)
-                track_ds['roci'][:] = np.fmax(track_ds.rmw.values, track_ds.roci.values)
-
-            # ensure environmental pressure >= central pressure
-            # this is the second most time consuming line in the processing:
-            track_ds['poci'][:] = np.fmax(track_ds.poci, track_ds.pres)
-
-            all_tracks.append(xr.Dataset({
-                'time_step': ('time', track_ds.time_step),
-                'radius_max_wind': ('time', track_ds.rmw.data),
-                'radius_oci': ('time', track_ds.roci.data),
-                'max_sustained_wind': ('time', track_ds.wind.data),
-                'central_pressure': ('time', track_ds.pres.data),
-                'environmental_pressure': ('time', track_ds.poci.data),
-            }, coords={
-                'time': track_ds.time.dt.round('s').data,
-                'lat': ('time', track_ds.lat.data),
-                'lon': ('time', track_ds.lon.data),
-            }, attrs={
-                'max_sustained_wind_unit': 'kn',
-                'central_pressure_unit': 'mb',
-                'name': track_ds.name.astype(str).item(),
-                'sid': track_ds.sid.astype(str).item(),
-                'orig_event_flag': True,
-                'data_provider': provider,
-                'basin': track_ds.basin.values[0].astype(str).item(),
-                'id_no': track_ds.id_no.item(),
-                'category': category[i_track],
-            }))
-        self.data = all_tracks
+        with xr.open_dataset(fn_nc) as ibtracs_ds:
+            match = _ibtracs_match(ibtracs_ds.sid.values.astype(str), storm_id, year_range,
+                                   lambda bas: (ibtracs_ds.basin == bas.encode())
+                                   .any(dim='date_time').values,
+                                   basin)
+            if np.count_nonzero(match) == 0:
+                return
+            ibtracs_ds = ibtracs_ds.sel(storm=match).load()
+        self.data = _ibtracs_tracks(ibtracs_ds, provider, estimate_missing)
 
     def read_processed_ibtracs_csv(self, file_names):
         """Fill from processed ibtracs csv file(s).
@@ -409,132 +436,60 @@ class TCTracks():
         for file in all_file:
             self._read_ibtracs_csv_single(file)
 
-    def read_simulations_emanuel(self, file_names, hemisphere='S'):
-        """Fill from Kerry Emanuel tracks.
+    def read_simulations_emanuel(self, file_names, hemisphere='S', year_range=None,
+                                 pack=False):
+        """Fill from Kerry Emanuel tracks. The files are read in parallel if a
+        pool is set.
 
         Parameters:
             file_names (str or list(str)): absolute file name(s) or
                 folder name containing the files to read.
             hemisphere (str, optional): 'S', 'N' or 'both'. Default: 'S'
+            year_range (tuple, optional): (min_year, max_year) of the tracks
+                to read. Default: all
+            pack (bool, optional): keep the tracks packed (see `pack`) instead
+                of a list of xarray.Dataset. Default: False
         """
-        self.data = []
-        for path in get_file_names(file_names):
-            rmw_corr = os.path.basename(path) in EMANUEL_RMW_CORR_FILES
-            self._read_file_emanuel(path, hemisphere=hemisphere,
-                                    rmw_corr=rmw_corr)
+        paths = get_file_names(file_names)
+        rmw_corr = [os.path.basename(path) in EMANUEL_RMW_CORR_FILES for path in paths]
+        if self.pool and len(paths) > 1:
+            packed_files = self.pool.map(_read_file_emanuel, paths,
+                                         itertools.repeat(hemisphere, len(paths)),
+                                         rmw_corr,
+                                         itertools.repeat(year_range, len(paths)))
+        else:
+            packed_files = [_read_file_emanuel(path, hemisphere, corr, year_range)
+                            for path, corr in zip(paths, rmw_corr)]
+        self.data = PackedTracks.concat(packed_files)
+        if not pack:
+            self.unpack()
 
-    def _read_file_emanuel(self, path, hemisphere='S', rmw_corr=False):
-        """Append tracks from file containing Kerry Emanuel simulations.
+    def read_simulations_gettelman(self, file_names, basin=None, year_range=None,
+                                   pack=False):
+        """Fill from Andrew Gettelman tracks. The files are read in parallel if
+        a pool is set.
 
         Parameters:
-            path (str): absolute path of file to read.
-            hemisphere (str, optional): 'S', 'N' or 'both'. Default: 'S'
-            rmw_corr (str, optional): If True, multiply the radius of
-                maximum wind by factor 2. Default: False.
+            file_names (str or list(str)): absolute file name(s) or
+                folder name containing the netcdf files to read.
+            basin (str, optional): basin of the first node of the tracks to
+                read, e.g. 'NA'. Default: all
+            year_range (tuple, optional): (min_year, max_year) of the first
+                node of the tracks to read. Default: all
+            pack (bool, optional): keep the tracks packed (see `pack`) instead
+                of a list of xarray.Dataset. Default: False
         """
-        if hemisphere == 'S':
-            hem_min, hem_max = -90, 0
-        elif hemisphere == 'N':
-            hem_min, hem_max = 0, 90
+        paths = get_file_names(file_names)
+        if self.pool and len(paths) > 1:
+            packed_files = self.pool.map(_read_file_gettelman, paths,
+                                         itertools.repeat(basin, len(paths)),
+                                         itertools.repeat(year_range, len(paths)))
         else:
-            hem_min, hem_max = -90, 90
-
-        LOGGER.info('Reading %s.', path)
-        data_mat = matlab.loadmat(path)
-        lat = data_mat['latstore']
-        ntracks, nnodes = lat.shape
-        years_uniq = np.unique(data_mat['yearstore'])
-        LOGGER.info("File contains %s tracks (at most %s nodes each), "
-                    "representing %s years (%s-%s).", ntracks, nnodes,
-                    years_uniq.size, years_uniq[0], years_uniq[-1])
-
-        # filter according to chosen hemisphere
-        hem_mask = (lat >= hem_min) & (lat <= hem_max) | (lat == 0)
-        hem_idx = np.all(hem_mask, axis=1).nonzero()[0]
-        data_hem = lambda keys: [data_mat[f'{k}store'][hem_idx] for k in keys]
-
-        lat, lon = data_hem(['lat', 'long'])
-        months, days, hours = data_hem(['month', 'day', 'hour'])
-        months, days, hours = [np.int8(ar) for ar in [months, days, hours]]
-        tc_rmw, tc_maxwind, tc_pressure = data_hem(['rm', 'v', 'p'])
-        years = data_mat['yearstore'][0, hem_idx]
-
-        ntracks, nnodes = lat.shape
-        LOGGER.info("Loading %s tracks on %s hemisphere.", ntracks, hemisphere)
-
-        # change lon format to -180 to 180
-        lon[lon > 180] = lon[lon > 180] - 360
-
-        # change units from kilometers to nautical miles
-        tc_rmw = (tc_rmw * ureg.kilometer).to(ureg.nautical_mile).magnitude
-        if rmw_corr:
-            LOGGER.info("Applying RMW correction.")
-            tc_rmw *= EMANUEL_RMW_CORR_FACTOR
-
-        for i_track in range(lat.shape[0]):
-            valid_idx = (lat[i_track, :] != 0).nonzero()[0]
-            nnodes = valid_idx.size
-            time_step = np.abs(np.diff(hours[i_track, valid_idx])).min()
-
-            # deal with change of year
-            year = np.full(valid_idx.size, years[i_track])
-            year_change = (np.diff(months[i_track, valid_idx]) < 0)
-            year_change = year_change.nonzero()[0]
-            if year_change.size > 0:
-                year[year_change[0] + 1:] += 1
-
-            try:
-                datetimes = map(dt.datetime, year,
-                                months[i_track, valid_idx],
-                                days[i_track, valid_idx],
-                                hours[i_track, valid_idx])
-                datetimes = list(datetimes)
-            except ValueError as err:
-                # dates are known to contain invalid February 30
-                date_feb = (months[i_track, valid_idx] == 2) \
-                         & (days[i_track, valid_idx] > 28)
-                if np.count_nonzero(date_feb) == 0:
-                    # unknown invalid date issue
-                    raise err
-                step = time_step if not date_feb[0] else -time_step
-                reference_idx = 0 if not date_feb[0] else -1
-                reference_date = dt.datetime(
-                    year[reference_idx],
-                    months[i_track, valid_idx[reference_idx]],
-                    days[i_track, valid_idx[reference_idx]],
-                    hours[i_track, valid_idx[reference_idx]],)
-                datetimes = [reference_date + dt.timedelta(hours=int(step * i))
-                             for i in range(nnodes)]
-            datetimes = np.array(datetimes)
-
-            max_sustained_wind = tc_maxwind[i_track, valid_idx]
-            max_sustained_wind_unit = 'kn'
-            env_pressure = np.full(nnodes, DEF_ENV_PRESSURE)
-            category = set_category(max_sustained_wind,
-                                    max_sustained_wind_unit,
-                                    SAFFIR_SIM_CAT)
-            tr_ds = xr.Dataset({
-                'time_step': ('time', np.full(nnodes, time_step)),
-                'radius_max_wind': ('time', tc_rmw[i_track, valid_idx]),
-                'max_sustained_wind': ('time', max_sustained_wind),
-                'central_pressure': ('time', tc_pressure[i_track, valid_idx]),
-                'environmental_pressure': ('time', env_pressure),
-            }, coords={
-                'time': datetimes,
-                'lat': ('time', lat[i_track, valid_idx]),
-                'lon': ('time', lon[i_track, valid_idx]),
-            }, attrs={
-                'max_sustained_wind_unit': max_sustained_wind_unit,
-                'central_pressure_unit': 'mb',
-                'name': str(hem_idx[i_track]),
-                'sid': str(hem_idx[i_track]),
-                'orig_event_flag': True,
-                'data_provider': 'Emanuel',
-                'basin': hemisphere,
-                'id_no': hem_idx[i_track],
-                'category': category,
-            })
-            self.data.append(tr_ds)
+            packed_files = [_read_file_gettelman(path, basin, year_range)
+                            for path in paths]
+        self.data = PackedTracks.concat(packed_files)
+        if not pack:
+            self.unpack()
 
     def read_one_gettelman(self, nc_data, i_track):
         """Fill from Andrew Gettelman tracks.
@@ -543,97 +498,12 @@ class TCTracks():
         nc_data (str): netCDF4.Dataset Objekt
         i_tracks (int): track number
         """
-        scale_to_10m = (10. / 60.)**.11
-        mps2kts = 1.94384
-        basin_dict = {0: 'NA - North Atlantic',
-                      1: 'SA - South Atlantic',
-                      2: 'WP - West Pacific',
-                      3: 'EP - East Pacific',
-                      4: 'SP - South Pacific',
-                      5: 'NI - North Indian',
-                      6: 'SI - South Indian',
-                      7: 'AS - Arabian Sea',
-                      8: 'BB - Bay of Bengal',
-                      9: 'EA - Eastern Australia',
-                      10: 'WA - Western Australia',
-                      11: 'CP - Central Pacific',
-                      12: 'CS - Carribbean Sea',
-                      13: 'GM - Gulf of Mexico',
-                      14: 'MM - Missing'}
-
-        val_len = nc_data.variables['numObs'][i_track]
-        sid = str(i_track)
-        times = nc_data.variables['source_time'][i_track, :][:val_len]
-
-        datetimes = list()
-        for time in times:
-            try:
-                datetimes.append(
-                    dt.datetime.strptime(
-                        str(nc.num2date(time, 'days since {}'.format('1858-11-17'),
-                                        calendar='standard')),
-                        '%Y-%m-%d %H:%M:%S'))
-            except ValueError:
-                # If wrong t, set t to previous t plus 3 hours
-                if datetimes:
-                    datetimes.append(datetimes[-1] + dt.timedelta(hours=3))
-                else:
-                    pos = list(times).index(time)
-                    time = times[pos + 1] - 1 / 24 * 3
-                    datetimes.append(
-                        dt.datetime.strptime(
-                            str(nc.num2date(time, 'days since {}'.format('1858-11-17'),
-                                            calendar='standard')),
-                            '%Y-%m-%d %H:%M:%S'))
-        time_step = []
-        for i_time, time in enumerate(datetimes[1:], 1):
-            time_step.append((time - datetimes[i_time - 1]).total_seconds() / 3600)
-        time_step.append(time_step[-1])
-
-        basins = list()
-        for basin in nc_data.variables['basin'][i_track, :][:val_len]:
-            try:
-                basins.extend([basin_dict[basin]])
-            except KeyError:
-                basins.extend([np.nan])
-
-        lon = nc_data.variables['lon'][i_track, :][:val_len]
-        lon[lon > 180] = lon[lon > 180] - 360  # change lon format to -180 to 180
-        lat = nc_data.variables['lat'][i_track, :][:val_len]
-        cen_pres = nc_data.variables['pres'][i_track, :][:val_len]
-        av_prec = nc_data.variables['precavg'][i_track, :][:val_len]
-        max_prec = nc_data.variables['precmax'][i_track, :][:val_len]
-
-        # m/s to kn
-        wind = nc_data.variables['wind'][i_track, :][:val_len] * mps2kts * scale_to_10m
-        if not all(wind.data):  # if wind is empty
-            wind = np.ones(wind.size) * -999.9
-
-        tr_df = pd.DataFrame({'time': datetimes, 'lat': lat, 'lon': lon,
-                              'max_sustained_wind': wind,
-                              'central_pressure': cen_pres,
-                              'environmental_pressure': np.ones(lat.size) * 1015.,
-                              'radius_max_wind': np.ones(lat.size) * 65.,
-                              'maximum_precipitation': max_prec,
-                              'average_precipitation': av_prec,
-                              'basins': basins,
-                              'time_step': time_step})
-
-        # construct xarray
-        tr_ds = xr.Dataset.from_dataframe(tr_df.set_index('time'))
-        tr_ds.coords['lat'] = ('time', tr_ds.lat)
-        tr_ds.coords['lon'] = ('time', tr_ds.lon)
-        tr_ds.attrs = {'max_sustained_wind_unit': 'kn',
-                       'central_pressure_unit': 'mb',
-                       'sid': sid,
-                       'name': sid, 'orig_event_flag': False,
-                       'basin': basins[0],
-                       'id_no': i_track,
-                       'category': set_category(wind, 'kn')}
-        self.data.append(tr_ds)
+        self.append(_gettelman_tracks(nc_data, np.array([i_track])).to_list())
 
     def equal_timestep(self, time_step_h=1, land_params=False):
         """Generate interpolated track values to time steps of min_time_step.
+        All tracks are interpolated at once on concatenated node arrays (see
+        PackedTracks), tracks with different variables in separate groups.
         Parameters:
             time_step_h (float, optional): time step in hours to which to
                 interpolate. Default: 1.
@@ -649,18 +519,34 @@ class TCTracks():
         else:
             land_geom = None
 
-        if self.pool:
-            chunksize = min(self.size // self.pool.ncpus, 1000)
-            self.data = self.pool.map(self._one_interp_data, self.data,
-                                      itertools.repeat(time_step_h, self.size),
-                                      itertools.repeat(land_geom, self.size),
-                                      chunksize=chunksize)
-        else:
-            new_data = list()
-            for track in self.data:
-                new_data.append(self._one_interp_data(track, time_step_h,
-                                                      land_geom))
-            self.data = new_data
+        if self.is_packed and not land_geom and (self.data.sizes >= 2).all():
+            self.data = _interp_packed(self.data, time_step_h)
+            return
+
+        packed_in = self.is_packed
+        self.unpack()
+
+        interp_idx = []
+        for i_track, track in enumerate(self.data):
+            if track.time.size < 2:
+                LOGGER.warning('Track interpolation not done. '
+                               'Not enough elements for %s', track.name)
+                continue
+            interp_idx.append(i_track)
+
+        new_data = list(self.data)
+        for grp_idx in group_tracks([self.data[i_track] for i_track in interp_idx]):
+            tr_idx = [interp_idx[i_grp] for i_grp in grp_idx]
+            packed = _interp_packed(PackedTracks([self.data[i] for i in tr_idx]),
+                                    time_step_h)
+            for i_track, track in zip(tr_idx, packed):
+                new_data[i_track] = track
+
+        if land_geom:
+            tracks_land_params(new_data, land_geom)
+        self.data = new_data
+        if packed_in:
+            self.pack()
 
     def calc_random_walk(self, **kwargs):
         """See function in `climada.hazard.tc_tracks_synth`"""
@@ -680,10 +566,12 @@ class TCTracks():
         Returns:
             tuple (lon_min, lat_min, lon_max, lat_max)
         """
-        bounds = coord_util.latlon_bounds(
-            np.concatenate([t.lat.values for t in self.data]),
-            np.concatenate([t.lon.values for t in self.data]),
-            buffer=deg_buffer)
+        if self.is_packed:
+            lat, lon = self.data.nodes['lat'], self.data.nodes['lon']
+        else:
+            lat = np.concatenate([t.lat.values for t in self.data])
+            lon = np.concatenate([t.lon.values for t in self.data])
+        bounds = coord_util.latlon_bounds(lat, lon, buffer=deg_buffer)
         return bounds
 
     @property
@@ -773,11 +661,12 @@ class TCTracks():
         Parameters:
             folder_name (str): folder name where to write files
         """
-        list_path = [os.path.join(folder_name, track.sid + '.nc') for track in self.data]
+        tracks = list(self.data)
+        list_path = [os.path.join(folder_name, track.sid + '.nc') for track in tracks]
         LOGGER.info('Writting %s files.', self.size)
-        for track in self.data:
+        for track in tracks:
             track.attrs['orig_event_flag'] = int(track.orig_event_flag)
-        xr.save_mfdataset(self.data, list_path)
+        xr.save_mfdataset(tracks, list_path)
 
     def read_netcdf(self, folder_name):
         """Read all netcdf files contained in folder and fill a track per file.
@@ -795,46 +684,86 @@ class TCTracks():
             track.attrs['orig_event_flag'] = bool(track.orig_event_flag)
             self.data.append(track)
 
-    @staticmethod
-    @jit(parallel=True, forceobj=True)
-    def _one_interp_data(track, time_step_h, land_geom=None):
-        """Interpolate values of one track.
+    def write_netcdf_ragged(self, file_name):
+        """Write all tracks to one netcdf file as contiguous ragged arrays
+        (see PackedTracks.to_dataset). Tracks with different variables or
+        attributes are written to different netcdf groups.
 
         Parameters:
-            track (xr.Dataset): track data
+            file_name (str): name of the netcdf file
+        """
+        if self.is_packed:
+            groups = [list(range(self.size))]
+        else:
+            groups = group_tracks(self.data)
+        group_names = [f'tracks_{i_grp}' for i_grp in range(len(groups))]
+
+        LOGGER.info('Writting %s tracks to %s.', self.size, file_name)
+        xr.Dataset(attrs={'track_groups': ' '.join(group_names)}).to_netcdf(file_name)
+        for group, tr_idx in zip(group_names, groups):
+            if self.is_packed:
+                packed = self.data
+            else:
+                packed = PackedTracks([self.data[i_track] for i_track in tr_idx])
+            dataset = packed.to_dataset()
+            dataset['track_index'] = ('storm', np.array(tr_idx, int))
+            dataset.to_netcdf(file_name, mode='a', group=group)
 
-        Returns:
-            xr.Dataset
+    def read_netcdf_ragged(self, file_name, sid=None, basin=None, chunk_size=10000):
+        """Read tracks written by `write_netcdf_ragged`, all or a subset. The
+        tracks are read in chunks of tracks, in parallel if a pool is set.
+        The tracks are packed (see `pack`) if they all have the same
+        variables and attributes.
+
+        Parameters:
+            file_name (str): name of the netcdf file
+            sid (str or list(str), optional): sid of the tracks to read.
+                Default: all
+            basin (str, optional): basin of the tracks to read. Default: all
+            chunk_size (int, optional): number of tracks read at once.
+                Default: 10000
         """
-        if track.time.size >= 2:
-            method = ['linear', 'quadratic', 'cubic'][min(2, track.time.size - 2)]
-
-            # handle change of sign in longitude
-            lon = track.lon.copy()
-            if (lon < -170).any() and (lon > 170).any():
-                # crosses 180 degrees east/west -> use positive degrees east
-                lon[lon < 0] += 360
-
-            time_step = '{}H'.format(time_step_h)
-            track_int = track.resample(time=time_step, keep_attrs=True, skipna=True)\
-                             .interpolate('linear')
-            track_int['time_step'][:] = time_step_h
-            lon_int = lon.resample(time=time_step).interpolate(method)
-            lon_int[lon_int > 180] -= 360
-            track_int.coords['lon'] = lon_int
-            track_int.coords['lat'] = track.lat.resample(time=time_step)\
-                                               .interpolate(method)
-            track_int.attrs['category'] = set_category(
-                track_int.max_sustained_wind.values,
-                track_int.max_sustained_wind_unit)
+        if sid is not None and not isinstance(sid, list):
+            sid = [sid]
+        with xr.open_dataset(file_name) as dataset:
+            group_names = dataset.attrs['track_groups'].split()
+
+        chunks = []
+        for group in group_names:
+            with xr.open_dataset(file_name, group=group) as dataset:
+                select = np.ones(dataset.storm.size, bool)
+                if sid is not None:
+                    select &= np.isin(dataset.sid.values.astype(str), sid)
+                if basin is not None:
+                    select &= dataset.basin.values.astype(str) == basin
+            tr_idx = np.nonzero(select)[0]
+            chunks += [(group, tr_idx[i_chunk:i_chunk + chunk_size])
+                       for i_chunk in range(0, tr_idx.size, chunk_size)]
+        LOGGER.info('Reading %s tracks from %s.', sum(idx.size for _, idx in chunks),
+                    file_name)
+
+        if self.pool and len(chunks) > 1:
+            packed_chunks = self.pool.map(_read_ragged_chunk, itertools.repeat(file_name),
+                                          [group for group, _ in chunks],
+                                          [tr_idx for _, tr_idx in chunks])
         else:
-            LOGGER.warning('Track interpolation not done. '
-                           'Not enough elements for %s', track.name)
-            track_int = track
+            packed_chunks = [_read_ragged_chunk(file_name, group, tr_idx)
+                             for group, tr_idx in chunks]
+
+        groups = dict()
+        for (group, _), packed in zip(chunks, packed_chunks):
+            groups.setdefault(group, []).append(packed)
+        groups = [PackedTracks.concat(packed_list) for packed_list in groups.values()]
+        if len(groups) == 1:
+            self.data = groups[0]
+            self.data.attrs.pop('track_index')
+            return
 
-        if land_geom:
-            track_land_params(track_int, land_geom)
-        return track_int
+        # restore the order in which the tracks were written
+        track_index = np.concatenate([packed.attrs.pop('track_index') for packed in groups]
+                                     + [np.zeros(0, int)])
+        tracks = [track for packed in groups for track in packed.to_list()]
+        self.data = [tracks[i_track] for i_track in np.argsort(track_index, kind='stable')]
 
     def _read_ibtracs_csv_single(self, file_name):
         """Read IBTrACS track file in CSV format.
@@ -896,6 +825,678 @@ class TCTracks():
         self.data.append(tr_ds)
 
 
+def _datetime_year(time):
+    """Year of datetime64 values"""
+    return np.asarray(time).astype('datetime64[Y]').astype(int) + 1970
+
+class _TrackList(list):
+    """List of the tracks of TCTracks which counts the changes other than
+    appending, for the index of the track attributes to be rebuilt."""
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.n_changes = 0
+
+    def _flag_change(method):
+        def flagged(self, *args, **kwargs):
+            self.n_changes += 1
+            return method(self, *args, **kwargs)
+        flagged.__name__ = method.__name__
+        flagged.__doc__ = method.__doc__
+        return flagged
+
+    __setitem__ = _flag_change(list.__setitem__)
+    __delitem__ = _flag_change(list.__delitem__)
+    __imul__ = _flag_change(list.__imul__)
+    insert = _flag_change(list.insert)
+    pop = _flag_change(list.pop)
+    remove = _flag_change(list.remove)
+    clear = _flag_change(list.clear)
+    sort = _flag_change(list.sort)
+    reverse = _flag_change(list.reverse)
+    del _flag_change
+
+def _index_key(value):
+    """Hashable key of a track attribute value in the index of TCTracks"""
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    return value
+
+def _read_ragged_chunk(file_name, group, tr_idx):
+    """Read tracks of given netcdf group written by write_netcdf_ragged.
+
+    Parameters:
+        file_name (str): name of the netcdf file
+        group (str): netcdf group
+        tr_idx (np.array): indices of the tracks in the group
+
+    Returns:
+        PackedTracks (with track attribute track_index)
+    """
+    with xr.open_dataset(file_name, group=group) as dataset:
+        packed = PackedTracks.from_dataset(dataset, tr_idx)
+        packed.attrs['track_index'] = dataset.track_index.values[tr_idx]
+    return packed
+
+def _read_file_emanuel(path, hemisphere='S', rmw_corr=False, year_range=None):
+    """Read tracks from file containing Kerry Emanuel simulations. The tracks
+    are built from the matrices (tracks x nodes) of the file at once.
+
+    Parameters:
+        path (str): absolute path of file to read.
+        hemisphere (str, optional): 'S', 'N' or 'both'. Default: 'S'
+        rmw_corr (str, optional): If True, multiply the radius of
+            maximum wind by factor 2. Default: False.
+        year_range (tuple, optional): (min_year, max_year) of the tracks.
+            Default: all
+
+    Returns:
+        PackedTracks
+
+    Raises:
+        ValueError
+    """
+    if hemisphere == 'S':
+        hem_min, hem_max = -90, 0
+    elif hemisphere == 'N':
+        hem_min, hem_max = 0, 90
+    else:
+        hem_min, hem_max = -90, 90
+
+    LOGGER.info('Reading %s.', path)
+    data_mat = matlab.loadmat(path)
+    lat = data_mat['latstore']
+    ntracks, nnodes = lat.shape
+    years = data_mat['yearstore'][0]
+    years_uniq = np.unique(years)
+    LOGGER.info("File contains %s tracks (at most %s nodes each), "
+                "representing %s years (%s-%s).", ntracks, nnodes,
+                years_uniq.size, years_uniq[0], years_uniq[-1])
+
+    # filter according to chosen hemisphere and years
+    hem_mask = (lat >= hem_min) & (lat <= hem_max) | (lat == 0)
+    select = np.all(hem_mask, axis=1) & np.any(lat != 0, axis=1)
+    if year_range is not None:
+        select &= (years >= year_range[0]) & (years <= year_range[1])
+    hem_idx = select.nonzero()[0]
+    LOGGER.info("Loading %s tracks on %s hemisphere.", hem_idx.size, hemisphere)
+
+    # nodes of all tracks, one track after the other
+    valid = lat[hem_idx] != 0
+    sizes = valid.sum(axis=1)
+    packed = PackedTracks()
+    packed.offsets = np.zeros(hem_idx.size + 1, int)
+    np.cumsum(sizes, out=packed.offsets[1:])
+    first = packed.offsets[:-1]
+    data_hem = lambda keys: [data_mat[f'{k}store'][hem_idx][valid] for k in keys]
+
+    lat, lon = data_hem(['lat', 'long'])
+    months, days, hours = data_hem(['month', 'day', 'hour'])
+    months, days, hours = [np.int8(ar) for ar in [months, days, hours]]
+    tc_rmw, tc_maxwind, tc_pressure = data_hem(['rm', 'v', 'p'])
+
+    # change lon format to -180 to 180
+    lon[lon > 180] = lon[lon > 180] - 360
+
+    # change units from kilometers to nautical miles
+    tc_rmw = (tc_rmw * ureg.kilometer).to(ureg.nautical_mile).magnitude
+    if rmw_corr:
+        LOGGER.info("Applying RMW correction.")
+        tc_rmw *= EMANUEL_RMW_CORR_FACTOR
+
+    time_step = np.full(lat.size, np.iinfo(np.int8).max, np.int8)
+    time_step[:-1] = np.abs(np.diff(hours))
+    time_step[packed.offsets[1:] - 1] = np.iinfo(np.int8).max
+    time_step = np.repeat(np.minimum.reduceat(time_step, first), sizes) if lat.size \
+                else time_step
+
+    # deal with change of year
+    year = np.repeat(years[hem_idx], sizes)
+    year_change = np.zeros(lat.size, int)
+    year_change[1:] = np.diff(months) < 0
+    year_change[first] = 0
+    year_change = np.cumsum(year_change)
+    year += (year_change - np.repeat(year_change[first], sizes)) > 0
+
+    month_start = ((year - 1970) * 12 + months - 1).astype('datetime64[M]')
+    date = month_start.astype('datetime64[D]') + (days - 1).astype('timedelta64[D]')
+    time = date.astype('datetime64[h]') + hours.astype('timedelta64[h]')
+    invalid = (date.astype('datetime64[M]') != month_start) | (days < 1)
+    if invalid.any():
+        # dates are known to contain invalid February 30
+        date_feb = (months == 2) & (days > 28)
+        track_idx = np.repeat(np.arange(hem_idx.size), sizes)
+        inv_tracks = np.unique(track_idx[invalid])
+        if not np.isin(inv_tracks, track_idx[date_feb]).all():
+            LOGGER.error('Invalid dates in %s.', path)
+            raise ValueError
+        # time steps from the first node, or the last one if it is invalid
+        inv_nodes = np.isin(track_idx, inv_tracks)
+        ref_last = date_feb[first]
+        ref_node = np.where(ref_last, packed.offsets[1:] - 1, first)
+        steps = np.arange(lat.size) - np.repeat(ref_node, sizes)
+        time[inv_nodes] = time[np.repeat(ref_node, sizes)[inv_nodes]] \
+                          + (steps * time_step)[inv_nodes].astype('timedelta64[h]')
+    packed.time = time.astype('datetime64[ns]')
+
+    max_sustained_wind_unit = 'kn'
+    packed.nodes = {
+        'lat': lat,
+        'lon': lon,
+        'time_step': time_step,
+        'radius_max_wind': tc_rmw,
+        'max_sustained_wind': tc_maxwind,
+        'central_pressure': tc_pressure,
+        'environmental_pressure': np.full(lat.size, DEF_ENV_PRESSURE),
+    }
+    packed.attrs = {
+        'max_sustained_wind_unit': np.full(hem_idx.size, max_sustained_wind_unit),
+        'central_pressure_unit': np.full(hem_idx.size, 'mb'),
+        'name': hem_idx.astype(str),
+        'sid': hem_idx.astype(str),
+        'orig_event_flag': np.ones(hem_idx.size, bool),
+        'data_provider': np.full(hem_idx.size, 'Emanuel'),
+        'basin': np.full(hem_idx.size, hemisphere),
+        'id_no': hem_idx,
+        'category': _track_categories(tc_maxwind, packed.offsets,
+                                      max_sustained_wind_unit, SAFFIR_SIM_CAT),
+    }
+    return packed
+
+GETTELMAN_BASINS = ['NA - North Atlantic', 'SA - South Atlantic', 'WP - West Pacific',
+                    'EP - East Pacific', 'SP - South Pacific', 'NI - North Indian',
+                    'SI - South Indian', 'AS - Arabian Sea', 'BB - Bay of Bengal',
+                    'EA - Eastern Australia', 'WA - Western Australia',
+                    'CP - Central Pacific', 'CS - Carribbean Sea', 'GM - Gulf of Mexico',
+                    'MM - Missing']
+"""Basin names of the basin codes in Andrew Gettelman track files"""
+
+def _read_file_gettelman(path, basin=None, year_range=None):
+    """Read tracks from file containing Andrew Gettelman simulations.
+
+    Parameters:
+        path (str): absolute path of the netcdf file to read.
+        basin (str, optional): basin of the first node of the tracks,
+            e.g. 'NA'. Default: all
+        year_range (tuple, optional): (min_year, max_year) of the first node
+            of the tracks. Default: all
+
+    Returns:
+        PackedTracks
+    """
+    LOGGER.info('Reading %s.', path)
+    with nc.Dataset(path) as nc_data:
+        ntracks = nc_data.dimensions['storm'].size
+        select = np.ones(ntracks, bool)
+        if basin is not None:
+            codes = np.ma.filled(nc_data.variables['basin'][:, 0], -1)
+            select &= np.isin(codes, [i_basin for i_basin, name in enumerate(GETTELMAN_BASINS)
+                                      if name.split(' - ')[0] == basin])
+        if year_range is not None:
+            times = _gettelman_times(nc_data.variables['source_time'][:, :2],
+                                     np.full(ntracks, 2))[0][::2]
+            year = _datetime_year(times)
+            select &= (year >= year_range[0]) & (year <= year_range[1])
+        LOGGER.info("Loading %s of %s tracks.", np.count_nonzero(select), ntracks)
+        return _gettelman_tracks(nc_data, select.nonzero()[0])
+
+def _gettelman_times(source_time, val_len):
+    """Times of the nodes of Andrew Gettelman tracks. Invalid times are set
+    to the time of the previous node plus 3 hours, or of the next node minus
+    3 hours at the start of a track.
+
+    Parameters:
+        source_time (np.ma.array): days since 1858-11-17 (tracks x nodes)
+        val_len (np.array): number of nodes of every track
+
+    Returns:
+        np.array (datetime64, nodes of all tracks), np.array (offsets)
+    """
+    valid = np.arange(source_time.shape[1])[None, :] < val_len[:, None]
+    days = np.ma.filled(np.ma.masked_invalid(source_time.astype(float)), np.nan)[valid]
+    offsets = np.zeros(val_len.size + 1, int)
+    np.cumsum(val_len, out=offsets[1:])
+    track_idx = np.repeat(np.arange(val_len.size), val_len)
+
+    time = np.datetime64('1858-11-17', 's') + np.round(np.nan_to_num(days) * 86400)\
+                                                .astype('timedelta64[s]')
+    ok_idx = np.where(np.isfinite(days), np.arange(days.size), -1)
+    prev_ok = np.maximum.accumulate(ok_idx) if days.size else ok_idx
+    prev_ok[prev_ok < np.repeat(offsets[:-1], val_len)] = -1
+    next_ok = np.where(np.isfinite(days), np.arange(days.size), days.size)
+    next_ok = np.minimum.accumulate(next_ok[::-1])[::-1] if days.size else next_ok
+    next_ok[next_ok >= np.repeat(offsets[1:], val_len)] = -1
+    step = np.timedelta64(3, 'h')
+    from_prev = ~np.isfinite(days) & (prev_ok >= 0)
+    time[from_prev] = time[prev_ok[from_prev]] + (np.nonzero(from_prev)[0]
+                                                  - prev_ok[from_prev]) * step
+    from_next = ~np.isfinite(days) & (prev_ok < 0) & (next_ok >= 0)
+    time[from_next] = time[next_ok[from_next]] - (next_ok[from_next]
+                                                  - np.nonzero(from_next)[0]) * step
+    if (~np.isfinite(days) & (prev_ok < 0) & (next_ok < 0)).any():
+        LOGGER.warning('Tracks without valid time: %s.',
+                       np.unique(track_idx[~np.isfinite(days) & (prev_ok < 0)
+                                           & (next_ok < 0)]))
+    return time.astype('datetime64[ns]'), offsets
+
+def _gettelman_tracks(nc_data, track_idx):
+    """Build Andrew Gettelman tracks from the matrices (tracks x nodes) of
+    the netcdf file at once.
+
+    Parameters:
+        nc_data (netCDF4.Dataset): open track file
+        track_idx (np.array): indices of the tracks to read
+
+    Returns:
+        PackedTracks
+    """
+    scale_to_10m = (10. / 60.)**.11
+    mps2kts = 1.94384
+
+    packed = PackedTracks()
+    if not track_idx.size:
+        return packed
+    val_len = np.asarray(nc_data.variables['numObs'][track_idx], int)
+    max_len = int(val_len.max())
+    valid = np.arange(max_len)[None, :] < val_len[:, None]
+    def node(var):
+        values = nc_data.variables[var][track_idx, :max_len]
+        return np.ma.filled(values.astype(float), np.nan)[valid]
+
+    packed.time, packed.offsets = _gettelman_times(
+        nc_data.variables['source_time'][track_idx, :max_len], val_len)
+    first = packed.offsets[:-1]
+
+    time_step = np.zeros(packed.time.size)
+    time_step[:-1] = np.diff(packed.time) / np.timedelta64(1, 'h')
+    # last time step of a track repeats the previous one
+    last = packed.offsets[1:][val_len > 1] - 1
+    time_step[last] = time_step[last - 1]
+
+    codes = np.ma.filled(nc_data.variables['basin'][track_idx, :max_len], -1)[valid]
+    basin_names = np.array(GETTELMAN_BASINS + [np.nan], object)
+    codes = np.where((codes >= 0) & (codes < len(GETTELMAN_BASINS)), codes,
+                     len(GETTELMAN_BASINS))
+    basins = basin_names[codes]
+
+    lon = node('lon')
+    lon[lon > 180] = lon[lon > 180] - 360  # change lon format to -180 to 180
+    lat = node('lat')
+
+    # m/s to kn
+    wind = node('wind') * mps2kts * scale_to_10m
+    # tracks with missing wind
+    no_wind = np.logical_or.reduceat(wind == 0, first)
+    wind[np.repeat(no_wind, val_len)] = -999.9
+
+    packed.nodes = {
+        'lat': lat,
+        'lon': lon,
+        'max_sustained_wind': wind,
+        'central_pressure': node('pres'),
+        'environmental_pressure': np.full(lat.size, 1015.),
+        'radius_max_wind': np.full(lat.size, 65.),
+        'maximum_precipitation': node('precmax'),
+        'average_precipitation': node('precavg'),
+        'basins': basins,
+        'time_step': time_step,
+    }
+    packed.attrs = {
+        'max_sustained_wind_unit': np.full(track_idx.size, 'kn'),
+        'central_pressure_unit': np.full(track_idx.size, 'mb'),
+        'sid': track_idx.astype(str),
+        'name': track_idx.astype(str),
+        'orig_event_flag': np.zeros(track_idx.size, bool),
+        'basin': basins[first],
+        'id_no': track_idx,
+        'category': _track_categories(wind, packed.offsets, 'kn'),
+    }
+    return packed
+
+def _track_categories(max_sus_wind, offsets, wind_unit, saffir_scale=None):
+    """Storm category of every track, see set_category.
+
+    Parameters:
+        max_sus_wind (np.array): max sustained wind of the nodes of all tracks
+        offsets (np.array): node offsets of the tracks
+        wind_unit (str): units of max sustained wind
+        saffir_scale (list, optional): Saffir-Simpson scale in same units as wind
+
+    Returns:
+        np.array
+    """
+    if saffir_scale is None:
+        saffir_scale = SAFFIR_SIM_CAT
+        if wind_unit != 'kn':
+            max_sus_wind = _change_max_wind_unit(max_sus_wind, wind_unit, 'kn')
+    if offsets.size < 2:
+        return np.zeros(0, int)
+    max_wind = np.fmax.reduceat(max_sus_wind, offsets[:-1])
+    category = np.searchsorted(saffir_scale, max_wind, side='right') - 1
+    category[(category >= len(saffir_scale) - 1) | np.isnan(max_wind)] = -1
+    return category
+
+def _ibtracs_match(sid, storm_id, year_range, in_basin, basin):
+    """Mask of IBTrACS storms matching the filters of read_ibtracs_netcdf.
+
+    Parameters:
+        sid (np.array): IBTrACS ID of every storm
+        storm_id (list(str)): IDs of the storms to select or None
+        year_range (tuple): (min_year, max_year) or None
+        in_basin (function): mask of storms in given basin
+        basin (str): basin to select or None
+
+    Returns:
+        np.array
+    """
+    match = np.ones(sid.size, dtype=bool)
+    if storm_id:
+        match &= np.isin(sid, storm_id)
+        if np.count_nonzero(match) == 0:
+            LOGGER.info('No tracks with given IDs %s.', storm_id)
+    if year_range:
+        years = np.array([int(st_id[:4]) for st_id in sid], int)
+        match &= (years >= year_range[0]) & (years <= year_range[1])
+        if np.count_nonzero(match) == 0:
+            LOGGER.info('No tracks in time range (%s, %s).', *year_range)
+    if basin:
+        match &= in_basin(basin)
+        if np.count_nonzero(match) == 0:
+            LOGGER.info('No tracks in basin %s.', basin)
+
+    if np.count_nonzero(match) == 0:
+        LOGGER.info('There are no tracks matching the specified requirements.')
+    return match
+
+def _ibtracs_tracks(ibtracs_ds, provider, estimate_missing):
+    """Tracks of the storms of an IBTrACS dataset, see read_ibtracs_netcdf.
+
+    Parameters:
+        ibtracs_ds (xr.Dataset): IBTrACS v04 storms
+        provider (str): agency whose data is used or None for automatic choice
+        estimate_missing (bool): estimate missing values from available values
+
+    Returns:
+        list(xr.Dataset)
+    """
+    ibtracs_ds['valid_t'] = ibtracs_ds.time.notnull()
+    valid_st = ibtracs_ds.valid_t.any(dim="date_time")
+    invalid_st = np.nonzero(~valid_st.data)[0]
+    if invalid_st.size > 0:
+        st_ids = ', '.join(ibtracs_ds.sid.sel(storm=invalid_st).astype(str).data)
+        LOGGER.warning('No valid timestamps found for %s.', st_ids)
+        ibtracs_ds = ibtracs_ds.sel(storm=valid_st)
+
+    if not provider:
+        agency_pref, track_agency_ix = ibtracs_track_agency(ibtracs_ds)
+
+    for var in ['wind', 'pres', 'rmw', 'poci', 'roci']:
+        if provider:
+            # enforce use of specified provider's data points
+            ibtracs_ds[var] = ibtracs_ds[f'{provider}_{var}']
+        else:
+            # array of values in order of preference
+            cols = [f'{a}_{var}' for a in agency_pref]
+            cols = [col for col in cols if col in ibtracs_ds.data_vars.keys()]
+            all_vals = ibtracs_ds[cols].to_array(dim='agency')
+            preferred_ix = all_vals.notnull().argmax(dim='agency')
+
+            if var in ['wind', 'pres']:
+                # choice: wmo -> wmo_agency/usa_agency -> preferred
+                ibtracs_ds[var] = ibtracs_ds['wmo_' + var] \
+                    .fillna(all_vals.isel(agency=track_agency_ix)) \
+                    .fillna(all_vals.isel(agency=preferred_ix))
+            else:
+                ibtracs_ds[var] = all_vals.isel(agency=preferred_ix)
+    ibtracs_ds = ibtracs_ds[['sid', 'name', 'basin', 'lat', 'lon', 'time', 'valid_t',
+                             'wind', 'pres', 'rmw', 'roci', 'poci']]
+
+    if estimate_missing:
+        ibtracs_ds['pres'][:] = _estimate_pressure(ibtracs_ds.pres,
+                                                   ibtracs_ds.lat, ibtracs_ds.lon,
+                                                   ibtracs_ds.wind)
+        ibtracs_ds['wind'][:] = _estimate_vmax(ibtracs_ds.wind,
+                                               ibtracs_ds.lat, ibtracs_ds.lon,
+                                               ibtracs_ds.pres)
+
+    ibtracs_ds['valid_t'] &= ibtracs_ds.wind.notnull() & ibtracs_ds.pres.notnull()
+    valid_st = ibtracs_ds.valid_t.any(dim="date_time")
+    invalid_st = np.nonzero(~valid_st.data)[0]
+    if invalid_st.size > 0:
+        st_ids = ', '.join(ibtracs_ds.sid.sel(storm=invalid_st).astype(str).data)
+        LOGGER.warning('No valid wind/pressure values found for %s.', st_ids)
+        ibtracs_ds = ibtracs_ds.sel(storm=valid_st)
+
+    max_wind = ibtracs_ds.wind.max(dim="date_time").data.ravel()
+    category_test = (max_wind[:, None] < np.array(SAFFIR_SIM_CAT)[None])
+    category = np.argmax(category_test, axis=1) - 1
+    basin_map = {b.encode("utf-8"): v for b, v in BASIN_ENV_PRESSURE.items()}
+    basin_fun = lambda b: basin_map[b]
+
+    ibtracs_ds['id_no'] = (ibtracs_ds.sid.str.replace(b'N', b'0')
+                           .str.replace(b'S', b'1')
+                           .astype(float))
+    ibtracs_ds['time_step'] = xr.zeros_like(ibtracs_ds.time, dtype=float)
+    ibtracs_ds['time_step'][:, 1:] = (ibtracs_ds.time.diff(dim="date_time")
+                                      / np.timedelta64(1, 's'))
+    ibtracs_ds['time_step'][:, 0] = ibtracs_ds.time_step[:, 1]
+    provider = provider if provider else 'ibtracs'
+
+    last_perc = 0
+    all_tracks = []
+    for i_track, t_msk in enumerate(ibtracs_ds.valid_t.data):
+        perc = 100 * len(all_tracks) / ibtracs_ds.sid.size
+        if perc - last_perc >= 10:
+            LOGGER.info("Progress: %d%%", perc)
+            last_perc = perc
+        track_ds = ibtracs_ds.sel(storm=i_track, date_time=t_msk)
+        st_penv = xr.apply_ufunc(basin_fun, track_ds.basin, vectorize=True)
+        track_ds['time'][:1] = track_ds.time[:1].dt.floor('H')
+        if track_ds.time.size > 1:
+            track_ds['time_step'][0] = (track_ds.time[1] - track_ds.time[0]) \
+                                  / np.timedelta64(1, 's')
+
+        with warnings.catch_warnings():
+            # See https://github.com/pydata/xarray/issues/4167
+            warnings.simplefilter(action="ignore", category=FutureWarning)
+
+            track_ds['rmw'] = track_ds.rmw \
+                .ffill(dim='date_time', limit=1) \
+                .bfill(dim='date_time', limit=1) \
+                .fillna(0)
+            track_ds['roci'] = track_ds.roci \
+                .ffill(dim='date_time', limit=1) \
+                .bfill(dim='date_time', limit=1) \
+                .fillna(0)
+            track_ds['poci'] = track_ds.poci \
+                .ffill(dim='date_time', limit=4) \
+                .bfill(dim='date_time', limit=4)
+            # this is the most time consuming line in the processing:
+            track_ds['poci'] = track_ds.poci.fillna(st_penv)
+
+        if estimate_missing:
+            track_ds['rmw'][:] = estimate_rmw(track_ds.rmw.values, track_ds.pres.values)
+            track_ds['roci'][:] = estimate_roci(track_ds.roci.values, track_ds.rmw.values)
+            track_ds['roci'][:] = np.fmax(track_ds.rmw.values, track_ds.roci.values)
+
+        # ensure environmental pressure >= central pressure
+        # this is the second most time consuming line in the processing:
+        track_ds['poci'][:] = np.fmax(track_ds.poci, track_ds.pres)
+
+        all_tracks.append(xr.Dataset({
+            'time_step': ('time', track_ds.time_step.data),
+            'radius_max_wind': ('time', track_ds.rmw.data),
+            'radius_oci': ('time', track_ds.roci.data),
+            'max_sustained_wind': ('time', track_ds.wind.data),
+            'central_pressure': ('time', track_ds.pres.data),
+            'environmental_pressure': ('time', track_ds.poci.data),
+        }, coords={
+            'time': track_ds.time.dt.round('s').data,
+            'lat': ('time', track_ds.lat.data),
+            'lon': ('time', track_ds.lon.data),
+        }, attrs={
+            'max_sustained_wind_unit': 'kn',
+            'central_pressure_unit': 'mb',
+            'name': track_ds.name.astype(str).item(),
+            'sid': track_ds.sid.astype(str).item(),
+            'orig_event_flag': True,
+            'data_provider': provider,
+            'basin': track_ds.basin.values[0].astype(str).item(),
+            'id_no': track_ds.id_no.item(),
+            'category': category[i_track],
+        }))
+    return all_tracks
+
+
+def _ibtracs_cache(fn_nc, provider, estimate_missing):
+    """Preprocessed store of all tracks of an IBTrACS file. The store is
+    written if it does not exist or if the IBTrACS file changed.
+
+    Parameters:
+        fn_nc (str): IBTrACS netcdf file
+        provider (str): agency whose data is used or None for automatic choice
+        estimate_missing (bool): estimate missing values from available values
+
+    Returns:
+        str: netcdf file of PackedTracks.to_dataset with variable
+        ibtracs_basins
+    """
+    stat = os.stat(fn_nc)
+    source = {'source_file': os.path.abspath(fn_nc),
+              'source_size': str(stat.st_size),
+              'source_mtime': str(stat.st_mtime_ns),
+              'cache_version': IBTRACS_CACHE_VERSION}
+    os.makedirs(IBTRACS_CACHE_DIR, exist_ok=True)
+    fn_cache = os.path.join(IBTRACS_CACHE_DIR, '{}.{}{}.nc'.format(
+        os.path.splitext(os.path.basename(fn_nc))[0], provider if provider else 'auto',
+        '.estimate' if estimate_missing else ''))
+    if os.path.isfile(fn_cache):
+        with xr.open_dataset(fn_cache) as cache_ds:
+            if all(cache_ds.attrs.get(key) == val for key, val in source.items()):
+                return fn_cache
+        LOGGER.info('%s changed, updating preprocessed tracks %s.', fn_nc, fn_cache)
+
+    LOGGER.info('Preprocessing all tracks of %s into %s.', fn_nc, fn_cache)
+    with xr.open_dataset(fn_nc) as ibtracs_ds:
+        tracks = _ibtracs_tracks(ibtracs_ds, provider, estimate_missing)
+        # all basins of every storm, including invalid nodes, to filter by basin
+        storm_basins = {st_id.decode(): ' '.join(np.unique(st_bas[st_bas != b'']).astype(str))
+                        for st_id, st_bas in zip(ibtracs_ds.sid.values,
+                                                 ibtracs_ds.basin.values)}
+        cache_ds = PackedTracks(tracks).to_dataset()
+    cache_ds['ibtracs_basins'] = ('storm', np.array([storm_basins[track.sid]
+                                                     for track in tracks], str))
+    cache_ds.attrs.update(source)
+    file_desc, fn_tmp = tempfile.mkstemp(dir=IBTRACS_CACHE_DIR, suffix='.tmp')
+    os.close(file_desc)
+    cache_ds.to_netcdf(fn_tmp)
+    os.replace(fn_tmp, fn_cache)
+    return fn_cache
+
+def _interp_packed(packed, time_step_h):
+    """Interpolate all tracks to regular time steps in one pass over the node
+    arrays. As xarray's resample and interpolate: time steps are aligned to
+    the first day of each track, lat and lon are interpolated linearly,
+    quadratically or cubically depending on the number of nodes, every other
+    variable linearly.
+
+    Parameters:
+        packed (PackedTracks): tracks with at least two nodes
+        time_step_h (float): time step in hours
+
+    Returns:
+        PackedTracks
+    """
+    step = np.int64(round(time_step_h * 3600 * 1e9))
+    sizes, offsets = packed.sizes, packed.offsets
+    time = packed.time.astype(np.int64)
+    t_first, t_last = time[offsets[:-1]], time[offsets[1:] - 1]
+    origin = packed.time[offsets[:-1]].astype('datetime64[D]')\
+                                      .astype('datetime64[ns]').astype(np.int64)
+    k_first = (t_first - origin) // step
+    new_sizes = (t_last - origin) // step - k_first + 1
+
+    out = PackedTracks()
+    out.offsets = np.zeros(packed.size + 1, int)
+    np.cumsum(new_sizes, out=out.offsets[1:])
+    new_track = np.repeat(np.arange(packed.size), new_sizes)
+    new_time = origin[new_track] + step * (np.arange(out.offsets[-1])
+                                           - out.offsets[:-1][new_track]
+                                           + k_first[new_track])
+    out.time = new_time.astype('datetime64[ns]')
+
+    # number of nodes of its track before every new time step
+    old_track = packed.track_idx
+    order = np.lexsort((np.concatenate([np.ones(time.size, int),
+                                        np.zeros(new_time.size, int)]),
+                        np.concatenate([time, new_time]),
+                        np.concatenate([old_track, new_track])))
+    is_old = order < time.size
+    num_before = np.cumsum(is_old)[~is_old] - offsets[:-1][new_track]
+    new_pos = order[~is_old] - time.size
+    idx = np.empty(new_time.size, int)
+    idx[new_pos] = num_before
+    # same interval selection and extrapolation as scipy's interp1d
+    idx = np.clip(idx, 1, sizes[new_track] - 1)
+    lo_node = offsets[:-1][new_track] + idx - 1
+    hi_node = lo_node + 1
+    x_new = (new_time - t_first[new_track]).astype(float)
+    x_lo = (time[lo_node] - t_first[new_track]).astype(float)
+    x_hi = (time[hi_node] - t_first[new_track]).astype(float)
+    out_bounds = (new_time < t_first[new_track]) | (new_time > t_last[new_track])
+
+    def linear(values):
+        values = values.astype(float)
+        slope = (values[hi_node] - values[lo_node]) / (x_hi - x_lo)
+        res = slope * (x_new - x_lo) + values[lo_node]
+        res[out_bounds] = np.nan
+        return res
+
+    lon = packed.nodes['lon'].astype(float)
+    # tracks crossing 180 degrees east/west -> use positive degrees east
+    cross = np.logical_or.reduceat(lon < -170, offsets[:-1]) \
+            & np.logical_or.reduceat(lon > 170, offsets[:-1])
+    lon[np.repeat(cross, sizes) & (lon < 0)] += 360
+
+    for var, values in packed.nodes.items():
+        if var in ('lat', 'lon'):
+            out.nodes[var] = linear(lon if var == 'lon' else values)
+        elif var == 'time_step':
+            out.nodes[var] = np.full(new_time.size, time_step_h, dtype=float)
+        else:
+            out.nodes[var] = linear(values)
+
+    # quadratic and cubic interpolation of the coordinates of longer tracks,
+    # one spline for all tracks with the same node and new time steps
+    same_steps = dict()
+    for i_track in (sizes > 2).nonzero()[0]:
+        key = (time[offsets[i_track]:offsets[i_track + 1]] - t_first[i_track]).tobytes(), \
+              new_time[out.offsets[i_track]] - t_first[i_track]
+        same_steps.setdefault(key, []).append(i_track)
+    for tr_idx in same_steps.values():
+        tr_idx = np.array(tr_idx)
+        nodes = offsets[tr_idx][:, None] + np.arange(sizes[tr_idx[0]])
+        new_nodes = out.offsets[tr_idx][:, None] + np.arange(new_sizes[tr_idx[0]])
+        spline = interpolate.make_interp_spline(
+            (time[nodes[0]] - t_first[tr_idx[0]]).astype(float),
+            np.concatenate([packed.nodes['lat'][nodes], lon[nodes]]).T,
+            k=min(3, sizes[tr_idx[0]] - 1), check_finite=False)
+        coord = spline(x_new[new_nodes[0]]).T
+        coord[:, out_bounds[new_nodes[0]]] = np.nan
+        out.nodes['lat'][new_nodes] = coord[:tr_idx.size]
+        out.nodes['lon'][new_nodes] = coord[tr_idx.size:]
+    out.nodes['lon'][out.nodes['lon'] > 180] -= 360
+
+    out.attrs = {attr: val.copy() for attr, val in packed.attrs.items()}
+    if {'category', 'max_sustained_wind_unit'} <= set(out.attrs) \
+            and 'max_sustained_wind' in out.nodes:
+        out.attrs['category'] = np.array([
+            set_category(out.nodes['max_sustained_wind'][out.offsets[i]:out.offsets[i + 1]],
+                         unit)
+            for i, unit in enumerate(out.attrs['max_sustained_wind_unit'])])
+    return out
+
 def track_land_params(track, land_geom):
     """Compute parameters of land for one track.
 
@@ -903,9 +1504,37 @@ def track_land_params(track, land_geom):
         track (xr.Dataset): tropical cyclone track
         land_geom (shapely.geometry.multipolygon.MultiPolygon): land geometry
     """
-    track['on_land'] = ('time',
-                        coord_util.coord_on_land(track.lat.values, track.lon.values, land_geom))
-    track['dist_since_lf'] = ('time', _dist_since_lf(track))
+    tracks_land_params([track], land_geom)
+
+def tracks_land_params(tracks, land_geom):
+    """Compute parameters of land for several tracks, looking up all their
+    nodes at once in the rasterized land geometry (see
+    climada.util.coordinates.land_raster).
+
+    Parameters:
+        tracks (list(xr.Dataset) or PackedTracks): tropical cyclone tracks
+        land_geom (shapely.geometry.multipolygon.MultiPolygon): land geometry
+    """
+    if isinstance(tracks, PackedTracks):
+        nodes, offsets = tracks.nodes, tracks.offsets
+    else:
+        if not tracks:
+            return
+        nodes = {var: np.concatenate([track[var].values for track in tracks])
+                 for var in ['lat', 'lon']}
+        offsets = np.zeros(len(tracks) + 1, int)
+        np.cumsum([track.time.size for track in tracks], out=offsets[1:])
+    on_land = coord_util.coord_on_land(nodes['lat'], nodes['lon'], land_geom,
+                                       raster_res=coord_util.LAND_RASTER_RES)
+    dist_since_lf = _dist_since_lf_nodes(nodes['lat'], nodes['lon'], on_land, offsets)
+    if isinstance(tracks, PackedTracks):
+        nodes['on_land'] = on_land
+        nodes['dist_since_lf'] = dist_since_lf
+        return
+    for i_track, track in enumerate(tracks):
+        nodes = slice(offsets[i_track], offsets[i_track + 1])
+        track['on_land'] = ('time', on_land[nodes])
+        track['dist_since_lf'] = ('time', dist_since_lf[nodes])
 
 def _dist_since_lf(track):
     """Compute the distance to landfall in km point for every point on land.
@@ -917,44 +1546,67 @@ def _dist_since_lf(track):
     Returns:
         np.arrray
     """
-    dist_since_lf = np.zeros(track.time.values.shape)
-
-    # Index in sea that follows a land index
-    sea_land_idx = np.where(np.diff(track.on_land.astype(int)) == 1)[0]
-    if not sea_land_idx.size:
-        return (dist_since_lf + 1) * np.nan
-
-    # Index in sea that comes from previous land index
-    land_sea_idx = np.where(np.diff(track.on_land.astype(int)) == -1)[0] + 1
-    if track.on_land[-1]:
-        land_sea_idx = np.append(land_sea_idx, track.time.size)
-    orig_lf = np.empty((sea_land_idx.size, 2))
-    for i_lf, lf_point in enumerate(sea_land_idx):
-        orig_lf[i_lf][0] = track.lat[lf_point] + \
-            (track.lat[lf_point + 1] - track.lat[lf_point]) / 2
-        orig_lf[i_lf][1] = track.lon[lf_point] + \
-            (track.lon[lf_point + 1] - track.lon[lf_point]) / 2
-
-    dist = DistanceMetric.get_metric('haversine')
-    nodes1 = np.radians(np.array([track.lat.values[1:],
-                                  track.lon.values[1:]]).transpose())
-    nodes0 = np.radians(np.array([track.lat.values[:-1],
-                                  track.lon.values[:-1]]).transpose())
-    dist_since_lf[1:] = dist.pairwise(nodes1, nodes0).diagonal()
-    dist_since_lf[~track.on_land.values] = 0.0
-    nodes1 = np.array([track.lat.values[sea_land_idx + 1],
-                       track.lon.values[sea_land_idx + 1]]).transpose() / 180 * np.pi
-    dist_since_lf[sea_land_idx + 1] = \
-        dist.pairwise(nodes1, orig_lf / 180 * np.pi).diagonal()
-    for sea_land, land_sea in zip(sea_land_idx, land_sea_idx):
-        dist_since_lf[sea_land + 1:land_sea] = \
-            np.cumsum(dist_since_lf[sea_land + 1:land_sea])
+    return _dist_since_lf_nodes(track.lat.values, track.lon.values, track.on_land.values,
+                                np.array([0, track.time.size]))
 
-    dist_since_lf *= EARTH_RADIUS_KM
-    dist_since_lf[~track.on_land.values] = np.nan
+def _dist_since_lf_nodes(lat, lon, on_land, offsets):
+    """Distance since landfall in km of the nodes of several tracks. The
+    distance is accumulated along the track from the middle of the last step
+    on sea. Points on water and on land before any landfall of the track
+    get nan values.
+
+    Parameters:
+        lat (np.array): latitude of the nodes of all tracks
+        lon (np.array): longitude of the nodes of all tracks
+        on_land (np.array): whether the nodes are on land
+        offsets (np.array): index of first node of every track, with total
+            number of nodes appended
 
+    Returns:
+        np.array
+    """
+    on_land = on_land.astype(bool)
+    if not on_land.any():
+        return np.full(lat.size, np.nan)
+    track_start = np.zeros(lat.size, bool)
+    track_start[offsets[:-1][np.diff(offsets) > 0]] = True
+    prev_sea = np.zeros(lat.size, bool)
+    prev_sea[1:] = ~on_land[:-1]
+    landfall = on_land & prev_sea & ~track_start
+
+    lat_rad, lon_rad = np.radians(lat), np.radians(lon)
+    step = np.zeros(lat.size)
+    step[1:] = _haversine(lat_rad[1:], lon_rad[1:], lat_rad[:-1], lon_rad[:-1])
+    # first node on land: distance from middle of the landfall step
+    lf_idx = np.nonzero(landfall)[0]
+    step[lf_idx] = _haversine(lat[lf_idx] / 180 * np.pi, lon[lf_idx] / 180 * np.pi,
+                              (lat[lf_idx - 1] + (lat[lf_idx] - lat[lf_idx - 1]) / 2)
+                              / 180 * np.pi,
+                              (lon[lf_idx - 1] + (lon[lf_idx] - lon[lf_idx - 1]) / 2)
+                              / 180 * np.pi)
+
+    # accumulate over every run of nodes on land after a landfall, summing
+    # one step after the other like np.cumsum
+    dist_since_lf = np.full(lat.size, np.nan)
+    dist_since_lf[lf_idx] = step[lf_idx]
+    run_node = lf_idx + 1
+    run_on = np.ones(lf_idx.size, bool)
+    while run_on.any():
+        run_on &= run_node < lat.size
+        run_on[run_on] = on_land[run_node[run_on]] & ~track_start[run_node[run_on]]
+        node = run_node[run_on]
+        dist_since_lf[node] = dist_since_lf[node - 1] + step[node]
+        run_node += 1
+    dist_since_lf *= EARTH_RADIUS_KM
     return dist_since_lf
 
+def _haversine(lat1, lon1, lat2, lon2):
+    """Great circle angle between points in radians."""
+    sin_lat = np.sin(0.5 * (lat1 - lat2))
+    sin_lon = np.sin(0.5 * (lon1 - lon2))
+    return 2 * np.arcsin(np.sqrt(sin_lat * sin_lat
+                                 + np.cos(lat1) * np.cos(lat2) * sin_lon * sin_lon))
+
 def _estimate_pressure(cen_pres, lat, lon, v_max):
     """Replace missing pressure values with statistical estimate.
 
@@ -102,6 +102,10 @@ class TCForecast(TCTracks):
         elif files is None:
             files = get_file_names(path)
 
+        if self.pool:
+            self._read_bufr_parallel(files)
+            return
+
         for i, file in tqdm.tqdm(enumerate(files, 1), desc='Processing',
                                  unit='files', total=len(files)):
             try:
@@ -116,6 +120,33 @@ class TCForecast(TCTracks):
             except AttributeError:
                 pass
 
+    def _read_bufr_parallel(self, files):
+        """Decode BUFR files in parallel with self.pool and append their
+        tracks in the order of files. Opened files are read in this process,
+        since they cannot be passed to the workers, and closed afterwards.
+
+        Parameters:
+            files (list(str) or list(filelike)): BUFR TC track files
+        """
+        bufrs = []
+        for file in files:
+            if hasattr(file, 'read'):
+                file.seek(0)
+                bufrs.append(file.read())
+                file.close()
+            else:
+                bufrs.append(file)
+        num_files = len(bufrs)
+        LOGGER.info('Decoding %s BUFR files using %s CPUs.', num_files,
+                    self.pool.ncpus)
+        chunksize = max(min(num_files // self.pool.ncpus, 1000), 1)
+        file_tracks = self.pool.map(self._read_bufr_tracks, bufrs,
+                                    range(1, num_files + 1),
+                                    chunksize=chunksize)
+        for tracks in file_tracks:
+            for track in tracks:
+                self.append(track)
+
     @staticmethod
     def fetch_bufr_ftp(target_dir=None, remote_dir=None):
         """
@@ -181,15 +212,29 @@ class TCForecast(TCTracks):
         """ Read a single BUFR TC track file.
 
         Parameters:
-            file (str, filelike): Path object, string, or file-like object
+            file (str, filelike, bytes): Path object, string, file-like
+                object or content of the file
             id_no (int): Numerical ID; optional. Else use date + random int.
             fcast_rep (int): Of the form 1xx000, indicating the delayed
                 replicator containing the forecast values; optional.
         """
+        for track in self._read_bufr_tracks(file, id_no, fcast_rep):
+            self.append(track)
+
+    @staticmethod
+    def _read_bufr_tracks(file, id_no=None, fcast_rep=None):
+        """Decode a single BUFR TC track file into its non-empty tracks.
+        See read_one_bufr_tc.
+
+        Returns:
+            list(xarray.Dataset)
+        """
 
         decoder = pybufrkit.decoder.Decoder()
 
-        if hasattr(file, 'read'):
+        if isinstance(file, bytes):
+            bufr = decoder.process(file)
+        elif hasattr(file, 'read'):
             bufr = decoder.process(file.read())
         elif hasattr(file, 'read_bytes'):
             bufr = decoder.process(file.read_bytes())
@@ -207,7 +252,7 @@ class TCForecast(TCTracks):
         meta_query = pybufrkit.mdquery.MetadataQuerent(meparser).query
 
         if fcast_rep is None:
-            fcast_rep = self._find_delayed_replicator(
+            fcast_rep = TCForecast._find_delayed_replicator(
                 meta_query(bufr, '%unexpanded_descriptors')
             )
 
@@ -245,15 +290,17 @@ class TCForecast(TCTracks):
         else:
             provider = 'BUFR code ' + str(orig_centre)
 
+        tracks = []
         for i in msg['significance'].subset_indices():
             name = msg['wmo_longname'].get_values(i)[0].decode().strip()
-            track = self._subset_to_track(
+            track = TCForecast._subset_to_track(
                 msg, i, provider, timestamp_origin, name, id_no
             )
             if track is not None:
-                self.append(track)
+                tracks.append(track)
             else:
                 LOGGER.debug('Dropping empty track %s, subset %d', name, i)
+        return tracks
 
     @staticmethod
     def _subset_to_track(msg, index, provider, timestamp_origin, name, id_no):
@@ -0,0 +1,313 @@
+"""
+This file is part of CLIMADA.
+
+Copyright (C) 2017 ETH Zurich, CLIMADA contributors listed in AUTHORS.
+
+CLIMADA is free software: you can redistribute it and/or modify it under the
+terms of the GNU Lesser General Public License as published by the Free
+Software Foundation, version 3.
+
+CLIMADA is distributed in the hope that it will be useful, but WITHOUT ANY
+WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License along
+with CLIMADA. If not, see <https://www.gnu.org/licenses/>.
+
+---
+
+Define PackedTracks: columnar ragged-array storage of TC tracks.
+"""
+
+__all__ = ['PackedTracks', 'group_tracks']
+
+import logging
+import numpy as np
+import xarray as xr
+
+LOGGER = logging.getLogger(__name__)
+
+COORD_VARS = ['lat', 'lon']
+"""Node variables that are coordinates of the track datasets"""
+
+class PackedTracks():
+    """Tropical cyclone tracks stored as concatenated node arrays.
+
+    The nodes of all tracks are stored one after the other in one array per
+    variable, track i covers the nodes offsets[i]:offsets[i+1]. Attributes
+    of the tracks are stored in one array per attribute. Indexing with an
+    integer and iterating returns xarray.Dataset tracks as in TCTracks.data,
+    whose variables are views of the node arrays. Changes to the values of
+    these variables are done in the packed arrays, while changes to their
+    attributes or coordinates are lost.
+
+    Attributes:
+        time (np.array): time of every node, datetime64
+        nodes (dict(np.array)): every other variable at every node, e.g.
+            lat, lon, central_pressure
+        offsets (np.array): index of first node of every track, with total
+            number of nodes appended
+        attrs (dict(np.array)): every track attribute of every track, e.g.
+            sid, basin, category
+    """
+    def __init__(self, tracks=None):
+        """Pack given tracks.
+
+        Parameters:
+            tracks (list(xarray.Dataset), optional): tracks with the same
+                variables and attributes
+
+        Raises:
+            ValueError
+        """
+        self.time = np.array([], 'datetime64[ns]')
+        self.nodes = dict()
+        self.offsets = np.zeros(1, int)
+        self.attrs = dict()
+        if tracks:
+            self._pack(list(tracks))
+
+    def _pack(self, tracks):
+        """Concatenate node arrays and collect attributes of tracks."""
+        var_names = COORD_VARS + [var for var in tracks[0].data_vars]
+        attr_names = list(tracks[0].attrs.keys())
+        for track in tracks:
+            if set(track.data_vars) | set(COORD_VARS) != set(var_names) \
+            or set(track.attrs) != set(attr_names):
+                LOGGER.error('Tracks with different variables or attributes '
+                             'cannot be packed: %s.', track.attrs.get('sid'))
+                raise ValueError
+        sizes = np.array([track.time.size for track in tracks], int)
+        self.offsets = np.zeros(sizes.size + 1, int)
+        np.cumsum(sizes, out=self.offsets[1:])
+        self.time = np.concatenate([track.time.values for track in tracks])\
+                      .astype('datetime64[ns]')
+        self.nodes = {var: np.concatenate([track[var].values for track in tracks])
+                      for var in var_names}
+        self.attrs = {attr: _attr_array([track.attrs[attr] for track in tracks])
+                      for attr in attr_names}
+
+    @property
+    def size(self):
+        """Number of tracks"""
+        return self.offsets.size - 1
+
+    @property
+    def sizes(self):
+        """Number of nodes of every track"""
+        return np.diff(self.offsets)
+
+    @property
+    def track_idx(self):
+        """Index of the track of every node"""
+        return np.repeat(np.arange(self.size), self.sizes)
+
+    def track(self, i_track):
+        """Track as xarray.Dataset with variables viewing the node arrays.
+
+        Parameters:
+            i_track (int): index of the track
+
+        Returns:
+            xarray.Dataset
+        """
+        nodes = slice(self.offsets[i_track], self.offsets[i_track + 1])
+        coords = {'time': self.time[nodes]}
+        coords.update({var: ('time', self.nodes[var][nodes]) for var in COORD_VARS})
+        data_vars = {var: ('time', val[nodes]) for var, val in self.nodes.items()
+                     if var not in COORD_VARS}
+        attrs = {attr: _attr_value(val[i_track]) for attr, val in self.attrs.items()}
+        return xr.Dataset(data_vars, coords=coords, attrs=attrs)
+
+    def select(self, sel):
+        """New PackedTracks containing the selected tracks.
+
+        Parameters:
+            sel (np.array or slice): mask or indices of tracks. The node
+                arrays of a slice without step are views of these ones.
+
+        Returns:
+            PackedTracks
+        """
+        out = PackedTracks()
+        if isinstance(sel, slice) and sel.step in (None, 1):
+            # contiguous tracks: views of the node arrays
+            start, stop, _ = sel.indices(self.size)
+            stop = max(start, stop)
+            nodes = slice(self.offsets[start], self.offsets[stop])
+            out.offsets = self.offsets[start:stop + 1] - self.offsets[start]
+            out.time = self.time[nodes]
+            out.nodes = {var: val[nodes] for var, val in self.nodes.items()}
+            out.attrs = {attr: val[start:stop] for attr, val in self.attrs.items()}
+            return out
+        tr_idx = np.arange(self.size)[sel]
+        sizes = self.sizes[tr_idx]
+        out.offsets = np.zeros(tr_idx.size + 1, int)
+        np.cumsum(sizes, out=out.offsets[1:])
+        node_idx = np.repeat(self.offsets[tr_idx] - out.offsets[:-1], sizes) \
+                   + np.arange(out.offsets[-1])
+        out.time = self.time[node_idx]
+        out.nodes = {var: val[node_idx] for var, val in self.nodes.items()}
+        out.attrs = {attr: val[tr_idx] for attr, val in self.attrs.items()}
+        return out
+
+    def to_dataset(self):
+        """Tracks as one xarray.Dataset in contiguous ragged array
+        representation (CF conventions): node variables along dimension
+        'node', track attributes along dimension 'storm' and the number of
+        nodes of every track in variable 'node_count'. Track attributes of
+        mixed types are stored as strings.
+
+        Returns:
+            xarray.Dataset
+        """
+        data_vars = {var: ('node', val) for var, val in self.nodes.items()}
+        bool_attrs = []
+        for attr, val in self.attrs.items():
+            if val.dtype == bool:
+                bool_attrs.append(attr)
+                val = val.astype(np.int8)
+            elif val.dtype == object:
+                val = val.astype(str)
+            data_vars[attr] = ('storm', val)
+        data_vars['node_count'] = ('storm', self.sizes,
+                                   {'sample_dimension': 'node'})
+        return xr.Dataset(data_vars, coords={'time': ('node', self.time)}, attrs={
+            'featureType': 'trajectory',
+            'node_vars': ' '.join(self.nodes.keys()),
+            'track_attrs': ' '.join(self.attrs.keys()),
+            'bool_attrs': ' '.join(bool_attrs),
+        })
+
+    @classmethod
+    def from_dataset(cls, dataset, sel=None):
+        """Tracks from xarray.Dataset written by `to_dataset`. Only the nodes
+        of the selected tracks are read.
+
+        Parameters:
+            dataset (xarray.Dataset): tracks in ragged array representation,
+                e.g. opened from a netcdf file
+            sel (np.array or slice, optional): mask or indices of tracks to
+                read. Default: all
+
+        Returns:
+            PackedTracks
+        """
+        sizes = dataset.node_count.values.astype(int)
+        offsets = np.zeros(sizes.size + 1, int)
+        np.cumsum(sizes, out=offsets[1:])
+        tr_idx = np.arange(sizes.size)
+        if sel is not None:
+            tr_idx = tr_idx[sel]
+
+        out = cls()
+        out.offsets = np.zeros(tr_idx.size + 1, int)
+        np.cumsum(sizes[tr_idx], out=out.offsets[1:])
+        if tr_idx.size:
+            # read the range of nodes covering the selected tracks only
+            first, last = offsets[tr_idx].min(), offsets[tr_idx + 1].max()
+            node_idx = np.repeat(offsets[tr_idx] - first - out.offsets[:-1],
+                                 sizes[tr_idx]) + np.arange(out.offsets[-1])
+        else:
+            first, last, node_idx = 0, 0, np.zeros(0, int)
+
+        out.time = dataset.time[first:last].values[node_idx].astype('datetime64[ns]')
+        out.nodes = {var: dataset[var][first:last].values[node_idx]
+                     for var in dataset.attrs['node_vars'].split()}
+        bool_attrs = dataset.attrs['bool_attrs'].split()
+        for attr in dataset.attrs['track_attrs'].split():
+            val = dataset[attr].values[tr_idx]
+            if attr in bool_attrs:
+                val = val.astype(bool)
+            elif val.dtype == object:
+                val = val.astype(str)
+            out.attrs[attr] = val
+        return out
+
+    @classmethod
+    def concat(cls, packed_list):
+        """Tracks of several PackedTracks, one after the other.
+
+        Parameters:
+            packed_list (list(PackedTracks)): tracks with the same variables
+                and attributes
+
+        Returns:
+            PackedTracks
+
+        Raises:
+            ValueError
+        """
+        out = cls()
+        packed_list = [packed for packed in packed_list if packed.size]
+        if not packed_list:
+            return out
+        for packed in packed_list[1:]:
+            if set(packed.nodes) != set(packed_list[0].nodes) \
+            or set(packed.attrs) != set(packed_list[0].attrs):
+                LOGGER.error('Tracks with different variables or attributes '
+                             'cannot be packed: %s.', packed.attrs.get('sid'))
+                raise ValueError
+        sizes = np.concatenate([packed.sizes for packed in packed_list])
+        out.offsets = np.zeros(sizes.size + 1, int)
+        np.cumsum(sizes, out=out.offsets[1:])
+        out.time = np.concatenate([packed.time for packed in packed_list])
+        out.nodes = {var: np.concatenate([packed.nodes[var] for packed in packed_list])
+                     for var in packed_list[0].nodes}
+        out.attrs = {attr: np.concatenate([packed.attrs[attr] for packed in packed_list])
+                     for attr in packed_list[0].attrs}
+        return out
+
+    def to_list(self):
+        """Tracks as list of xarray.Dataset, independent of the node arrays.
+
+        Returns:
+            list(xarray.Dataset)
+        """
+        return [self.track(i_track).copy(deep=True) for i_track in range(self.size)]
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        return (self.track(i_track) for i_track in range(self.size))
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, np.integer)):
+            if key < 0:
+                key += self.size
+            if not 0 <= key < self.size:
+                raise IndexError('track index out of range')
+            return self.track(key)
+        return self.select(key)
+
+def group_tracks(tracks):
+    """Group tracks with the same variables and attributes, i.e. tracks that
+    can be packed together.
+
+    Parameters:
+        tracks (list(xarray.Dataset)): tracks
+
+    Returns:
+        list(list(int)): indices of the tracks of every group
+    """
+    groups = dict()
+    for i_track, track in enumerate(tracks):
+        key = (tuple(sorted(track.data_vars)), tuple(sorted(track.attrs)))
+        groups.setdefault(key, []).append(i_track)
+    return list(groups.values())
+
+def _attr_array(values):
+    """Array of track attributes, object array if mixed types"""
+    types = {type(val) for val in values}
+    if len(types) == 1 and issubclass(types.pop(), (bool, int, float, str, np.generic)):
+        return np.array(values)
+    arr = np.empty(len(values), object)
+    arr[:] = values
+    return arr
+
+def _attr_value(value):
+    """Python scalar of a track attribute"""
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
@@ -20,17 +20,17 @@ Generate synthetic tropical cyclone tracks from real ones
 """
 
 import array
-import itertools
 import logging
 import matplotlib.cm as cm_mp
 from matplotlib.lines import Line2D
 import matplotlib.pyplot as plt
-from numba import jit
+from numba import jit, prange
 import numpy as np
 
 from climada.util.config import CONFIG
 import climada.util.coordinates
 import climada.hazard.tc_tracks
+from climada.hazard.tc_tracks_packed import PackedTracks, group_tracks
 
 LOGGER = logging.getLogger(__name__)
 
@@ -88,36 +88,44 @@ def calc_random_walk(tracks,
     if seed >= 0:
         np.random.seed(seed)
 
-    random_vec = [np.random.uniform(size=ens_size * (2 + track.time.size))
-                  for track in tracks.data]
-
-    if tracks.pool:
-        chunksize = min(tracks.size // tracks.pool.ncpus, 1000)
-        new_ens = tracks.pool.map(_one_rnd_walk, tracks.data,
-                                  itertools.repeat(ens_size, tracks.size),
-                                  itertools.repeat(ens_amp0, tracks.size),
-                                  itertools.repeat(ens_amp, tracks.size),
-                                  itertools.repeat(max_angle, tracks.size),
-                                  random_vec, chunksize=chunksize)
+    packed_in = tracks.is_packed
+    if packed_in:
+        sizes = tracks.data.sizes
     else:
-        new_ens = [_one_rnd_walk(track, ens_size, ens_amp0, ens_amp,
-                                 max_angle, rand)
-                   for track, rand in zip(tracks.data, random_vec)]
-
-    tracks.data = sum(new_ens, [])
+        sizes = np.array([track.time.size for track in tracks.data], int)
+    # same random numbers as drawn track by track
+    rnd_start = np.zeros(tracks.size + 1, int)
+    np.cumsum(ens_size * (2 + sizes), out=rnd_start[1:])
+    random_vec = np.random.uniform(size=rnd_start[-1])
+
+    if packed_in:
+        tracks.data = _rnd_walk_packed(tracks.data, ens_size, ens_amp0, ens_amp,
+                                       max_angle, random_vec, rnd_start[:-1])
+    else:
+        new_data = [None] * (tracks.size * (ens_size + 1))
+        for tr_idx in group_tracks(tracks.data):
+            packed = PackedTracks([tracks.data[i_track] for i_track in tr_idx])
+            packed = _rnd_walk_packed(packed, ens_size, ens_amp0, ens_amp, max_angle,
+                                      random_vec, rnd_start[tr_idx])
+            for i_out, track in enumerate(packed.to_list()):
+                i_track, i_ens = divmod(i_out, ens_size + 1)
+                new_data[tr_idx[i_track] * (ens_size + 1) + i_ens] = track
+        tracks.data = new_data
 
     if decay:
-        hist_tracks = [track for track in tracks.data if track.orig_event_flag]
-        if hist_tracks:
+        if packed_in:
+            hist_tracks = tracks.data.select(tracks.data.attrs['orig_event_flag'].astype(bool))
+        else:
+            hist_tracks = [track for track in tracks.data if track.orig_event_flag]
+        if len(hist_tracks):
             try:
                 extent = tracks.get_extent()
                 land_geom = climada.util.coordinates.get_land_geometry(
                     extent=extent, resolution=10
                 )
-                v_rel, p_rel = _calc_land_decay(hist_tracks, land_geom,
-                                                pool=tracks.pool)
+                v_rel, p_rel = _calc_land_decay(hist_tracks, land_geom)
                 tracks.data = _apply_land_decay(tracks.data, v_rel, p_rel,
-                                                land_geom, pool=tracks.pool)
+                                                land_geom)
             except ValueError:
                 LOGGER.info('No land decay coefficients could be applied.')
         else:
@@ -125,49 +133,75 @@ def calc_random_walk(tracks,
                          'Historical tracks are needed for land decay.')
 
 
-@jit(parallel=True)
-def _one_rnd_walk(track, ens_size, ens_amp0, ens_amp, max_angle, rnd_vec):
-    """Interpolate values of one track.
+def _rnd_walk_packed(packed, ens_size, ens_amp0, ens_amp, max_angle, rnd_vec, rnd_start):
+    """Ensemble of every track, vectorised on the packed node arrays. Every
+    track is followed by its ensemble members.
 
     Parameters:
-        track (xr.Dataset): track data
+        packed (PackedTracks): tracks
+        rnd_vec (np.array): uniform random numbers
+        rnd_start (np.array): index of the first random number of every track
 
     Returns:
-        list(xr.Dataset)
+        PackedTracks
     """
-    ens_track = list()
-    n_dat = track.time.size
-    xy_ini = ens_amp0 * (rnd_vec[:2 * ens_size].reshape((2, ens_size)) - 0.5)
-    tmp_ang = np.cumsum(2 * max_angle * rnd_vec[2 * ens_size:] - max_angle)
-    coord_xy = np.empty((2, ens_size * n_dat))
-    coord_xy[0] = np.cumsum(ens_amp * np.sin(tmp_ang))
-    coord_xy[1] = np.cumsum(ens_amp * np.cos(tmp_ang))
-
-    ens_track.append(track)
-    for i_ens in range(ens_size):
-        i_track = track.copy(True)
-
-        d_xy = coord_xy[:, i_ens * n_dat: (i_ens + 1) * n_dat] - \
-            np.expand_dims(coord_xy[:, i_ens * n_dat], axis=1)
-        # change sign of latitude change for southern hemishpere:
-        d_xy = np.sign(track.lat.values[0]) * d_xy
-
-        d_lat_lon = d_xy + np.expand_dims(xy_ini[:, i_ens], axis=1)
-
-        i_track.lon.values = i_track.lon.values + d_lat_lon[0, :]
-        i_track.lat.values = i_track.lat.values + d_lat_lon[1, :]
-        i_track.attrs['orig_event_flag'] = False
-        i_track.attrs['name'] = i_track.attrs['name'] + '_gen' + str(i_ens + 1)
-        i_track.attrs['sid'] = i_track.attrs['sid'] + '_gen' + str(i_ens + 1)
-        i_track.attrs['id_no'] = i_track.attrs['id_no'] + (i_ens + 1) / 100
-
-        ens_track.append(i_track)
-
-    return ens_track
+    i_ens = np.tile(np.arange(ens_size + 1), packed.size)
+    out = packed.select(np.repeat(np.arange(packed.size), ens_size + 1))
+    d_lon, d_lat = _rnd_walk_offsets(packed.offsets, out.offsets,
+                                     np.sign(packed.nodes['lat'][packed.offsets[:-1]]),
+                                     rnd_vec, rnd_start, ens_size, ens_amp0, ens_amp,
+                                     max_angle)
+    out.nodes['lon'] += d_lon
+    out.nodes['lat'] += d_lat
+
+    gen = i_ens > 0
+    suffix = np.where(gen, np.char.add('_gen', i_ens.astype(str)), '')
+    out.attrs['orig_event_flag'] = np.where(gen, False, out.attrs['orig_event_flag'])
+    out.attrs['name'] = np.char.add(out.attrs['name'].astype(str), suffix)
+    out.attrs['sid'] = np.char.add(out.attrs['sid'].astype(str), suffix)
+    out.attrs['id_no'] = out.attrs['id_no'] + i_ens / 100
+    return out
+
+
+@jit(nopython=True, parallel=True)
+def _rnd_walk_offsets(offsets, out_offsets, sign_lat, rnd_vec, rnd_start, ens_size,
+                      ens_amp0, ens_amp, max_angle):
+    """Change of longitude and latitude of every node of the ensemble of
+    every track. The random walk of a track runs through all its members.
 
+    Parameters:
+        offsets (np.array): node offsets of the tracks
+        out_offsets (np.array): node offsets of the tracks and their members
+        sign_lat (np.array): sign of the first latitude of every track
+        rnd_vec (np.array): uniform random numbers
+        rnd_start (np.array): index of the first random number of every track
 
-def _calc_land_decay(hist_tracks, land_geom, s_rel=True, check_plot=False,
-                     pool=None):
+    Returns:
+        np.array, np.array
+    """
+    d_lon = np.zeros(out_offsets[-1])
+    d_lat = np.zeros(out_offsets[-1])
+    for i_track in prange(offsets.size - 1):
+        n_dat = offsets[i_track + 1] - offsets[i_track]
+        rnd = rnd_vec[rnd_start[i_track]:rnd_start[i_track] + ens_size * (2 + n_dat)]
+        ang, x_val, y_val, x_first, y_first = 0., 0., 0., 0., 0.
+        for i_ens in range(ens_size):
+            x_ini = ens_amp0 * (rnd[i_ens] - 0.5)
+            y_ini = ens_amp0 * (rnd[ens_size + i_ens] - 0.5)
+            node = out_offsets[i_track * (ens_size + 1) + i_ens + 1]
+            for i_dat in range(n_dat):
+                ang += 2 * max_angle * rnd[2 * ens_size + i_ens * n_dat + i_dat] - max_angle
+                x_val += ens_amp * np.sin(ang)
+                y_val += ens_amp * np.cos(ang)
+                if i_dat == 0:
+                    x_first, y_first = x_val, y_val
+                # change sign of latitude change for southern hemishpere
+                d_lon[node + i_dat] = sign_lat[i_track] * (x_val - x_first) + x_ini
+                d_lat[node + i_dat] = sign_lat[i_track] * (y_val - y_first) + y_ini
+    return d_lon, d_lat
+
+
+def _calc_land_decay(hist_tracks, land_geom, s_rel=True, check_plot=False):
     """Compute wind and pressure decay coefficients from historical events
 
     Decay is calculated for every TC category according to the formulas:
@@ -176,7 +210,8 @@ def _calc_land_decay(hist_tracks, land_geom, s_rel=True, check_plot=False,
         - pressure decay = S-(S-1)*exp(-x*B)
 
     Parameters:
-        hist_tracks (list): List of xarray Datasets describing TC tracks.
+        hist_tracks (list or PackedTracks): xarray Datasets describing TC
+            tracks.
         land_geom (shapely.geometry.multipolygon.MultiPolygon): land geometry
         s_rel (bool, optional): use environmental presure to calc S value
             (true) or central presure (false)
@@ -186,29 +221,9 @@ def _calc_land_decay(hist_tracks, land_geom, s_rel=True, check_plot=False,
     Returns:
         v_rel (dict(category: A)), p_rel (dict(category: (S, B)))
     """
-    # Key is Saffir-Simpson scale
-    # values are lists of wind/wind at landfall
-    v_lf = dict()
-    # values are tuples with first value the S parameter, second value
-    # list of central pressure/central pressure at landfall
-    p_lf = dict()
-    # x-scale values to compute landfall decay
-    x_val = dict()
-
-    if pool:
-        dec_val = pool.map(_decay_values, hist_tracks, itertools.repeat(land_geom),
-                           itertools.repeat(s_rel),
-                           chunksize=min(len(hist_tracks) // pool.ncpus, 1000))
-    else:
-        dec_val = [_decay_values(track, land_geom, s_rel) for track in hist_tracks]
-
-    for (tv_lf, tp_lf, tx_val) in dec_val:
-        for key in tv_lf.keys():
-            v_lf.setdefault(key, []).extend(tv_lf[key])
-            p_lf.setdefault(key, ([], []))
-            p_lf[key][0].extend(tp_lf[key][0])
-            p_lf[key][1].extend(tp_lf[key][1])
-            x_val.setdefault(key, []).extend(tx_val[key])
+    climada.hazard.tc_tracks.tracks_land_params(hist_tracks, land_geom)
+    nodes, offsets = _decay_nodes(hist_tracks)
+    v_lf, p_lf, x_val = _decay_values_nodes(nodes, offsets, s_rel)
 
     v_rel, p_rel = _decay_calc_coeff(x_val, v_lf, p_lf)
     if check_plot:
@@ -218,10 +233,11 @@ def _calc_land_decay(hist_tracks, land_geom, s_rel=True, check_plot=False,
 
 
 def _apply_land_decay(tracks, v_rel, p_rel, land_geom, s_rel=True,
-                      check_plot=False, pool=None):
+                      check_plot=False):
     """Compute wind and pressure decay due to landfall in synthetic tracks.
 
     Parameters:
+        tracks (list or PackedTracks): tracks, modified in place
         v_rel (dict): {category: A}, where wind decay = exp(-x*A)
         p_rel (dict): (category: (S, B)}, where pressure decay
             = S-(S-1)*exp(-x*B)
@@ -229,38 +245,262 @@ def _apply_land_decay(tracks, v_rel, p_rel, land_geom, s_rel=True,
         s_rel (bool, optional): use environmental presure to calc S value
             (true) or central presure (false)
         check_plot (bool, optional): visualize computed changes
+
+    Returns:
+        list or PackedTracks
     """
-    sy_tracks = [track for track in tracks if not track.orig_event_flag]
-    if not sy_tracks:
+    packed = isinstance(tracks, PackedTracks)
+    if packed:
+        synth = ~tracks.attrs['orig_event_flag'].astype(bool)
+    else:
+        synth = np.array([not track.orig_event_flag for track in tracks], bool)
+    if not synth.any():
         LOGGER.error('No synthetic tracks contained. Synthetic tracks'
                      ' are needed.')
         raise ValueError
 
     if not v_rel or not p_rel:
         LOGGER.info('No decay coefficients.')
-        return
+        return tracks
 
     if check_plot:
-        orig_wind, orig_pres = [], []
-        for track in sy_tracks:
-            orig_wind.append(np.copy(track.max_sustained_wind.values))
-            orig_pres.append(np.copy(track.central_pressure.values))
-
-    if pool:
-        chunksize = min(len(tracks) // pool.ncpus, 1000)
-        tracks = pool.map(_apply_decay_coeffs, tracks,
-                          itertools.repeat(v_rel), itertools.repeat(p_rel),
-                          itertools.repeat(land_geom), itertools.repeat(s_rel),
-                          chunksize=chunksize)
+        sy_tracks = [track for track, syn in zip(tracks, synth) if syn]
+        orig_wind = [np.copy(track.max_sustained_wind.values) for track in sy_tracks]
+        orig_pres = [np.copy(track.central_pressure.values) for track in sy_tracks]
+
+    if packed:
+        climada.hazard.tc_tracks.tracks_land_params(tracks, land_geom)
     else:
-        tracks = [_apply_decay_coeffs(track, v_rel, p_rel, land_geom, s_rel)
-                  for track in tracks]
+        climada.hazard.tc_tracks.tracks_land_params(
+            [track for track, syn in zip(tracks, synth) if syn], land_geom)
+    nodes, offsets = _decay_nodes(tracks, synth)
+    changed = _apply_decay_nodes(nodes, offsets, synth, v_rel, p_rel, s_rel)
+
+    for i_track in np.nonzero(changed)[0]:
+        track_nodes = slice(offsets[i_track], offsets[i_track + 1])
+        if packed:
+            tracks.attrs['category'][i_track] = climada.hazard.tc_tracks.set_category(
+                nodes['max_sustained_wind'][track_nodes],
+                tracks.attrs['max_sustained_wind_unit'][i_track])
+            continue
+        track = tracks[i_track]
+        track.max_sustained_wind.values[:] = nodes['max_sustained_wind'][track_nodes]
+        track.central_pressure.values[:] = nodes['central_pressure'][track_nodes]
+        track.attrs['category'] = climada.hazard.tc_tracks.set_category(
+            track.max_sustained_wind.values, track.max_sustained_wind_unit)
 
     if check_plot:
-        _check_apply_decay_plot(tracks, orig_wind, orig_pres)
+        _check_apply_decay_plot(list(tracks), orig_wind, orig_pres)
     return tracks
 
 
+def _decay_nodes(tracks, select=None):
+    """Concatenated node arrays of the variables used in the land decay.
+
+    Parameters:
+        tracks (list or PackedTracks): tracks with land parameters
+        select (np.array, optional): mask of the tracks whose nodes are
+            used. The nodes of the other tracks are nan. Default: all
+
+    Returns:
+        dict(np.array), np.array (node offsets of the tracks)
+    """
+    if isinstance(tracks, PackedTracks):
+        return tracks.nodes, tracks.offsets
+    if select is None:
+        select = np.ones(len(tracks), bool)
+    sizes = np.array([track.time.size for track in tracks], int)
+    offsets = np.zeros(sizes.size + 1, int)
+    np.cumsum(sizes, out=offsets[1:])
+    nodes = dict()
+    for var in ['max_sustained_wind', 'central_pressure', 'environmental_pressure',
+                'on_land', 'dist_since_lf']:
+        nodes[var] = np.full(offsets[-1], False if var == 'on_land' else np.nan)
+        for track, sel, first in zip(tracks, select, offsets):
+            if sel:
+                nodes[var][first:first + track.time.size] = track[var].values
+    return nodes, offsets
+
+
+def _landfall_runs(on_land, offsets):
+    """Runs of nodes on land following a node on sea (landfalls), in tracks
+    starting on sea.
+
+    Parameters:
+        on_land (np.array): whether the nodes are on land
+        offsets (np.array): node offsets of the tracks
+
+    Returns:
+        start (np.array): first node on land of every run
+        end (np.array): node after the last node on land of every run
+        track (np.array): track of every run
+        rank (np.array): number of runs before in the same track
+        last (np.array): whether the run is the last one of its track
+    """
+    on_land = on_land.astype(bool)
+    sizes = np.diff(offsets)
+    track_idx = np.repeat(np.arange(sizes.size), sizes)
+    track_start = np.zeros(on_land.size, bool)
+    track_start[offsets[:-1][sizes > 0]] = True
+    # tracks starting on land are not used
+    valid = ~on_land[offsets[:-1][sizes > 0]]
+    valid = np.isin(track_idx, np.arange(sizes.size)[sizes > 0][valid])
+
+    prev_land = np.zeros(on_land.size, bool)
+    prev_land[1:] = on_land[:-1]
+    next_land = np.zeros(on_land.size, bool)
+    next_land[:-1] = on_land[1:]
+    track_end = np.zeros(on_land.size, bool)
+    track_end[offsets[1:][sizes > 0] - 1] = True
+
+    start = np.nonzero(valid & on_land & ~prev_land & ~track_start)[0]
+    end = np.nonzero(valid & on_land & (~next_land | track_end))[0] + 1
+    track = track_idx[start]
+    first_run = np.ones(start.size, bool)
+    first_run[1:] = track[1:] != track[:-1]
+    run_idx = np.arange(start.size)
+    rank = run_idx - np.maximum.accumulate(np.where(first_run, run_idx, 0))
+    last = np.ones(start.size, bool)
+    last[:-1] = track[1:] != track[:-1]
+    return start, end, track, rank, last
+
+
+def _node_ranges(start, end):
+    """Indices of the nodes start[i]:end[i] of all ranges, and range of
+    every node."""
+    sizes = end - start
+    range_idx = np.repeat(np.arange(start.size), sizes)
+    first = np.zeros(start.size, int)
+    np.cumsum(sizes[:-1], out=first[1:])
+    return start[range_idx] + np.arange(sizes.sum()) - first[range_idx], range_idx
+
+
+def _saffir_scale_idx(v_landfall):
+    """Saffir-Simpson scale index (1 to 7) of landfall winds, 8 if beyond."""
+    return np.searchsorted(climada.hazard.tc_tracks.SAFFIR_SIM_CAT, v_landfall,
+                           side='right') + 1
+
+
+def _decay_values_nodes(nodes, offsets, s_rel):
+    """Compute wind and pressure relative to landfall values of all nodes on
+    land of all tracks, grouped by Saffir-Simpson scale at landfall.
+
+    Parameters:
+        nodes (dict(np.array)): node arrays, see _decay_nodes
+        offsets (np.array): node offsets of the tracks
+        s_rel (bool): use environmental presure for S value (true) or
+            central presure (false)
+
+    Returns:
+        v_lf, p_lf, x_val (dict), see _decay_values
+    """
+    start, end, _, _, _ = _landfall_runs(nodes['on_land'], offsets)
+    node_idx, run_idx = _node_ranges(start, end)
+    wind, pres = nodes['max_sustained_wind'], nodes['central_pressure']
+
+    v_landfall = wind[start - 1]
+    p_landfall = pres[start - 1]
+    ss_scale = _saffir_scale_idx(v_landfall)
+    v_land = wind[node_idx] / np.where(v_landfall > 0, v_landfall, 1)[run_idx]
+    p_land = pres[node_idx] / p_landfall[run_idx]
+    p_s = nodes['environmental_pressure'] if s_rel else pres
+    p_land_s = (p_s[end - 1] / p_landfall)[run_idx]
+    x_node = nodes['dist_since_lf'][node_idx]
+
+    # values stored in single precision, as in _decay_values
+    v_land, p_land, p_land_s, x_node = [val.astype(np.float32).astype(float)
+                                        for val in (v_land, p_land, p_land_s, x_node)]
+
+    v_lf, p_lf, x_val = dict(), dict(), dict()
+    for ss_scale_idx in np.unique(ss_scale[ss_scale <= len(climada.hazard.tc_tracks.SAFFIR_SIM_CAT)]):
+        msk = ss_scale[run_idx] == ss_scale_idx
+        v_lf[ss_scale_idx] = v_land[msk]
+        p_lf[ss_scale_idx] = (p_land_s[msk], p_land[msk])
+        x_val[ss_scale_idx] = x_node[msk]
+    return v_lf, p_lf, x_val
+
+
+def _apply_decay_nodes(nodes, offsets, synth, v_rel, p_rel, s_rel):
+    """Change max sustained wind and central pressure of the nodes on land
+    of the synthetic tracks using the land decay coefficients. The n-th
+    landfalls of all tracks are processed at once, since the sea nodes
+    after a landfall are shifted to the values on land.
+
+    Parameters:
+        nodes (dict(np.array)): node arrays, see _decay_nodes, modified in
+            place
+        offsets (np.array): node offsets of the tracks
+        synth (np.array): mask of the tracks to change
+        v_rel (dict): {category: A}, where wind decay = exp(-x*A)
+        p_rel (dict): (category: (S, B)},
+            where pressure decay = S-(S-1)*exp(-x*B)
+        s_rel (bool): use environmental presure for S value (true) or
+            central presure (false)
+
+    Returns:
+        np.array: mask of the changed tracks
+    """
+    start, end, track, rank, last = _landfall_runs(nodes['on_land'], offsets)
+    run_sel = synth[track]
+    start, end, track, rank, last = \
+        start[run_sel], end[run_sel], track[run_sel], rank[run_sel], last[run_sel]
+    wind, pres, penv = nodes['max_sustained_wind'], nodes['central_pressure'], \
+                       nodes['environmental_pressure']
+    p_s = penv if s_rel else pres
+
+    # coefficients by Saffir-Simpson scale index
+    n_scale = len(climada.hazard.tc_tracks.SAFFIR_SIM_CAT)
+    a_coef = np.array([v_rel.get(ss_scale, np.nan) for ss_scale in range(n_scale + 1)])
+    b_coef = np.array([p_rel[ss_scale][1] if ss_scale in p_rel else np.nan
+                       for ss_scale in range(n_scale + 1)])
+
+    # random shift of the sea nodes between two landfalls, in track order
+    decayed = (_saffir_scale_idx(wind[start - 1]) <= n_scale) & (end - start > 1)
+    shifted = decayed & ~last
+    rndn = np.zeros(start.size)
+    rndn[shifted] = 0.1 * (np.abs(np.random.normal(size=np.count_nonzero(shifted)) * 5) + 6)
+    next_start = np.zeros(start.size, int)
+    next_start[:-1] = start[1:]
+
+    for i_rank in range(rank.max() + 1 if rank.size else 0):
+        runs = np.nonzero((rank == i_rank) & decayed)[0]
+        v_landfall = wind[start[runs] - 1]
+        p_landfall = pres[start[runs] - 1]
+        ss_scale = np.fmin(_saffir_scale_idx(v_landfall), n_scale)
+        node_idx, run_idx = _node_ranges(start[runs], end[runs])
+        x_node = nodes['dist_since_lf'][node_idx]
+
+        p_decay = _decay_p_function((p_s[end[runs] - 1] / p_landfall)[run_idx],
+                                    b_coef[ss_scale][run_idx], x_node)
+        # dont applay decay if it would decrease central pressure
+        p_decay = np.where(p_decay < 1, pres[node_idx] / p_landfall[run_idx], p_decay)
+        pres[node_idx] = p_landfall[run_idx] * p_decay
+
+        v_decay = _decay_v_function(a_coef[ss_scale][run_idx], x_node)
+        # dont applay decay if it would increas wind speeds
+        v_decay = np.where(v_decay > 1, wind[node_idx] / v_landfall[run_idx], v_decay)
+        wind[node_idx] = v_landfall[run_idx] * v_decay
+
+        # correct values of sea between two landfalls
+        runs = runs[shifted[runs]]
+        node_idx, run_idx = _node_ranges(end[runs], next_start[runs])
+        r_diff = pres[end[runs]] - pres[end[runs] - 1] + rndn[runs]
+        pres[node_idx] -= r_diff[run_idx]
+        r_diff = wind[end[runs]] - wind[end[runs] - 1] - 10 * rndn[runs]
+        wind[node_idx] -= r_diff[run_idx]
+
+    # correct limits
+    changed = np.zeros(offsets.size - 1, bool)
+    changed[track] = True
+    node_idx, _ = _node_ranges(offsets[:-1][changed], offsets[1:][changed])
+    with np.errstate(invalid='ignore'):
+        cor_p = node_idx[pres[node_idx] > penv[node_idx]]
+        pres[cor_p] = penv[cor_p]
+        cor_v = node_idx[wind[node_idx] < 0]
+    wind[cor_v] = 0
+    return changed
+
+
 def _decay_values(track, land_geom, s_rel):
     """Compute wind and pressure relative to landafall values.
 
@@ -269,7 +509,7 @@ def _decay_values(track, land_geom, s_rel):
     track : xr.Dataset
         track
     land_geom : shapely.geometry.multipolygon.MultiPolygon
-        land geometry
+        land geometry, None if the land parameters of the track are computed
     s_rel : bool
         use environmental presure for S value (true) or central presure (false)
 
@@ -285,49 +525,14 @@ def _decay_values(track, land_geom, s_rel):
         key is Saffir-Simpson scale, values are arrays with the values used as
         "x" in the coefficient fitting, the distance since landfall
     """
-    v_lf = dict()
-    p_lf = dict()
-    x_val = dict()
-
-    climada.hazard.tc_tracks.track_land_params(track, land_geom)
-    # Index in land that comes from previous sea index
-    sea_land_idx = np.where(np.diff(track.on_land.astype(int)) == 1)[0] + 1
-    # Index in sea that comes from previous land index
-    land_sea_idx = np.where(np.diff(track.on_land.astype(int)) == -1)[0] + 1
-    if track.on_land[-1]:
-        land_sea_idx = np.append(land_sea_idx, track.time.size)
-    if sea_land_idx.size and land_sea_idx.size <= sea_land_idx.size:
-        for sea_land, land_sea in zip(sea_land_idx, land_sea_idx):
-            v_landfall = track.max_sustained_wind[sea_land - 1].values
-            scale_thresholds = climada.hazard.tc_tracks.SAFFIR_SIM_CAT
-            ss_scale_idx = np.where(v_landfall < scale_thresholds)[0][0] + 1
-
-            v_land = track.max_sustained_wind[sea_land - 1:land_sea].values
-            if v_land[0] > 0:
-                v_land = (v_land[1:] / v_land[0]).tolist()
-            else:
-                v_land = v_land[1:].tolist()
-
-            p_landfall = float(track.central_pressure[sea_land - 1].values)
-            p_land = track.central_pressure[sea_land - 1:land_sea].values
-            p_land = (p_land[1:] / p_land[0]).tolist()
-
-            p_land_s = _calc_decay_ps_value(
-                track, p_landfall, land_sea - 1, s_rel)
-            p_land_s = len(p_land) * [p_land_s]
-
-            if ss_scale_idx not in v_lf:
-                v_lf[ss_scale_idx] = array.array('f', v_land)
-                p_lf[ss_scale_idx] = (array.array('f', p_land_s),
-                                      array.array('f', p_land))
-                x_val[ss_scale_idx] = array.array('f',
-                                                  track.dist_since_lf[sea_land:land_sea])
-            else:
-                v_lf[ss_scale_idx].extend(v_land)
-                p_lf[ss_scale_idx][0].extend(p_land_s)
-                p_lf[ss_scale_idx][1].extend(p_land)
-                x_val[ss_scale_idx].extend(track.dist_since_lf[sea_land:land_sea])
-    return v_lf, p_lf, x_val
+    if land_geom is not None:
+        climada.hazard.tc_tracks.track_land_params(track, land_geom)
+    nodes, offsets = _decay_nodes([track])
+    v_lf, p_lf, x_val = _decay_values_nodes(nodes, offsets, s_rel)
+    return ({key: array.array('f', val) for key, val in v_lf.items()},
+            {key: (array.array('f', val[0]), array.array('f', val[1]))
+             for key, val in p_lf.items()},
+            {key: array.array('f', val) for key, val in x_val.items()})
 
 
 def _decay_calc_coeff(x_val, v_lf, p_lf):
@@ -429,7 +634,8 @@ def _apply_decay_coeffs(track, v_rel, p_rel, land_geom, s_rel):
         v_rel (dict): {category: A}, where wind decay = exp(-x*A)
         p_rel (dict): (category: (S, B)},
             where pressure decay = S-(S-1)*exp(-x*B)
-        land_geom (shapely.geometry.multipolygon.MultiPolygon): land geometry
+        land_geom (shapely.geometry.multipolygon.MultiPolygon): land geometry,
+            None if the land parameters of the track are computed
         s_rel (bool): use environmental presure for S value (true) or
             central presure (false)
 
@@ -440,59 +646,14 @@ def _apply_decay_coeffs(track, v_rel, p_rel, land_geom, s_rel):
     if track.orig_event_flag:
         return track
 
-    climada.hazard.tc_tracks.track_land_params(track, land_geom)
-    # Index in land that comes from previous sea index
-    sea_land_idx = np.where(np.diff(track.on_land.astype(int)) == 1)[0] + 1
-    # Index in sea that comes from previous land index
-    land_sea_idx = np.where(np.diff(track.on_land.astype(int)) == -1)[0] + 1
-    if track.on_land[-1]:
-        land_sea_idx = np.append(land_sea_idx, track.time.size)
-    if not sea_land_idx.size or land_sea_idx.size > sea_land_idx.size:
-        return track
-    for idx, (sea_land, land_sea) \
-            in enumerate(zip(sea_land_idx, land_sea_idx)):
-        v_landfall = track.max_sustained_wind[sea_land - 1].values
-        p_landfall = float(track.central_pressure[sea_land - 1].values)
-        scale_thresholds = climada.hazard.tc_tracks.SAFFIR_SIM_CAT
-        try:
-            ss_scale_idx = np.where(v_landfall < scale_thresholds)[0][0] + 1
-        except IndexError:
-            continue
-        if land_sea - sea_land == 1:
-            continue
-        p_decay = _calc_decay_ps_value(track, p_landfall, land_sea - 1, s_rel)
-        p_decay = _decay_p_function(p_decay, p_rel[ss_scale_idx][1],
-                                    track.dist_since_lf[sea_land:land_sea].values)
-        # dont applay decay if it would decrease central pressure
-        p_decay[p_decay < 1] = track.central_pressure[sea_land:land_sea][p_decay < 1] / p_landfall
-        track.central_pressure[sea_land:land_sea] = p_landfall * p_decay
-
-        v_decay = _decay_v_function(v_rel[ss_scale_idx],
-                                    track.dist_since_lf[sea_land:land_sea].values)
-        # dont applay decay if it would increas wind speeds
-        v_decay[v_decay > 1] = (track.max_sustained_wind[sea_land:land_sea][v_decay > 1]
-                                / v_landfall)
-        track.max_sustained_wind[sea_land:land_sea] = v_landfall * v_decay
-
-        # correct values of sea between two landfalls
-        if land_sea < track.time.size and idx + 1 < sea_land_idx.size:
-            rndn = 0.1 * float(np.abs(np.random.normal(size=1) * 5) + 6)
-            r_diff = track.central_pressure[land_sea].values - \
-                track.central_pressure[land_sea - 1].values + rndn
-            track.central_pressure[land_sea:sea_land_idx[idx + 1]] += - r_diff
-
-            rndn = rndn * 10  # mean value 10
-            r_diff = track.max_sustained_wind[land_sea].values - \
-                track.max_sustained_wind[land_sea - 1].values - rndn
-            track.max_sustained_wind[land_sea:sea_land_idx[idx + 1]] += - r_diff
-
-    # correct limits
-    np.warnings.filterwarnings('ignore')
-    cor_p = track.central_pressure.values > track.environmental_pressure.values
-    track.central_pressure[cor_p] = track.environmental_pressure[cor_p]
-    track.max_sustained_wind[track.max_sustained_wind < 0] = 0
-    track.attrs['category'] = climada.hazard.tc_tracks.set_category(
-        track.max_sustained_wind.values, track.max_sustained_wind_unit)
+    if land_geom is not None:
+        climada.hazard.tc_tracks.track_land_params(track, land_geom)
+    nodes, offsets = _decay_nodes([track])
+    if _apply_decay_nodes(nodes, offsets, np.ones(1, bool), v_rel, p_rel, s_rel)[0]:
+        track.max_sustained_wind.values[:] = nodes['max_sustained_wind']
+        track.central_pressure.values[:] = nodes['central_pressure']
+        track.attrs['category'] = climada.hazard.tc_tracks.set_category(
+            track.max_sustained_wind.values, track.max_sustained_wind_unit)
     return track
 
 
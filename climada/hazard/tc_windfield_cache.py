@@ -0,0 +1,186 @@
+"""
+This file is part of CLIMADA.
+
+Copyright (C) 2017 ETH Zurich, CLIMADA contributors listed in AUTHORS.
+
+CLIMADA is free software: you can redistribute it and/or modify it under the
+terms of the GNU Lesser General Public License as published by the Free
+Software Foundation, version 3.
+
+CLIMADA is distributed in the hope that it will be useful, but WITHOUT ANY
+WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License along
+with CLIMADA. If not, see <https://www.gnu.org/licenses/>.
+
+---
+
+Define WindfieldCache: content-addressed on-disk cache of TC windfields.
+"""
+
+__all__ = ['WindfieldCache']
+
+import os
+import hashlib
+import logging
+import tempfile
+import numpy as np
+from scipy import sparse
+
+from climada.util.constants import SYSTEM_DIR
+
+LOGGER = logging.getLogger(__name__)
+
+DEF_CACHE_DIR = os.path.join(SYSTEM_DIR, 'tc_windfield_cache')
+"""Default folder of the windfield cache"""
+
+DEF_CACHE_MAX_SIZE_MB = 1024
+"""Default maximum size of the windfield cache in MB"""
+
+TRACK_HASH_VARS = ['time_step', 'radius_max_wind', 'environmental_pressure',
+                   'central_pressure']
+"""Track variables (besides lat and lon) that determine the windfield"""
+
+class WindfieldCache():
+    """On-disk cache of the intensity of single tracks at given centroids.
+
+    Each entry is the sparse intensity row of one track, stored in a `.npz`
+    file named after a hash of everything the row depends on: the track
+    data, the centroids, the windfield model and the intensity threshold.
+    Unchanged tracks are therefore found again independently of their name
+    or position in the track set. Least recently used entries are removed
+    when the cache exceeds its maximum size.
+
+    Attributes:
+        cache_dir (str): folder where the entries are stored
+        max_size_mb (float): maximum size of the cache in MB
+    """
+    def __init__(self, cache_dir=DEF_CACHE_DIR, max_size_mb=DEF_CACHE_MAX_SIZE_MB):
+        """Initialize cache and create its folder if it does not exist.
+
+        Parameters:
+            cache_dir (str, optional): folder where the entries are stored.
+                Default: DEF_CACHE_DIR
+            max_size_mb (float, optional): maximum size of the cache in MB.
+                Default: DEF_CACHE_MAX_SIZE_MB
+        """
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.max_size_mb = max_size_mb
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def centroids_key(centroids, coastal_idx):
+        """Hash of the centroids to which the windfields are mapped.
+
+        Parameters:
+            centroids (Centroids): centroids of the hazard
+            coastal_idx (np.array): indices of the centroids where the
+                windfield is computed
+
+        Returns:
+            str
+        """
+        hasher = hashlib.sha1()
+        hasher.update(np.int64(centroids.size).tobytes())
+        hasher.update(np.ascontiguousarray(coastal_idx, dtype=np.int64).tobytes())
+        hasher.update(np.ascontiguousarray(centroids.coord[coastal_idx],
+                                           dtype=np.float64).tobytes())
+        return hasher.hexdigest()
+
+    @staticmethod
+    def track_key(track, centr_key, model, intensity_thres):
+        """Hash of a track's windfield input at given centroids.
+
+        Parameters:
+            track (xr.Dataset): single tropical cyclone track
+            centr_key (str): hash of the centroids, see `centroids_key`
+            model (str): windfield model
+            intensity_thres (float): intensity threshold of the hazard
+
+        Returns:
+            str
+        """
+        hasher = hashlib.sha1()
+        hasher.update(centr_key.encode())
+        hasher.update(str(model).encode())
+        hasher.update(np.float64(intensity_thres).tobytes())
+        for var in ['lat', 'lon'] + TRACK_HASH_VARS:
+            hasher.update(np.ascontiguousarray(track[var].values,
+                                               dtype=np.float64).tobytes())
+        return hasher.hexdigest()
+
+    def get(self, key):
+        """Get cached intensity row. Reading an entry marks it as recently used.
+
+        Parameters:
+            key (str): hash of the entry
+
+        Returns:
+            sparse.csr_matrix or None if not in cache
+        """
+        path = self._path(key)
+        try:
+            intensity = sparse.load_npz(path).tocsr()
+        except (FileNotFoundError, OSError, ValueError):
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return intensity
+
+    def put(self, key, intensity):
+        """Store intensity row. Concurrent writers of the same key are safe.
+
+        Parameters:
+            key (str): hash of the entry
+            intensity (sparse.csr_matrix): intensity of one event
+        """
+        file_desc, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(file_desc, 'wb') as file:
+                sparse.save_npz(file, sparse.csr_matrix(intensity))
+            os.replace(tmp_path, self._path(key))
+        except OSError as err:
+            LOGGER.warning('Windfield could not be cached: %s', err)
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def evict(self):
+        """Remove least recently used entries until the cache size is below
+        max_size_mb."""
+        entries = []
+        for file_name in os.listdir(self.cache_dir):
+            if not file_name.endswith('.npz'):
+                continue
+            stat = os.stat(os.path.join(self.cache_dir, file_name))
+            entries.append((stat.st_mtime, stat.st_size, file_name))
+        total_size = sum(entry[1] for entry in entries)
+        max_size = self.max_size_mb * 1024 ** 2
+        if total_size <= max_size:
+            return
+        num_removed = 0
+        for _, size, file_name in sorted(entries):
+            if total_size <= max_size:
+                break
+            os.remove(os.path.join(self.cache_dir, file_name))
+            total_size -= size
+            num_removed += 1
+        LOGGER.info('Removed %s windfields from cache %s.', num_removed,
+                    self.cache_dir)
+
+    def clear(self):
+        """Remove all entries from the cache."""
+        for file_name in os.listdir(self.cache_dir):
+            if file_name.endswith('.npz'):
+                os.remove(os.path.join(self.cache_dir, file_name))
+
+    @property
+    def size(self):
+        """Number of entries in the cache"""
+        return len([f for f in os.listdir(self.cache_dir) if f.endswith('.npz')])
+
+    def _path(self, key):
+        """Path of the file of an entry"""
+        return os.path.join(self.cache_dir, key + '.npz')
@@ -20,8 +20,11 @@ Tests on Drought Hazard"""
 
 
 import unittest
+import numpy as np
+import pandas as pd
 
-from climada.hazard.drought import Drought
+from climada.hazard.drought import Drought, _drought_events
+from climada.util.dates_times import datetime64_to_ordinal
 
 
 class TestReader(unittest.TestCase):
@@ -38,6 +41,24 @@ class TestReader(unittest.TestCase):
         self.assertEqual(hazard_set.centroids.size, 130)
         self.assertEqual(hazard_set.intensity[112, 111], -1.6286273002624512)
 
+    def test_drought_events_pass(self):
+        """Test one event with lowest SPEI per year and centroid"""
+        time_vector = pd.date_range('1900-10-01', '1903-09-01', freq='MS').values
+        spei_2d = np.zeros((time_vector.size, 2))
+        spei_2d[1:3, 0] = [-1.5, -2]
+        spei_2d[5, 0] = -1.2
+        spei_2d[20:22, 0] = [-1.1, -1.3]
+        spei_2d[34:, 0] = -3
+
+        int_min, int_sum, int_sum_thr, start, end = _drought_events(
+            spei_2d, time_vector, -1, 1901, 3)
+        self.assertTrue(np.allclose(int_min[:, 0], [-2, -1.3, 0]))
+        self.assertTrue(np.allclose(int_sum[:, 0], [-3.5, -2.4, 0]))
+        self.assertTrue(np.allclose(int_sum_thr[:, 0], [-1.5, -0.4, 0]))
+        self.assertEqual(start[0, 0], datetime64_to_ordinal(time_vector[1]))
+        self.assertEqual(end[1, 0], datetime64_to_ordinal(time_vector[21]))
+        self.assertFalse(np.any(int_min[:, 1]))
+
 # Execute Tests
 if __name__ == "__main__":
     TESTS = unittest.TestLoader().loadTestsFromTestCase(TestReader)
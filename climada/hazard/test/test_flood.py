@@ -21,9 +21,10 @@ Test flood module.
 import unittest
 import datetime as dt
 import numpy as np
-from climada.hazard.river_flood import RiverFlood
+from climada.hazard.river_flood import RiverFlood, _read_raster_points, _RasterHandles
 from climada.util.constants import HAZ_DEMO_FLDDPH, HAZ_DEMO_FLDFRC
 from climada.hazard.centroids import Centroids
+from climada.util.coordinates import read_raster
 
 
 class TestRiverFlood(unittest.TestCase):
@@ -360,6 +361,35 @@ class TestRiverFlood(unittest.TestCase):
         self.assertTrue(np.array_equal(
                         testRFTime._select_event(test_time, years), [0, 3]))
 
+    def test_read_raster_points(self):
+        """Test windowed reading equals reading the whole raster"""
+        lat = np.array([47.1, 47.12, 50.3, 54.9])
+        lon = np.array([5.6, 14.9, 9.01, 9.03])
+        meta, inten_all = read_raster(HAZ_DEMO_FLDDPH, band=[1])
+        x_i = np.floor((lon - meta['transform'].c) / meta['transform'].a).astype(int)
+        y_i = np.floor((lat - meta['transform'].f) / meta['transform'].e).astype(int)
+        inten = _read_raster_points(HAZ_DEMO_FLDDPH, [1], lat, lon, n_threads=2)
+        self.assertEqual(inten.shape, (1, 4))
+        self.assertTrue(np.array_equal(inten, inten_all[:, y_i * meta['width'] + x_i]))
+
+        inten = _read_raster_points(HAZ_DEMO_FLDDPH, [1, 2, 3], lat, lon)
+        self.assertEqual(inten.shape, (3, 4))
+        self.assertTrue(np.array_equal(inten[:1], inten_all[:, y_i * meta['width'] + x_i]))
+        inten_thread = _read_raster_points(HAZ_DEMO_FLDDPH, [1, 2, 3], lat, lon, n_threads=2)
+        self.assertTrue(np.array_equal(inten, inten_thread))
+
+        with _RasterHandles() as handles:
+            inten_reuse = _read_raster_points(HAZ_DEMO_FLDDPH, [1, 2, 3], lat, lon, 2, handles)
+            src = handles.get(HAZ_DEMO_FLDDPH)
+            self.assertFalse(src.closed)
+            inten_reuse = _read_raster_points(HAZ_DEMO_FLDDPH, [1, 2, 3], lat, lon, 2, handles)
+            self.assertIs(handles.get(HAZ_DEMO_FLDDPH), src)
+        self.assertTrue(src.closed)
+        self.assertTrue(np.array_equal(inten, inten_reuse))
+
+        inten = _read_raster_points(HAZ_DEMO_FLDDPH, [1, 2], np.array([]), np.array([]),
+                                    n_threads=2)
+        self.assertEqual(inten.shape, (2, 0))
 
 if __name__ == "__main__":
     # Execute Tests
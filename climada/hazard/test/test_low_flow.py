@@ -19,13 +19,15 @@ with CLIMADA. If not, see <https://www.gnu.org/licenses/>.
 Test low flow module.
 """
 import os
+import shutil
+import tempfile
 import unittest
 import numpy as np
 import pandas as pd
 import datetime as dt
 
 from climada.hazard.low_flow import LowFlow, unique_clusters, \
-    _compute_threshold_grid, _read_and_combine_nc, _split_bbox
+    _compute_threshold_grid, _read_and_combine_nc, _components_clustering
 from climada.util.constants import DATA_DIR
 from climada.hazard.centroids import Centroids
 
@@ -111,6 +113,23 @@ class TestLowFlowDummyData(unittest.TestCase):
         target_cluster = [1, 1, 1, 1, 1, 1, 1, 2, 2, 1, 2, 1, 3]
         self.assertListEqual(list(haz.lowflow_df.cluster_id), target_cluster)
 
+    def test_identify_clusters_components(self):
+        """Test identify_clusters with connected components:
+            same clusters as DBSCAN, also when computed in tiles"""
+        for clus_thresh_xy, clus_thresh_t, target_cluster in [
+                (1.5, 1, [1, 2, 1, 2, 2, 1, 1, 3, 3, 1, 3, 1, 4]),
+                (1.5, 2, [1, 2, 1, 2, 2, 1, 1, 2, 2, 1, 2, 1, 3]),
+                (2., 1, [1, 1, 1, 1, 1, 1, 1, 2, 2, 1, 2, 1, 3])]:
+            haz = LowFlow()
+            haz.lowflow_df = init_test_data_clustering()
+            haz.identify_clusters(clus_thresh_xy=clus_thresh_xy, clus_thresh_t=clus_thresh_t,
+                                  clus_engine='components')
+            self.assertEqual(haz.clus_engine, 'components')
+            self.assertListEqual(list(haz.lowflow_df.cluster_id), target_cluster)
+            cluster_id = _components_clustering(haz.lowflow_df, haz.resolution, clus_thresh_xy,
+                                                clus_thresh_t, tile_size=1)
+            self.assertListEqual(list(cluster_id), target_cluster)
+
     def test_events_from_clusters_default(self):
         """Test events_from_clusters: creation of events and computation of intensity based on clusters,
         requires: identify_clusters, Centroids, also tests correct intensity sum"""
@@ -153,6 +172,40 @@ class TestLowFlowDummyData(unittest.TestCase):
         self.assertEqual(haz.intensity.sum(), 170.)
         self.assertListEqual(list(np.array(haz.intensity.todense()[0])[0]), target_intensity_e)
 
+    def test_intensity_loop(self):
+        """Test _intensity_loop: days below threshold summed per event and centroid,
+        points farther than half a resolution from any centroid dropped"""
+        haz = LowFlow()
+        haz.lowflow_df = pd.DataFrame({
+            'lat': [0, .1, .5, 0, 0, 3],
+            'lon': [0, .1, .5, .5, .5, 3],
+            'ndays': [3, 4, 2, 5, 1, 9],
+            'cluster_id': [1, 1, 1, 2, 2, 2],
+        })
+        coord = np.array([[0, 0], [0, .5], [.5, 0], [.5, .5]])
+        intensity = haz._intensity_loop(np.array([1, 2]), coord, .5, coord.shape[0])
+        self.assertEqual(intensity.shape, (2, 4))
+        # event 1: (0, 0) and (.1, .1) both map to centroid 0
+        # event 2: duplicate (0, .5) summed, (3, 3) outside all centroids
+        np.testing.assert_array_equal(intensity.toarray(),
+                                      np.array([[7, 0, 0, 2], [0, 6, 0, 0]]))
+
+    def test_set_dates(self):
+        """Test _set_dates: date of maximum days below threshold summed per date,
+        earliest date if tied, start and end dates per event"""
+        haz = LowFlow()
+        haz.lowflow_df = pd.DataFrame({
+            'dtime': [20, 10, 5, 10, 40, 35, 30],
+            'ndays': [5, 3, 1, 2, 4, 2, 4],
+            'cluster_id': [1, 1, 1, 1, 2, 2, 2],
+        })
+        haz._set_dates(np.array([1, 2]))
+        # event 1: 5 days at 10 (3 + 2) and 20, event 2: 4 days at 30 and 40
+        self.assertListEqual(list(haz.date), [10, 30])
+        self.assertListEqual(list(haz.date_start), [5, 30])
+        self.assertListEqual(list(haz.date_end), [20, 40])
+        self.assertEqual(haz.date.dtype, int)
+
 class TestLowFlowNETCDF(unittest.TestCase):
     """Test for defining low flow event from discharge data file"""
 
@@ -276,15 +329,44 @@ class TestDischargeDataHandling(unittest.TestCase):
         self.assertEqual(len(perc_data_mask.lon.data), 27)
         self.assertEqual(max(perc_data_mask.lon.data), 8.25)
 
-    def test_split_bbox(self):
-        """test splitting the bounding box in parts"""
-        bbox = [-180, -60, 180, 75]
-        self.assertListEqual(bbox, _split_bbox(bbox, width=1000)[0])
-
-        bbox = _split_bbox(bbox, width=90)
-        self.assertEqual(4, len(bbox))
-        self.assertListEqual(bbox[1], [-91, -60, -1, 75])
-        self.assertListEqual(bbox[2], [-1, -60, 89, 75])
+    def test_threshold_grid_cache(self):
+        """test threshold and mean grids are written to and read from the cache,
+        separately for other source files"""
+        model = ('h08', 'gfdl-esm2m', 'historical', 'histsoc', FN_STR_DEMO, None)
+        yearchunks = ['2001_2003', '2004_2005']
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            # created on first write
+            cache_dir = os.path.join(tmp_dir, 'cache')
+            perc_data, mean_data = _compute_threshold_grid(5, (2001, 2005), INPUT_DIR, *model,
+                                yearchunks, mask_threshold=None, keep_dis_data=True,
+                                cache_dir=cache_dir)
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+            perc_cache, mean_cache = _compute_threshold_grid(5, (2001, 2005), INPUT_DIR, *model,
+                                yearchunks, mask_threshold=('mean', 1500),
+                                keep_dis_data=True, cache_dir=cache_dir)
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+            self.assertEqual(np.sum(mean_cache.dis>0).data.max(), 10)
+            self.assertEqual(np.sum(perc_cache.dis>0).data.max(), 10)
+            self.assertTrue(np.allclose(perc_cache.dis.values[perc_cache.dis.values > 0],
+                                        perc_data.dis.values[perc_cache.dis.values > 0]))
+            self.assertListEqual(list(perc_cache.lon.data), list(perc_data.lon.data))
+
+            with tempfile.TemporaryDirectory() as input_dir:
+                for yearchunk in yearchunks:
+                    shutil.copy(os.path.join(INPUT_DIR, 'h08_gfdl-esm2m_ewembi_historical_'
+                                             f'histsoc_{FN_STR_DEMO}_{yearchunk}.nc'), input_dir)
+                _compute_threshold_grid(5, (2001, 2005), input_dir, *model, yearchunks,
+                                        cache_dir=cache_dir)
+                self.assertEqual(len(os.listdir(cache_dir)), 2)
+                _compute_threshold_grid(5, (2001, 2005), input_dir, *model, yearchunks[:1],
+                                        cache_dir=cache_dir)
+                self.assertEqual(len(os.listdir(cache_dir)), 3)
+                file_name = os.path.join(input_dir, os.listdir(input_dir)[0])
+                mtime = os.stat(file_name).st_mtime_ns + 10 ** 9
+                os.utime(file_name, ns=(mtime, mtime))
+                _compute_threshold_grid(5, (2001, 2005), input_dir, *model, yearchunks,
+                                        cache_dir=cache_dir)
+                self.assertEqual(len(os.listdir(cache_dir)), 4)
 
 
 # Execute Tests
@@ -101,6 +101,57 @@ class TestReader(unittest.TestCase):
             6401
         )
 
+    def test_read_threads_pass(self):
+        """Test read_footprints in threads gives the single footprints"""
+        var_names = copy.deepcopy(DEF_VAR_EXCEL)
+        var_names['sheet_name'] = 'fp_centroids-test'
+        var_names['col_name']['region_id'] = 'iso_n3'
+        test_centroids = Centroids()
+        test_centroids.read_excel(
+            os.path.join(DATA_DIR, 'fp_centroids-test.xls'), var_names=var_names)
+        storms = StormEurope()
+        storms.read_footprints(WS_DEMO_NC, centroids=test_centroids, n_threads=2)
+
+        self.assertEqual(storms.intensity.shape, (2, 9944))
+        self.assertEqual(storms.event_name, ['Lothar', 'Xynthia'])
+        self.assertTrue(np.array_equal(storms.event_id, [1, 2]))
+        self.assertTrue(np.array_equal(storms.orig, [True, True]))
+        for i_file, file_name in enumerate(WS_DEMO_NC):
+            storm = storms._read_one_nc(file_name, test_centroids)
+            self.assertEqual(storm.date[0], storms.date[i_file])
+            self.assertEqual(storm.ssi_wisc[0], storms.ssi_wisc[i_file])
+            self.assertEqual((storm.intensity != storms.intensity[i_file]).nnz, 0)
+            self.assertTrue(storm.intensity.data.min() > storms.intensity_thres)
+        self.assertTrue(np.array_equal(storms.fraction.indices, storms.intensity.indices))
+
+    def test_read_combine_pass(self):
+        """Test read_footprints merges events close in date into one event"""
+        var_names = copy.deepcopy(DEF_VAR_EXCEL)
+        var_names['sheet_name'] = 'fp_centroids-test'
+        var_names['col_name']['region_id'] = 'iso_n3'
+        test_centroids = Centroids()
+        test_centroids.read_excel(
+            os.path.join(DATA_DIR, 'fp_centroids-test.xls'), var_names=var_names)
+        storms = StormEurope()
+        storms.read_footprints(WS_DEMO_NC, centroids=test_centroids)
+        storms_comb = StormEurope()
+        storms_comb.read_footprints(WS_DEMO_NC, centroids=test_centroids,
+                                    combine_threshold=5000)
+
+        self.assertEqual(storms_comb.intensity.shape, (1, 9944))
+        self.assertEqual(storms_comb.event_name, ['Lothar_Xynthia'])
+        self.assertTrue(np.array_equal(storms_comb.event_id, [3]))
+        self.assertEqual(storms_comb.date[0], np.round(storms.date.mean()))
+        self.assertTrue(np.isnan(storms_comb.ssi_wisc[0]))
+        self.assertTrue(np.allclose(storms_comb.intensity.toarray(),
+                                    storms.intensity.max(axis=0).toarray()))
+        self.assertTrue(np.allclose(storms_comb.fraction.toarray(),
+                                    storms.fraction.max(axis=0).toarray()))
+
+        storms._combine_events([np.array([2, 1])])
+        self.assertEqual(storms.event_name, ['Xynthia_Lothar'])
+        self.assertEqual((storms.intensity != storms_comb.intensity).nnz, 0)
+
     def test_set_ssi(self):
         """Test set_ssi with both dawkins and wisc_gust methodology."""
         storms = StormEurope()
@@ -124,6 +175,10 @@ class TestReader(unittest.TestCase):
             np.allclose(storms.ssi, ssi_special)
         )
 
+        for method in ['dawkins', 'wisc_gust']:
+            self.assertTrue(np.allclose(storms.calc_ssi(method=method),
+                                        storms.calc_ssi(method=method, chunk_size=1)))
+
     def test_generate_prob_storms(self):
         """Test the probabilistic storm generator; calls _hist2prob as well as
         Centroids.set_region_id()"""
@@ -147,6 +202,34 @@ class TestReader(unittest.TestCase):
         self.assertIsInstance(storms_prob.intensity,
                               sparse.csr.csr_matrix)
 
+    def test_generate_prob_storms_file(self):
+        """Test the probabilistic storms generated in threads and written to
+        file are the ones generated in memory"""
+        storms = StormEurope()
+        storms.read_footprints(WS_DEMO_NC)
+        storms_prob = storms.generate_prob_storms(reg_id=None)
+        storms_thread = storms.generate_prob_storms(reg_id=None, n_threads=2)
+        self.assertEqual((storms_prob.intensity != storms_thread.intensity).nnz, 0)
+        self.assertTrue(np.array_equal(storms_prob.ssi_full_area,
+                                       storms_thread.ssi_full_area))
+
+        file_name = os.path.join(DATA_DIR, 'test_prob_storms.h5')
+        storms.write_prob_storms(file_name, reg_id=None, n_threads=2)
+        storms_file = StormEurope()
+        storms_file.read_hdf5(file_name)
+        os.remove(file_name)
+        self.assertEqual(storms_file.intensity.shape, storms_prob.intensity.shape)
+        self.assertEqual((storms_prob.intensity != storms_file.intensity).nnz, 0)
+        self.assertEqual((storms_prob.fraction != storms_file.fraction).nnz, 0)
+        self.assertTrue(np.array_equal(storms_prob.ssi_full_area,
+                                       storms_file.ssi_full_area))
+        self.assertTrue(np.array_equal(storms_prob.event_id, storms_file.event_id))
+
+        storms.write_prob_storms(file_name, reg_id=None)
+        storms_file.read_hdf5(file_name)
+        os.remove(file_name)
+        self.assertEqual((storms_prob.intensity != storms_file.intensity).nnz, 0)
+
 
 # Execute Tests
 if __name__ == "__main__":
@@ -132,6 +132,30 @@ class TestReader(unittest.TestCase):
         self.assertEqual(tc_haz.fraction.nonzero()[0].size, 0)
         self.assertEqual(tc_haz.intensity.nonzero()[0].size, 0)
 
+    def test_set_packed_threads_pass(self):
+        """Test rainfields of packed tracks computed in threads are equal."""
+        tc_track = TCTracks()
+        tc_track.read_processed_ibtracs_csv([TEST_TRACK, TEST_TRACK_SHORT, TEST_TRACK])
+        tc_track.data[1].attrs['sid'] = 'short'
+        tc_track.data[2].attrs['sid'] = 'other'
+        tc_track.equal_timestep()
+        tc_haz = TCRain()
+        tc_haz.set_from_tracks(tc_track, CENTR_TEST_BRB)
+        tc_track.pack()
+        tc_pack = TCRain()
+        tc_pack.set_from_tracks(tc_track, CENTR_TEST_BRB, n_threads=2)
+        tc_pack.check()
+
+        self.assertEqual(tc_pack.intensity.shape, (3, 296))
+        self.assertEqual(tc_pack.intensity.nnz, tc_haz.intensity.nnz)
+        self.assertTrue(np.allclose(tc_haz.intensity.toarray(), tc_pack.intensity.toarray()))
+        self.assertTrue(np.array_equal(tc_haz.intensity[0].toarray(),
+                                       tc_haz.intensity[2].toarray()))
+        self.assertEqual(tc_pack.event_name, tc_haz.event_name)
+        self.assertTrue(np.array_equal(tc_pack.date, tc_haz.date))
+        self.assertTrue(np.array_equal(tc_pack.category, tc_haz.category))
+        self.assertTrue(np.allclose(tc_pack.frequency, tc_haz.frequency))
+
 class TestModel(unittest.TestCase):
     """Test modelling of rainfall"""
 
@@ -150,6 +150,19 @@ class TestIBTracs(unittest.TestCase):
         self.assertAlmostEqual(tc_try.data[0].central_pressure.values[-1], 1014.1515, 4)
 
 
+    def test_read_cache_pass(self):
+        """Check tracks read from preprocessed IBTrACS are equal"""
+        tc_track = tc.TCTracks()
+        tc_track.read_ibtracs_netcdf(provider='usa', year_range=(1993, 1994), basin='EP')
+        tc_cache = tc.TCTracks()
+        tc_cache.read_ibtracs_netcdf(provider='usa', year_range=(1993, 1994), basin='EP',
+                                     use_cache=True)
+        self.assertTrue(tc_cache.is_packed)
+        self.assertEqual(tc_cache.size, 34)
+        for track, track_cache in zip(tc_track.data, tc_cache.data):
+            self.assertTrue(track.equals(track_cache))
+            self.assertEqual(track.attrs, track_cache.attrs)
+
 class TestIO(unittest.TestCase):
     """Test reading of tracks from files of different formats"""
 
@@ -181,10 +194,38 @@ class TestIO(unittest.TestCase):
         self.assertEqual(tc_track.data[0].id_no, 1951239012334)
         self.assertEqual(tc_track.data[0].category, 1)
 
+    def test_write_read_ragged_pass(self):
+        """Test writting and reading tracks in one netcdf file"""
+        tc_track = tc.TCTracks()
+        tc_track.read_processed_ibtracs_csv([TEST_TRACK, TEST_TRACK_SHORT, TEST_TRACK])
+        for track, basin in zip(tc_track.data, ['NA', 'EP', 'NA']):
+            track.attrs['basin'] = basin
+        tc_track.data[2].attrs['sid'] = 'other'
+        tc_track.data[1] = tc_track.data[1].drop_vars('radius_max_wind')
+        file_name = os.path.join(DATA_DIR, 'test_tracks_ragged.nc')
+        tc_track.write_netcdf_ragged(file_name)
+
+        tc_read = tc.TCTracks()
+        tc_read.read_netcdf_ragged(file_name, chunk_size=1)
+        self.assertFalse(tc_read.is_packed)
+        self.assertEqual(tc_read.size, 3)
+        for track, track_read in zip(tc_track.data, tc_read.data):
+            self.assertTrue(track.equals(track_read))
+            self.assertEqual(track.attrs, track_read.attrs)
+
+        tc_read.read_netcdf_ragged(file_name, basin='NA')
+        self.assertTrue(tc_read.is_packed)
+        self.assertEqual([track.sid for track in tc_read.data], ['1951239N12334', 'other'])
+        tc_read.read_netcdf_ragged(file_name, sid=['other', 'unknown'])
+        self.assertEqual(tc_read.size, 1)
+        self.assertTrue(tc_read.data[0].equals(tc_track.data[2]))
+        os.remove(file_name)
+
     def test_read_simulations_emanuel(self):
         tc_track = tc.TCTracks()
 
         tc_track.read_simulations_emanuel(TEST_TRACK_EMANUEL, hemisphere='N')
+        self.assertFalse(tc_track.is_packed)
         self.assertEqual(len(tc_track.data), 4)
         self.assertEqual(tc_track.data[0].time.size, 93)
         self.assertEqual(tc_track.data[0].lon[11], -115.57)
@@ -248,6 +289,43 @@ class TestIO(unittest.TestCase):
         self.assertEqual(tc_track_G.data[0].basin, 'NI - North Indian')
         self.assertEqual(tc_track_G.data[0].category, 0)
 
+    def test_read_simulations_gettelman_pass(self):
+        """Test reading all tracks of Gettelman track files at once"""
+        tc_track_G = tc.TCTracks()
+        nc_data = nc.Dataset(TEST_TRACK_GETTELMAN)
+        for i in range(nc_data.dimensions['storm'].size):
+            tc_track_G.read_one_gettelman(nc_data, i)
+
+        tc_track = tc.TCTracks()
+        tc_track.read_simulations_gettelman(TEST_TRACK_GETTELMAN)
+        self.assertFalse(tc_track.is_packed)
+        self.assertEqual(tc_track.size, 3)
+        for track, track_G in zip(tc_track.data, tc_track_G.data):
+            self.assertTrue(track.equals(track_G))
+            self.assertEqual(track.attrs, track_G.attrs)
+        tc_track.data[0].attrs['basin'] = 'other'
+        self.assertEqual(tc_track.data[0].basin, 'other')
+
+        tc_track.read_simulations_gettelman(TEST_TRACK_GETTELMAN, pack=True)
+        self.assertTrue(tc_track.is_packed)
+        for track, track_G in zip(tc_track.data, tc_track_G.data):
+            self.assertTrue(track.equals(track_G))
+
+        tc_track.read_simulations_gettelman(TEST_TRACK_GETTELMAN, basin='WP')
+        self.assertEqual(tc_track.size, 2)
+        self.assertEqual(tc_track.data[0].sid, '1')
+        tc_track.read_simulations_gettelman(TEST_TRACK_GETTELMAN, year_range=(1990, 2000))
+        self.assertEqual(tc_track.size, 0)
+
+        tc_track = tc.TCTracks()
+        tc_track.read_simulations_emanuel(TEST_TRACK_EMANUEL, hemisphere='both',
+                                          year_range=(1950, 1950), pack=True)
+        self.assertTrue(tc_track.is_packed)
+        self.assertEqual(tc_track.size, 5)
+        tc_track.read_simulations_emanuel(TEST_TRACK_EMANUEL, hemisphere='both',
+                                          year_range=(1951, 1960))
+        self.assertEqual(tc_track.size, 0)
+
 
 class TestFuncs(unittest.TestCase):
     """Test functions over TC tracks"""
@@ -272,6 +350,56 @@ class TestFuncs(unittest.TestCase):
         tc_track.read_ibtracs_netcdf(storm_id=storms)
         self.assertEqual(tc_track.subset({'basin': 'SP'}).size, 2)
 
+    def test_subset_index_pass(self):
+        """Test subset and get_track on indexed attributes."""
+        tc_track = tc.TCTracks()
+        tc_track.read_processed_ibtracs_csv([TEST_TRACK, TEST_TRACK_SHORT])
+        tc_track.data[1].attrs['sid'] = 'other'
+        tc_track.data[1].attrs['basin'] = 'EP'
+        self.assertEqual(tc_track.get_track('other').basin, 'EP')
+        year = tc_track.data[0].time.dt.year.values[0]
+        self.assertEqual(tc_track.subset({'year': year}).size, 2)
+        self.assertEqual(tc_track.subset({'year': year, 'basin': 'EP'}).size, 1)
+        self.assertEqual(tc_track.subset({'basin': 'EP', 'name': 'unknown'}).size, 0)
+        self.assertEqual(tc_track.subset({'orig_event_flag': True}).size, 2)
+
+        # appended tracks are indexed
+        tc_add = tc.TCTracks()
+        tc_add.read_processed_ibtracs_csv(TEST_TRACK_SHORT)
+        tc_add.data[0].attrs['sid'] = 'added'
+        tc_track.append(tc_add.data)
+        self.assertEqual(tc_track.get_track('added').sid, 'added')
+        self.assertEqual(tc_track.subset({'year': year}).size, 3)
+
+        # tracks replaced or removed in the list are indexed
+        tc_track.data[2] = tc_track.data[2].copy()
+        tc_track.data[2].attrs['sid'] = 'replaced'
+        self.assertEqual(tc_track.get_track('replaced').sid, 'replaced')
+        self.assertEqual(tc_track.get_track('added'), [])
+        track_other = tc_track.data.pop(1)
+        self.assertEqual(tc_track.get_track('replaced').sid, 'replaced')
+        tc_track.data.insert(0, track_other)
+        self.assertEqual(tc_track.get_track('other').sid, 'other')
+        self.assertEqual(tc_track.get_track('replaced').sid, 'replaced')
+        self.assertEqual(tc_track.subset({'sid': '1951239N12334'}).data[0].sid,
+                         '1951239N12334')
+
+        # the index is rebuilt if a matching track changed in place
+        tc_track.data[0].attrs['basin'] = 'NA'
+        self.assertEqual(tc_track.subset({'basin': 'EP'}).size, 0)
+        # tracks changed to a value are found after reindex
+        tc_track.data[0].attrs['basin'] = 'EP'
+        tc_track.data[1].attrs['basin'] = 'EP'
+        tc_track.reindex()
+        subset = tc_track.subset({'basin': 'EP'})
+        self.assertEqual(subset.size, 2)
+        self.assertEqual(subset.get_track('other').sid, 'other')
+        tc_track.data[2].attrs['sid'] = 'added'
+
+        tc_track.pack()
+        self.assertEqual(tc_track.subset({'basin': 'EP', 'year': year}).size, 2)
+        self.assertEqual(tc_track.get_track('added').sid, 'added')
+
     def test_get_extent(self):
         """Test extent/bounds attributes."""
         storms = ['1988169N14259', '2002073S16161', '2002143S07157']
@@ -418,6 +546,53 @@ class TestFuncs(unittest.TestCase):
         self.assertEqual(tc_track.data[0].id_no, 1951239012334)
         self.assertEqual(tc_track.data[0].category, 1)
 
+    def test_interp_mixed_packed_pass(self):
+        """Interpolate tracks with different variables, lengths and storage"""
+        tc_track = tc.TCTracks()
+        tc_track.read_simulations_emanuel(TEST_TRACK_EMANUEL, hemisphere='S')
+        tc_track.append(tc_track.data[0].isel(time=[0, 3, 7]))
+        tc_csv = tc.TCTracks()
+        tc_csv.read_processed_ibtracs_csv([TEST_TRACK, TEST_TRACK_SHORT])
+        tc_track.append(tc_csv.data)
+        tc_track.append(tc_csv.data[0].isel(time=[0]))
+        tc_packed = tc.TCTracks()
+        tc_packed.append(tc_csv.data[:2])
+        tc_packed.pack()
+
+        tc_track.equal_timestep(time_step_h=0.5)
+        tc_packed.equal_timestep(time_step_h=0.5)
+        self.assertEqual(tc_track.size, 5)
+        self.assertEqual(tc_track.data[1].time.size, 29)
+        self.assertTrue(np.all(np.diff(tc_track.data[1].time.values)
+                               == np.timedelta64(30, 'm')))
+        self.assertEqual(tc_track.data[2].time.size, 445)
+        self.assertEqual(tc_track.data[4].time.size, 1)
+        self.assertTrue(tc_packed.is_packed)
+        for track, track_pack in zip(tc_track.data[2:4], tc_packed.data):
+            self.assertTrue(track.equals(track_pack))
+            self.assertEqual(track.category, track_pack.category)
+        self.assertEqual(tc_track.data[1].sid, tc_track.data[0].sid)
+        self.assertTrue(np.all(tc_track.data[0].time_step == 0.5))
+
+    def test_ibtracs_match_pass(self):
+        """Test selection of IBTrACS storms"""
+        sid = np.array(['1988234N13299', '1989260N11316', '2017242N16333'])
+        basins = np.array([['NA'], ['NA', 'EP'], ['NA']], dtype=object)
+        in_basin = lambda bas: np.array([bas in st_bas for st_bas in basins])
+        self.assertTrue(np.array_equal(
+            tc._ibtracs_match(sid, ['1989260N11316'], None, in_basin, None),
+            [False, True, False]))
+        self.assertTrue(np.array_equal(
+            tc._ibtracs_match(sid, None, (1980, 2000), in_basin, 'NA'),
+            [True, True, False]))
+        self.assertTrue(np.array_equal(
+            tc._ibtracs_match(sid, None, (1980, 2018), in_basin, 'EP'),
+            [False, True, False]))
+        with self.assertLogs('climada.hazard.tc_tracks', level='INFO') as cm:
+            match = tc._ibtracs_match(sid, None, (2018, 2019), in_basin, None)
+        self.assertFalse(match.any())
+        self.assertIn('No tracks in time range', cm.output[0])
+
     def test_dist_since_lf_pass(self):
         """Test _dist_since_lf for andrew tropical cyclone."""
         tc_track = tc.TCTracks()
@@ -432,7 +607,7 @@ class TestFuncs(unittest.TestCase):
 
         self.assertGreater(track.dist_since_lf.values[-1],
                            dist_to_coast(track.lat.values[-1], track.lon.values[-1]) / 1000)
-        self.assertEqual(1020.5431562223974, track['dist_since_lf'].values[-1])
+        self.assertAlmostEqual(1020.5431562223974, track['dist_since_lf'].values[-1], 6)
 
         # check distances on land always increase, in second landfall
         dist_on_land = track.dist_since_lf.values[track.on_land]
@@ -63,6 +63,35 @@ class TestECMWF(unittest.TestCase):
                          np.datetime64('2020-03-19T12:00:00.000000'))
         self.assertEqual(forecast.data[1].is_ensemble, True)
 
+    def test_fetch_ecmwf_pool_pass(self):
+        """Test ECMWF reader decodes files in parallel in the same order"""
+        from pathos.pools import ProcessPool as Pool
+        forecast = TCForecast()
+        forecast.fetch_ecmwf(TEST_BUFR_FILES)
+
+        pool = Pool(2)
+        forecast_pool = TCForecast(pool)
+        files = [open(file, 'rb') for file in TEST_BUFR_FILES]
+        forecast_pool.fetch_ecmwf(files=files)
+        pool.close()
+        pool.join()
+
+        self.assertTrue(all(file.closed for file in files))
+        self.assertEqual(forecast_pool.size, forecast.size)
+        for track, track_pool in zip(forecast.data, forecast_pool.data):
+            self.assertTrue(track.equals(track_pool))
+            self.assertEqual(track.attrs, track_pool.attrs)
+
+    def test_read_one_bufr_bytes_pass(self):
+        """Test reading BUFR file content"""
+        forecast = TCForecast()
+        forecast.read_one_bufr_tc(TEST_BUFR_FILES[1], id_no=1)
+        forecast_bytes = TCForecast()
+        with open(TEST_BUFR_FILES[1], 'rb') as file:
+            forecast_bytes.read_one_bufr_tc(file.read(), id_no=1)
+        self.assertEqual(forecast_bytes.size, forecast.size)
+        self.assertTrue(forecast_bytes.data[-1].equals(forecast.data[-1]))
+
 
 # Execute Tests
 if __name__ == "__main__":
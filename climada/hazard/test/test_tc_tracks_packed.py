@@ -0,0 +1,179 @@
+"""
+This file is part of CLIMADA.
+
+Copyright (C) 2017 ETH Zurich, CLIMADA contributors listed in AUTHORS.
+
+CLIMADA is free software: you can redistribute it and/or modify it under the
+terms of the GNU Lesser General Public License as published by the Free
+Software Foundation, version 3.
+
+CLIMADA is distributed in the hope that it will be useful, but WITHOUT ANY
+WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License along
+with CLIMADA. If not, see <https://www.gnu.org/licenses/>.
+
+---
+
+Test PackedTracks class
+"""
+
+import os
+import unittest
+import numpy as np
+import xarray as xr
+
+from climada.hazard.tc_tracks import TCTracks
+from climada.hazard.tc_tracks_packed import PackedTracks
+from climada.hazard.trop_cyclone import TropCyclone
+from climada.hazard.centroids.centr import Centroids
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+TEST_TRACK = os.path.join(DATA_DIR, "trac_brb_test.csv")
+TEST_TRACK_SHORT = os.path.join(DATA_DIR, "trac_short_test.csv")
+
+CENTR_TEST_BRB = Centroids()
+CENTR_TEST_BRB.read_mat(os.path.join(DATA_DIR, 'centr_brb_test.mat'))
+
+def _read_tracks():
+    tc_track = TCTracks()
+    tc_track.read_processed_ibtracs_csv([TEST_TRACK, TEST_TRACK_SHORT, TEST_TRACK])
+    for track in tc_track.data:
+        track.attrs['basin'] = 'NA'
+    tc_track.data[2].attrs['sid'] = 'other'
+    tc_track.data[2].attrs['name'] = 'other'
+    tc_track.data[2].attrs['basin'] = 'EP'
+    return tc_track
+
+class TestPackedTracks(unittest.TestCase):
+    """Test PackedTracks"""
+
+    def test_pack_pass(self):
+        """Test packed tracks are equal to tracks"""
+        tc_track = _read_tracks()
+        packed = PackedTracks(tc_track.data)
+        self.assertEqual(packed.size, 3)
+        self.assertEqual(len(packed), 3)
+        self.assertTrue(np.array_equal(packed.sizes,
+                                       [track.time.size for track in tc_track.data]))
+        self.assertEqual(packed.nodes['lat'].size, packed.sizes.sum())
+        self.assertTrue(np.array_equal(packed.attrs['sid'],
+                                       ['1951239N12334', '1951239N12334', 'other']))
+        for track, track_pack in zip(tc_track.data, packed):
+            self.assertTrue(track.equals(track_pack))
+            self.assertEqual(track.attrs, track_pack.attrs)
+        self.assertIsInstance(packed[-1].orig_event_flag, bool)
+        self.assertTrue(packed[-1].equals(tc_track.data[-1]))
+        with self.assertRaises(IndexError):
+            packed[3]
+
+    def test_view_pass(self):
+        """Test tracks share the node arrays"""
+        packed = PackedTracks(_read_tracks().data)
+        track = packed[1]
+        self.assertTrue(np.shares_memory(track.central_pressure.values,
+                                         packed.nodes['central_pressure']))
+        track.central_pressure[0] = 900
+        self.assertEqual(packed.nodes['central_pressure'][packed.offsets[1]], 900)
+
+        track_list = packed.to_list()[1]
+        self.assertFalse(np.shares_memory(track_list.central_pressure.values,
+                                          packed.nodes['central_pressure']))
+
+    def test_select_pass(self):
+        """Test selection by mask, indices and slice"""
+        tc_track = _read_tracks()
+        packed = PackedTracks(tc_track.data)
+        for sel, idx in [(np.array([True, False, True]), [0, 2]),
+                         (np.array([2, 1]), [2, 1]),
+                         (slice(1, 3), [1, 2])]:
+            packed_sel = packed[sel]
+            self.assertEqual(packed_sel.size, len(idx))
+            for i_sel, i_track in enumerate(idx):
+                self.assertTrue(packed_sel[i_sel].equals(tc_track.data[i_track]))
+                self.assertEqual(packed_sel[i_sel].attrs, tc_track.data[i_track].attrs)
+        self.assertTrue(np.shares_memory(packed[1:].nodes['lat'], packed.nodes['lat']))
+        self.assertEqual(packed[np.zeros(3, bool)].size, 0)
+
+    def test_dataset_pass(self):
+        """Test writing and reading tracks as ragged array netcdf"""
+        tc_track = _read_tracks()
+        packed = PackedTracks(tc_track.data)
+        file_name = os.path.join(DATA_DIR, 'test_packed_tracks.nc')
+        packed.to_dataset().to_netcdf(file_name)
+        with xr.open_dataset(file_name) as dataset:
+            self.assertEqual(dataset.node.size, packed.sizes.sum())
+            self.assertEqual(dataset.storm.size, 3)
+            packed_read = PackedTracks.from_dataset(dataset)
+            packed_sel = PackedTracks.from_dataset(dataset, np.array([False, True, True]))
+        os.remove(file_name)
+        for track, track_read in zip(tc_track.data, packed_read):
+            self.assertTrue(track.equals(track_read))
+            self.assertEqual(track.attrs, track_read.attrs)
+        self.assertEqual(packed_sel.size, 2)
+        self.assertTrue(packed_sel[0].equals(tc_track.data[1]))
+        self.assertEqual(packed_sel[1].attrs, tc_track.data[2].attrs)
+
+    def test_concat_pass(self):
+        """Test concatenation of packed tracks"""
+        tc_track = _read_tracks()
+        packed = PackedTracks(tc_track.data)
+        packed_cat = PackedTracks.concat([packed[2:], PackedTracks(), packed[:2]])
+        self.assertEqual(packed_cat.size, 3)
+        self.assertEqual(packed_cat.offsets[-1], packed.offsets[-1])
+        for i_cat, i_track in enumerate([2, 0, 1]):
+            self.assertTrue(packed_cat[i_cat].equals(tc_track.data[i_track]))
+            self.assertEqual(packed_cat[i_cat].attrs, tc_track.data[i_track].attrs)
+
+    def test_different_vars_fail(self):
+        """Test tracks with different variables are not packed"""
+        tc_track = _read_tracks()
+        tc_track.data[1] = tc_track.data[1].drop_vars('radius_max_wind')
+        with self.assertLogs('climada.hazard.tc_tracks_packed', level='ERROR') as cm:
+            with self.assertRaises(ValueError):
+                PackedTracks(tc_track.data)
+        self.assertIn('cannot be packed', cm.output[0])
+
+class TestTCTracksPacked(unittest.TestCase):
+    """Test TCTracks with packed data"""
+
+    def test_pack_unpack_pass(self):
+        """Test TCTracks methods give same results with packed data"""
+        tc_track = _read_tracks()
+        tc_pack = _read_tracks()
+        tc_pack.pack()
+        self.assertTrue(tc_pack.is_packed)
+        self.assertFalse(tc_track.is_packed)
+        self.assertEqual(tc_pack.size, 3)
+        self.assertEqual(tc_pack.get_bounds(), tc_track.get_bounds())
+        self.assertEqual(tc_pack.get_track('other').attrs, tc_track.data[2].attrs)
+        self.assertEqual(tc_pack.get_track('unknown'), [])
+        subset = tc_pack.subset({'basin': 'EP'})
+        self.assertTrue(subset.is_packed)
+        self.assertEqual(subset.size, 1)
+        self.assertEqual(subset.data[0].sid, 'other')
+
+        tc_pack.append(tc_track.data[0])
+        self.assertFalse(tc_pack.is_packed)
+        self.assertEqual(tc_pack.size, 4)
+        self.assertTrue(tc_pack.data[2].equals(tc_track.data[2]))
+
+    def test_set_from_tracks_pass(self):
+        """Test hazard from packed tracks is equal"""
+        tc_track = _read_tracks()
+        tc_track.equal_timestep()
+        tc_haz = TropCyclone()
+        tc_haz.set_from_tracks(tc_track, CENTR_TEST_BRB)
+        tc_track.pack()
+        tc_pack = TropCyclone()
+        tc_pack.set_from_tracks(tc_track, CENTR_TEST_BRB)
+        self.assertTrue(np.allclose(tc_haz.intensity.toarray(), tc_pack.intensity.toarray()))
+        self.assertTrue(np.allclose(tc_haz.frequency, tc_pack.frequency))
+        self.assertEqual(tc_haz.event_name, tc_pack.event_name)
+        self.assertTrue(np.array_equal(tc_haz.date, tc_pack.date))
+
+if __name__ == "__main__":
+    TESTS = unittest.TestLoader().loadTestsFromTestCase(TestPackedTracks)
+    TESTS.addTests(unittest.TestLoader().loadTestsFromTestCase(TestTCTracksPacked))
+    unittest.TextTestRunner(verbosity=2).run(TESTS)
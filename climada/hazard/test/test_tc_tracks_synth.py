@@ -24,16 +24,36 @@ import numpy as np
 import os
 import unittest
 import xarray as xr
+from shapely.geometry import MultiPolygon, box
 
 import climada.hazard.tc_tracks as tc
 import climada.hazard.tc_tracks_synth as tc_synth
 import climada.util.coordinates
+from climada.hazard.tc_tracks_packed import PackedTracks
 from climada.util.constants import TC_ANDREW_FL
 
 DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
 TEST_TRACK = os.path.join(DATA_DIR, "trac_brb_test.csv")
 TEST_TRACK_SHORT = os.path.join(DATA_DIR, "trac_short_test.csv")
 
+LAND_STRIPES = MultiPolygon([box(-68.2, 10, -65.8, 20), box(-62.2, 10, -60.8, 20),
+                             box(-59.2, 10, -58.8, 20), box(-57.7, 10, -50, 20)])
+"""Land stripes crossed by the tracks of _multi_landfall_tracks."""
+
+def _multi_landfall_tracks(orig_event_flag):
+    """Two westward tracks with several landfalls on LAND_STRIPES, the second
+    one starting on land."""
+    tc_track = tc.TCTracks()
+    tc_track.read_processed_ibtracs_csv([TEST_TRACK, TEST_TRACK])
+    tc_track.data[1].attrs['sid'] = 'on_land'
+    for track, lon_0, lat in zip(tc_track.data, [-75, -67], [15, 15.1]):
+        track['lon'].values[:] = np.linspace(lon_0, lon_0 + 18.5, track.time.size)
+        track['lat'].values[:] = lat
+        track.attrs['orig_event_flag'] = orig_event_flag
+        if not orig_event_flag:
+            track['max_sustained_wind'].values[:] *= 1.1
+    return tc_track.data
+
 class TestDecay(unittest.TestCase):
     def test_apply_decay_no_landfall_pass(self):
         """Test _apply_land_decay with no historical tracks with landfall"""
@@ -133,6 +153,75 @@ class TestDecay(unittest.TestCase):
                                   tc_track.data[0].max_sustained_wind_unit)
         self.assertEqual(cat_ref, tc_track.data[0].category)
 
+    def test_decay_multi_landfall_packed_pass(self):
+        """Test decay of list and packed tracks with several landfalls and
+        starting on land against reference."""
+        v_ref = {1: -0.001578274359855299, 2: 0.004014996417839323}
+        p_ref = {1: (1.0054535865783691, -0.0044520554231043796),
+                 2: (1.0116419792175293, 0.01738632126999466)}
+        for ss_scale in range(3, 8):
+            v_ref[ss_scale] = 0.0028192951995801227
+            p_ref[ss_scale] = (1.039954274892807, 0.0044926731123349686)
+
+        hist = _multi_landfall_tracks(True)
+        v_rel, p_rel = tc_synth._calc_land_decay(hist, LAND_STRIPES)
+        self.assertEqual(v_rel, v_ref)
+        self.assertEqual(p_rel, p_ref)
+        hist_pack = PackedTracks(_multi_landfall_tracks(True))
+        self.assertEqual(tc_synth._calc_land_decay(hist_pack, LAND_STRIPES),
+                         (v_ref, p_ref))
+
+        # distance since landfall restarts at every landfall, nan on the land
+        # the track starts on
+        dist_ref = 26.851511 + 53.703015 * np.arange(5)
+        self.assertTrue(np.allclose(hist[0].dist_since_lf[14:19], dist_ref))
+        self.assertTrue(np.allclose(hist[0].dist_since_lf[32:38],
+                                    [26.851511, np.nan, np.nan] + dist_ref[:3].tolist(),
+                                    equal_nan=True))
+        self.assertTrue(np.isnan(hist[1].dist_since_lf[:10]).all())
+        self.assertTrue(np.allclose(hist[1].dist_since_lf[10:13],
+                                    26.838913 + 53.677818 * np.arange(3)))
+        self.assertTrue(np.allclose(hist[1].dist_since_lf[19:34],
+                                    26.838913 + 53.677818 * np.arange(15)))
+        for track, track_pack in zip(hist, hist_pack.to_list()):
+            self.assertTrue(np.array_equal(track.dist_since_lf, track_pack.dist_since_lf,
+                                           equal_nan=True))
+
+        wind_ref = np.array([
+            27.5, 27.5, 27.5, 27.5, 27.5, 27.5, 27.5, 27.5, 27.5, 27.5, 27.5, 27.5,
+            33.0, 33.0, 33.0, 38.5, 44.0, 49.5, 49.5, 64.44314237, 64.44314237,
+            69.94314237, 75.44314237, 80.94314237, 86.44314237, 97.44314237,
+            90.33877005, 77.64615762, 66.73685938, 74.91940863, 74.91940863,
+            69.41940863, 60.5, 49.5, 44.0, 39.5031696, 31.84127811, 25.6654593])
+        pres_ref = np.array([
+            1007.5872, 1007.6207, 1007.6542, 1007.69105, 1007.7279, 1007.7681,
+            1007.81165, 1007.8552, 1007.89875, 1007.94565, 1008.0088, 1008.0748,
+            1004.4558, 1004.5218, 1004.5878, 1000.97215, 997.35315, 993.7313,
+            993.79445, 992.30013576, 992.35993576, 988.73473576, 985.09328576,
+            981.44513576, 977.80368576, 970.48678576, 974.97717155, 982.48503601,
+            988.38343512, 987.56518019, 987.64458019, 991.40898019, 987.2387,
+            994.6489, 998.37695, 1002.71264109, 1007.13535816, 1008.87391674])
+        synth = _multi_landfall_tracks(False)
+        wind_orig = synth[1].max_sustained_wind.values.copy()
+        pres_orig = synth[1].central_pressure.values.copy()
+        np.random.seed(3)
+        self.assertIs(tc_synth._apply_land_decay(synth, v_rel, p_rel, LAND_STRIPES), synth)
+        self.assertTrue(np.allclose(synth[0].max_sustained_wind, wind_ref))
+        self.assertTrue(np.allclose(synth[0].central_pressure, pres_ref))
+        self.assertEqual(synth[0].category, 3)
+        # tracks starting on land are not decayed
+        self.assertTrue(np.array_equal(synth[1].max_sustained_wind, wind_orig))
+        self.assertTrue(np.array_equal(synth[1].central_pressure, pres_orig))
+
+        synth_pack = PackedTracks(_multi_landfall_tracks(False))
+        np.random.seed(3)
+        synth_pack = tc_synth._apply_land_decay(synth_pack, v_rel, p_rel, LAND_STRIPES)
+        for track, track_pack in zip(synth, synth_pack.to_list()):
+            self.assertTrue(track.equals(track_pack))
+            self.assertEqual(track.category, track_pack.category)
+
+        self.assertIs(tc_synth._apply_land_decay(synth, dict(), dict(), LAND_STRIPES), synth)
+
     def test_func_decay_p_pass(self):
         """Test decay function for pressure with its inverse."""
         s_coef = 1.05
@@ -403,6 +492,33 @@ class TestSynth(unittest.TestCase):
         self.assertAlmostEqual(tc_track.data[2].lat[7].values, 12.3454308)
         self.assertAlmostEqual(tc_track.data[2].lat[8].values, 12.42745488)
 
+    def test_random_walk_packed_pass(self):
+        """Test packed and listed tracks give the same ensembles."""
+        tc_track = tc.TCTracks()
+        tc_track.read_processed_ibtracs_csv([TEST_TRACK, TEST_TRACK_SHORT])
+        tc_track.data[0].attrs['sid'] = 'other'
+        tc_pack = tc.TCTracks()
+        tc_pack.data = list(tc_track.data)
+        tc_pack.pack()
+        ens_size = 3
+        tc_track.calc_random_walk(ens_size=ens_size, seed=25, decay=False)
+        tc_pack.calc_random_walk(ens_size=ens_size, seed=25, decay=False)
+
+        self.assertTrue(tc_pack.is_packed)
+        self.assertEqual(tc_pack.size, 2 * (ens_size + 1))
+        self.assertEqual([track.sid for track in tc_pack.data],
+                         ['other', 'other_gen1', 'other_gen2', 'other_gen3',
+                          '1951239N12334', '1951239N12334_gen1',
+                          '1951239N12334_gen2', '1951239N12334_gen3'])
+        self.assertEqual([track.orig_event_flag for track in tc_pack.data],
+                         [True, False, False, False] * 2)
+        for track, track_pack in zip(tc_track.data, tc_pack.data):
+            self.assertTrue(track.equals(track_pack))
+            self.assertEqual(track.name, track_pack.name)
+            self.assertEqual(track.id_no, track_pack.id_no)
+        self.assertTrue(np.array_equal(tc_pack.data[5].time, tc_pack.data[4].time))
+        self.assertFalse(np.allclose(tc_pack.data[5].lat, tc_pack.data[4].lat))
+
     def test_random_walk_decay_pass(self):
         """Test land decay is called from calc_random_walk."""
         tc_track = tc.TCTracks()
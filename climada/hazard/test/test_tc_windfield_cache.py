@@ -0,0 +1,118 @@
+"""
+This file is part of CLIMADA.
+
+Copyright (C) 2017 ETH Zurich, CLIMADA contributors listed in AUTHORS.
+
+CLIMADA is free software: you can redistribute it and/or modify it under the
+terms of the GNU Lesser General Public License as published by the Free
+Software Foundation, version 3.
+
+CLIMADA is distributed in the hope that it will be useful, but WITHOUT ANY
+WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License along
+with CLIMADA. If not, see <https://www.gnu.org/licenses/>.
+
+---
+
+Test WindfieldCache class
+"""
+
+import os
+import shutil
+import unittest
+import numpy as np
+from scipy import sparse
+
+from climada.hazard.tc_tracks import TCTracks
+from climada.hazard.trop_cyclone import TropCyclone
+from climada.hazard.tc_windfield_cache import WindfieldCache
+from climada.hazard.centroids.centr import Centroids
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+TEST_TRACK = os.path.join(DATA_DIR, "trac_brb_test.csv")
+CACHE_DIR = os.path.join(DATA_DIR, 'tc_windfield_cache')
+
+CENTR_TEST_BRB = Centroids()
+CENTR_TEST_BRB.read_mat(os.path.join(DATA_DIR, 'centr_brb_test.mat'))
+
+class TestWindfieldCache(unittest.TestCase):
+    """Test WindfieldCache"""
+
+    def setUp(self):
+        self.cache = WindfieldCache(CACHE_DIR)
+        self.cache.clear()
+
+    def tearDown(self):
+        shutil.rmtree(CACHE_DIR, ignore_errors=True)
+
+    def test_put_get_pass(self):
+        """Test storing and retrieving an intensity row"""
+        inten = sparse.csr_matrix(np.array([[0, 20.5, 0, 33.1]]))
+        self.assertIsNone(self.cache.get('abc'))
+        self.cache.put('abc', inten)
+        self.assertEqual(self.cache.size, 1)
+        inten_read = self.cache.get('abc')
+        self.assertIsInstance(inten_read, sparse.csr_matrix)
+        self.assertTrue(np.allclose(inten_read.toarray(), inten.toarray()))
+
+    def test_evict_pass(self):
+        """Test least recently used entries are evicted first"""
+        inten = sparse.csr_matrix(np.arange(1000, dtype=float).reshape(1, -1))
+        for i_key, key in enumerate(['a', 'b', 'c']):
+            self.cache.put(key, inten)
+            os.utime(self.cache._path(key), (i_key, i_key))
+        self.cache.get('a')
+        entry_size = os.path.getsize(self.cache._path('a'))
+        self.cache.max_size_mb = 2.5 * entry_size / 1024 ** 2
+        self.cache.evict()
+        self.assertEqual(self.cache.size, 2)
+        self.assertIsNotNone(self.cache.get('a'))
+        self.assertIsNone(self.cache.get('b'))
+        self.assertIsNotNone(self.cache.get('c'))
+
+    def test_track_key_pass(self):
+        """Test key changes with track data, but not with track name"""
+        tc_track = TCTracks()
+        tc_track.read_processed_ibtracs_csv(TEST_TRACK)
+        track = tc_track.data[0]
+        centr_key = self.cache.centroids_key(CENTR_TEST_BRB, np.arange(10))
+        key = self.cache.track_key(track, centr_key, 'H08', 17.5)
+
+        track_mod = track.copy(deep=True)
+        track_mod.attrs['name'] = 'other'
+        self.assertEqual(key, self.cache.track_key(track_mod, centr_key, 'H08', 17.5))
+        self.assertNotEqual(key, self.cache.track_key(track, centr_key, 'H08', 10))
+        track_mod.central_pressure[3] += 1
+        self.assertNotEqual(key, self.cache.track_key(track_mod, centr_key, 'H08', 17.5))
+        centr_key_2 = self.cache.centroids_key(CENTR_TEST_BRB, np.arange(11))
+        self.assertNotEqual(key, self.cache.track_key(track, centr_key_2, 'H08', 17.5))
+
+    def test_set_from_tracks_pass(self):
+        """Test cached hazard is equal to computed hazard"""
+        tc_track = TCTracks()
+        tc_track.read_processed_ibtracs_csv(TEST_TRACK)
+        tc_track.equal_timestep()
+        tc_haz = TropCyclone()
+        tc_haz.set_from_tracks(tc_track, centroids=CENTR_TEST_BRB)
+
+        tc_cache = TropCyclone()
+        tc_cache.set_from_tracks(tc_track, centroids=CENTR_TEST_BRB, cache=self.cache)
+        self.assertEqual(self.cache.size, 1)
+        self.assertTrue(np.allclose(tc_haz.intensity.toarray(),
+                                    tc_cache.intensity.toarray()))
+
+        tc_cache = TropCyclone()
+        tc_cache.set_from_tracks(tc_track, centroids=CENTR_TEST_BRB, cache=self.cache)
+        self.assertEqual(self.cache.size, 1)
+        self.assertTrue(np.allclose(tc_haz.intensity.toarray(),
+                                    tc_cache.intensity.toarray()))
+        self.assertEqual(tc_haz.event_name, tc_cache.event_name)
+        self.assertTrue(np.array_equal(tc_haz.date, tc_cache.date))
+        self.assertTrue(np.array_equal(tc_haz.fraction.toarray(),
+                                       tc_cache.fraction.toarray()))
+
+if __name__ == "__main__":
+    TESTS = unittest.TestLoader().loadTestsFromTestCase(TestWindfieldCache)
+    unittest.TextTestRunner(verbosity=2).run(TESTS)
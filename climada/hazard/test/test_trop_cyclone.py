@@ -26,9 +26,11 @@ from scipy import sparse
 import datetime as dt
 
 from climada.util import ureg
+from climada.util.config import CONFIG
 import climada.hazard.trop_cyclone as tc
 from climada.hazard.tc_tracks import TCTracks
 from climada.hazard.trop_cyclone import TropCyclone
+from climada.hazard.tc_clim_change import get_knutson_criterion, calc_scale_knutson
 from climada.hazard.centroids.centr import Centroids
 
 DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
@@ -156,6 +158,25 @@ class TestReader(unittest.TestCase):
         self.assertEqual(tc_haz.fraction.nonzero()[0].size, 0)
         self.assertEqual(tc_haz.intensity.nonzero()[0].size, 0)
 
+    def test_out_of_reach_pass(self):
+        """Test tracks out of reach are zero events counted in frequency."""
+        tc_track = TCTracks()
+        tc_track.read_processed_ibtracs_csv([TEST_TRACK, TEST_TRACK])
+        tc_track.equal_timestep()
+        tc_track.data[1] = tc_track.data[1].copy(deep=True)
+        tc_track.data[1]['lon'] = tc_track.data[1].lon + 120
+        tc_track.data[1].attrs['sid'] = 'far_away'
+        tc_haz = TropCyclone()
+        tc_haz.set_from_tracks(tc_track, CENTR_TEST_BRB, ignore_distance_to_coast=True)
+
+        self.assertEqual(tc_haz.event_id.size, 2)
+        self.assertEqual(tc_haz.event_name, ['1951239N12334', 'far_away'])
+        self.assertEqual(tc_haz.intensity.shape, (2, 296))
+        self.assertTrue(tc_haz.intensity[0].nnz > 0)
+        self.assertEqual(tc_haz.intensity[1].nnz, 0)
+        self.assertEqual(tc_haz.fraction[1].nnz, 0)
+        self.assertTrue(np.allclose(tc_haz.frequency, np.ones(2)))
+
 class TestModel(unittest.TestCase):
     """Test modelling of tropical cyclone"""
 
@@ -213,6 +234,26 @@ class TestModel(unittest.TestCase):
         self.assertAlmostEqual(_v_arr[1], 11.682978583939310)
         self.assertAlmostEqual(_v_arr[2], 11.610940769149384)
 
+    def test_tracks_in_reach_pass(self):
+        """Test tracks_in_reach against rectangular regions around tracks."""
+        tc_track = TCTracks()
+        tc_track.read_processed_ibtracs_csv(TEST_TRACK)
+        track = tc_track.data[0]
+        centroids = CENTR_TEST_BRB.coord
+        self.assertTrue(tc.tracks_in_reach([track], centroids)[0])
+
+        track_far = track.copy(deep=True)
+        track_far['lat'] = track.lat + 40
+        track_short = track.isel(time=[0])
+        track_am = track.copy(deep=True)
+        track_am['lon'] = track.lon - track.lon.values[0] + 179.5
+        centr_am = np.array([[track_am.lat.values[0], -179.5]])
+        in_reach = tc.tracks_in_reach([track_far, track_short, track], centroids)
+        self.assertTrue(np.array_equal(in_reach, [False, False, True]))
+        self.assertTrue(tc.tracks_in_reach([track_am], centr_am)[0])
+        self.assertFalse(tc.tracks_in_reach([track], centr_am)[0])
+        self.assertFalse(tc.tracks_in_reach([track], np.zeros((0, 2)))[0])
+
     def test_vtrans_pass(self):
         """Test _vtrans function. Compare to MATLAB reference."""
         tc_track = TCTracks()
@@ -309,8 +350,159 @@ class TestClimateSce(unittest.TestCase):
         res_frequency[3] = 0.5 * 1.01875
         self.assertTrue(np.allclose(tc_cc.frequency, res_frequency))
 
+    def test_climate_scenarios_knu_pass(self):
+        """Test set_climate_scenarios_knu shares unchanged data"""
+        tc = TropCyclone()
+        tc.intensity = sparse.csr_matrix(np.arange(40).reshape(4, 10))
+        tc.frequency = np.ones(4) * 0.5
+        tc.basin = ['NA', 'EP', 'WP', 'SI']
+        tc.category = np.array([2, 0, 4, 1])
+        tc.event_id = np.arange(4)
+        tc.centroids = CENTR_TEST_BRB
+
+        haz_sce = tc.set_climate_scenarios_knu([2050, 2080], [45, 85])
+        self.assertEqual(sorted(haz_sce.keys()),
+                         [(2050, 45), (2050, 85), (2080, 45), (2080, 85)])
+        for (ref_year, rcp), tc_cc in haz_sce.items():
+            scale = calc_scale_knutson(ref_year, rcp)
+            tc_ref = tc._apply_criterion(get_knutson_criterion(), scale)
+            self.assertTrue(np.allclose(tc_cc.intensity.toarray(),
+                                        tc_ref.intensity.toarray()))
+            self.assertTrue(np.allclose(tc_cc.frequency, tc_ref.frequency))
+            self.assertIn(str(ref_year), tc_cc.tag.description)
+            self.assertIs(tc_cc.centroids, tc.centroids)
+            self.assertTrue(np.shares_memory(tc_cc.intensity.indices, tc.intensity.indices))
+        self.assertFalse(np.allclose(haz_sce[(2080, 85)].frequency, tc.frequency))
+        self.assertTrue(np.allclose(tc.frequency, np.ones(4) * 0.5))
+        self.assertTrue(np.array_equal(tc.intensity.toarray(), np.arange(40).reshape(4, 10)))
+        self.assertEqual(tc.tag.description, '')
+
+        tc_cc = tc.set_climate_scenario_knu(2080, 85)
+        self.assertTrue(np.allclose(tc_cc.frequency, haz_sce[(2080, 85)].frequency))
+        self.assertTrue(np.allclose(tc_cc.intensity.toarray(),
+                                    haz_sce[(2080, 85)].intensity.toarray()))
+        # the single scenario shares nothing with the source hazard
+        self.assertIsNot(tc_cc.centroids, tc.centroids)
+        self.assertIsNot(tc_cc.basin, tc.basin)
+        self.assertIsNot(tc_cc.tag, tc.tag)
+        self.assertFalse(np.shares_memory(tc_cc.intensity.indices, tc.intensity.indices))
+        self.assertFalse(np.shares_memory(tc_cc.category, tc.category))
+        self.assertFalse(np.shares_memory(tc_cc.event_id, tc.event_id))
+        tc_cc.basin[0] = 'EP'
+        tc_cc.event_id[0] = 10
+        self.assertEqual(tc.basin[0], 'NA')
+        self.assertEqual(tc.event_id[0], 0)
+
+class TestImpactFromTracks(unittest.TestCase):
+    """Test impact computed directly from tropical cyclone tracks"""
+
+    def _input(self):
+        """Tracks, exposures and impact functions of Barbados"""
+        from climada.entity.exposures.base import Exposures
+        from climada.entity.impact_funcs.impact_func_set import ImpactFuncSet
+        from climada.entity.impact_funcs.trop_cyclone import IFTropCyclone
+        tc_track = TCTracks()
+        tc_track.read_processed_ibtracs_csv([TEST_TRACK, TEST_TRACK])
+        tc_track.data[1] = tc_track.data[1].copy(deep=True)
+        tc_track.data[1]['lon'] += 0.5
+        tc_track.equal_timestep()
+        exp = Exposures()
+        exp['latitude'] = CENTR_TEST_BRB.lat[::2] + 0.001
+        exp['longitude'] = CENTR_TEST_BRB.lon[::2]
+        exp['value'] = np.arange(1, exp.latitude.size + 1) * 1.0e6
+        exp['if_TC'] = 1
+        exp.value_unit = 'USD'
+        exp.check()
+        if_tc = IFTropCyclone()
+        if_tc.set_emanuel_usa()
+        if_set = ImpactFuncSet()
+        if_set.append(if_tc)
+        return tc_track, exp, if_set
+
+    def test_equal_calc_pass(self):
+        """Test results are equal to set_from_tracks and calc"""
+        from climada.engine.impact import Impact
+        tc_track, exp, if_set = self._input()
+        exp_tr = exp.copy()
+
+        tc_haz = TropCyclone()
+        tc_haz.set_from_tracks(tc_track, CENTR_TEST_BRB, ignore_distance_to_coast=True)
+        imp = Impact()
+        imp.calc(exp, if_set, tc_haz, save_mat=True)
+
+        haz_tr = TropCyclone()
+        imp_tr = haz_tr.calc_impact_from_tracks(tc_track, exp_tr, if_set,
+                                                centroids=CENTR_TEST_BRB,
+                                                ignore_distance_to_coast=True,
+                                                save_mat=True, store_intensity=True)
+        self.assertTrue(imp.aai_agg > 0)
+        self.assertAlmostEqual(imp_tr.aai_agg, imp.aai_agg)
+        self.assertAlmostEqual(imp_tr.tot_value, imp.tot_value)
+        self.assertTrue(np.allclose(imp_tr.at_event, imp.at_event))
+        self.assertTrue(np.allclose(imp_tr.eai_exp, imp.eai_exp))
+        self.assertTrue(np.allclose(imp_tr.frequency, imp.frequency))
+        self.assertTrue(np.array_equal(imp_tr.date, imp.date))
+        self.assertEqual(imp_tr.event_name, imp.event_name)
+        self.assertTrue(np.allclose(imp_tr.imp_mat.toarray(), imp.imp_mat.toarray()))
+
+        centr_exp = np.unique(exp_tr.centr_TC.values)
+        self.assertEqual(haz_tr.intensity.shape, tc_haz.intensity.shape)
+        self.assertTrue(np.allclose(haz_tr.intensity[:, centr_exp].toarray(),
+                                    tc_haz.intensity[:, centr_exp].toarray()))
+        self.assertEqual(haz_tr.intensity[:, np.setdiff1d(np.arange(CENTR_TEST_BRB.size),
+                                                          centr_exp)].nnz, 0)
+
+    def test_exposures_centroids_pass(self):
+        """Test impact in chunks without centroids and without intensity stored"""
+        tc_track, exp, if_set = self._input()
+        imp_all = TropCyclone().calc_impact_from_tracks(
+            tc_track, exp.copy(), if_set, ignore_distance_to_coast=True)
+
+        haz_tr = TropCyclone()
+        max_matrix_size = CONFIG['global']['max_matrix_size']
+        CONFIG['global']['max_matrix_size'] = exp.shape[0]
+        try:
+            imp_tr = haz_tr.calc_impact_from_tracks(tc_track, exp, if_set,
+                                                    ignore_distance_to_coast=True,
+                                                    save_mat=True)
+        finally:
+            CONFIG['global']['max_matrix_size'] = max_matrix_size
+        self.assertEqual(haz_tr.intensity.shape, (2, exp.shape[0]))
+        self.assertEqual(haz_tr.intensity.nnz, 0)
+        self.assertEqual(haz_tr.centroids.size, exp.shape[0])
+        self.assertTrue(np.array_equal(exp.centr_TC.values, np.arange(exp.shape[0])))
+        self.assertEqual(imp_tr.at_event.size, 2)
+        self.assertEqual(imp_tr.imp_mat.shape, (2, exp.shape[0]))
+        self.assertTrue(imp_tr.aai_agg > 0)
+        self.assertAlmostEqual(imp_tr.aai_agg, imp_tr.eai_exp.sum())
+        self.assertTrue(np.allclose(imp_tr.at_event, imp_all.at_event))
+        self.assertTrue(np.allclose(imp_tr.imp_mat.sum(axis=1).A1, imp_tr.at_event))
+
+    def test_pool_pass(self):
+        """Test windfields computed in parallel give the same impact"""
+        from pathos.pools import ProcessPool as Pool
+        tc_track, exp, if_set = self._input()
+        tc_track.data.append(tc_track.data[0].copy(deep=True))
+        tc_track.data[2]['lat'] += 40
+        imp_tr = TropCyclone().calc_impact_from_tracks(
+            tc_track, exp.copy(), if_set, CENTR_TEST_BRB,
+            ignore_distance_to_coast=True, save_mat=True)
+
+        pool = Pool(2)
+        imp_pool = TropCyclone(pool).calc_impact_from_tracks(
+            tc_track, exp.copy(), if_set, CENTR_TEST_BRB,
+            ignore_distance_to_coast=True, save_mat=True)
+        pool.close()
+        pool.join()
+        self.assertTrue(np.allclose(imp_tr.at_event, imp_pool.at_event))
+        self.assertTrue(np.allclose(imp_tr.eai_exp, imp_pool.eai_exp))
+        self.assertTrue(np.allclose(imp_tr.imp_mat.toarray(), imp_pool.imp_mat.toarray()))
+        self.assertEqual(imp_pool.at_event[2], 0)
+        self.assertTrue(imp_pool.at_event[0] > 0)
+
 if __name__ == "__main__":
     TESTS = unittest.TestLoader().loadTestsFromTestCase(TestReader)
     TESTS.addTests(unittest.TestLoader().loadTestsFromTestCase(TestModel))
     TESTS.addTests(unittest.TestLoader().loadTestsFromTestCase(TestClimateSce))
+    TESTS.addTests(unittest.TestLoader().loadTestsFromTestCase(TestImpactFromTracks))
     unittest.TextTestRunner(verbosity=2).run(TESTS)
@@ -34,10 +34,12 @@ from tqdm import tqdm
 from climada.hazard.base import Hazard
 from climada.hazard.tag import Tag as TagHazard
 from climada.hazard.tc_tracks import TCTracks, estimate_rmw
+from climada.hazard.tc_tracks_packed import PackedTracks
 from climada.hazard.tc_clim_change import get_knutson_criterion, calc_scale_knutson
 from climada.hazard.centroids.centr import Centroids
 from climada.util import ureg
-from climada.util.coordinates import dist_approx
+from climada.util.config import CONFIG
+from climada.util.coordinates import dist_approx, dist_to_coast
 import climada.util.plot as u_plot
 
 LOGGER = logging.getLogger(__name__)
@@ -102,7 +104,7 @@ class TropCyclone(Hazard):
 
     def set_from_tracks(self, tracks, centroids=None, description='',
                         model='H08', ignore_distance_to_coast=False,
-                        store_windfields=False):
+                        store_windfields=False, cache=None):
         """Clear and fill with windfields from specified tracks.
 
         Parameters:
@@ -119,6 +121,10 @@ class TropCyclone(Hazard):
                 are stored in a sparse matrix of shape
                 (npositions,  ncentroids * 2), that can be reshaped to a full
                 ndarray of shape (npositions, ncentroids, 2). Default: False.
+            cache (WindfieldCache, optional): on-disk cache of the intensity
+                of single tracks. Only tracks that are not yet in the cache
+                are computed. Ignored if store_windfields is True.
+                Default: None.
 
         Raises:
             ValueError
@@ -142,33 +148,228 @@ class TropCyclone(Hazard):
 
         LOGGER.info('Mapping %s tracks to %s centroids.', str(tracks.size),
                     str(coastal_idx.size))
+        if store_windfields:
+            cache = None
+        centr_key = cache.centroids_key(centroids, coastal_idx) if cache is not None else None
+
+        # tracks out of reach of all centroids are kept as events without
+        # intensity, so that they still count for the frequency
+        in_reach = tracks_in_reach(tracks.data, centroids.coord[coastal_idx])
+        LOGGER.info('%s tracks are out of reach of the centroids.',
+                    str(num_tracks - np.count_nonzero(in_reach)))
+        no_idx = np.array([], int)
+        tr_coastal_idx = [coastal_idx if reach else no_idx for reach in in_reach]
+        tr_cache = [cache if reach else None for reach in in_reach]
         if self.pool:
             chunksize = min(num_tracks // self.pool.ncpus, 1000)
             tc_haz = self.pool.map(
                 self._tc_from_track, tracks.data,
                 itertools.repeat(centroids, num_tracks),
-                itertools.repeat(coastal_idx, num_tracks),
+                tr_coastal_idx,
                 itertools.repeat(model, num_tracks),
                 itertools.repeat(store_windfields, num_tracks),
+                tr_cache,
+                itertools.repeat(centr_key, num_tracks),
                 chunksize=chunksize)
         else:
             last_perc = 0
             tc_haz = []
-            for track in tracks.data:
+            for track, track_idx, track_cache in zip(tracks.data, tr_coastal_idx,
+                                                     tr_cache):
                 perc = 100 * len(tc_haz) / len(tracks.data)
                 if perc - last_perc >= 10:
                     LOGGER.info("Progress: %d%%", perc)
                     last_perc = perc
                 tc_haz.append(
-                    self._tc_from_track(track, centroids, coastal_idx,
+                    self._tc_from_track(track, centroids, track_idx,
                                         model=model,
-                                        store_windfields=store_windfields))
+                                        store_windfields=store_windfields,
+                                        cache=track_cache, centr_key=centr_key))
+        if cache is not None:
+            cache.evict()
         LOGGER.debug('Append events.')
         self.concatenate(tc_haz)
         LOGGER.debug('Compute frequency.')
         self.frequency_from_tracks(tracks.data)
         self.tag.description = description
 
+    def calc_impact_from_tracks(self, tracks, exposures, impact_funcs, centroids=None,
+                                model='H08', ignore_distance_to_coast=False,
+                                save_mat=False, store_intensity=False):
+        """Fill with the events of specified tracks and compute their impact
+        to exposures, without keeping the intensity of all tracks in memory.
+
+        The windfield of each track is only computed at the centroids assigned
+        to exposures with positive value. Tracks are processed in chunks of
+        at most max_matrix_size (configuration) intensity values, the impact
+        of every chunk is computed with Impact.calc and accumulated.
+        The assignment of exposures and the selection of centroids is done
+        once for all tracks, e.g. all members of a forecast ensemble. If the
+        hazard or else the tracks have a pool, the windfields are computed in
+        parallel.
+
+        The impact is equal to set_from_tracks followed by Impact.calc if the
+        same centroids are given to both. Note that the default centroids
+        differ: here the exposures coordinates, in set_from_tracks global
+        centroids.
+
+        Parameters:
+            tracks (TCTracks): tracks of events
+            exposures (Exposures): exposures
+            impact_funcs (ImpactFuncSet): impact functions
+            centroids (Centroids, optional): centroids to which the exposures
+                are assigned. Default: exposures coordinates.
+            model (str, optional): model to compute gust. Default Holland2008.
+            ignore_distance_to_coast (boolean, optional): if True, centroids
+                far from coast are not ignored. Default False
+            save_mat (bool, optional): self impact matrix: events x exposures.
+                Default: False
+            store_intensity (bool, optional): if True, the intensity at the
+                centroids assigned to exposures is kept in the hazard,
+                otherwise the intensity is zero everywhere. Default: False
+
+        Returns:
+            Impact
+
+        Raises:
+            ValueError
+        """
+        from climada.engine.impact import Impact
+        from climada.entity.exposures.base import INDICATOR_CENTR
+        try:
+            mod_id = MODEL_VANG[model]
+        except KeyError:
+            LOGGER.error('Model not implemented: %s.', model)
+            raise ValueError
+
+        # hazard without intensity and assignment of exposures to centroids
+        if centroids is None:
+            centroids = Centroids()
+            centroids.set_lat_lon(exposures.latitude.values,
+                                  exposures.longitude.values, exposures.crs)
+        if not centroids.coord.size:
+            centroids.set_meta_to_lat_lon()
+        self.centroids = centroids
+        self.units = 'm/s'
+        self.event_id = np.arange(1, tracks.size + 1)
+        self.event_name = [track.sid for track in tracks.data]
+        self.date = np.array([
+            dt.datetime(track.time.dt.year.values[0],
+                        track.time.dt.month.values[0],
+                        track.time.dt.day.values[0]).toordinal()
+            for track in tracks.data], int)
+        self.orig = np.array([track.orig_event_flag for track in tracks.data], bool)
+        self.category = np.array([track.category for track in tracks.data], int)
+        self.basin = [track.basin for track in tracks.data]
+        self.frequency_from_tracks(tracks.data)
+        self.intensity = sparse.csr_matrix((tracks.size, centroids.size))
+        self.fraction = self.intensity.copy()
+
+        assign_haz = INDICATOR_CENTR + self.tag.haz_type
+        if assign_haz not in exposures:
+            exposures.assign_centroids(self)
+
+        # centroids where windfields are needed
+        exp_idx = ((exposures.value > 0) & (exposures[assign_haz] >= 0)).values
+        centr_idx = np.unique(exposures[assign_haz].values[exp_idx])
+        coastal = np.abs(centroids.lat[centr_idx]) < 61
+        if not ignore_distance_to_coast:
+            if centroids.dist_coast.size:
+                centr_dist = centroids.dist_coast[centr_idx]
+            else:
+                centr_dist = dist_to_coast(centroids.lat[centr_idx],
+                                           centroids.lon[centr_idx])
+            coastal &= centr_dist < INLAND_MAX_DIST_KM * 1000
+        centr_idx = centr_idx[coastal]
+        centr_coord = centroids.coord[centr_idx]
+        LOGGER.info('Mapping %s tracks to %s centroids of exposures.',
+                    str(tracks.size), str(centr_idx.size))
+
+        # windfields and impact of chunks of tracks
+        in_reach = tracks_in_reach(tracks.data, centr_coord)
+        ev_step = max(int(CONFIG['global']['max_matrix_size'] / max(centr_idx.size, 1)), 1)
+        imp_chunks, inten_chunks = [], []
+        for ev_start in range(0, tracks.size, ev_step):
+            ev_sel = slice(ev_start, ev_start + ev_step)
+            haz_chunk = self._tracks_intensity(tracks.data[ev_sel], in_reach[ev_sel],
+                                               centroids, centr_idx, mod_id,
+                                               self.pool or tracks.pool)
+            haz_chunk.frequency = self.frequency[ev_sel]
+            haz_chunk.event_id = self.event_id[ev_sel]
+            haz_chunk.event_name = self.event_name[ev_sel]
+            haz_chunk.date = self.date[ev_sel]
+            imp_chunk = Impact()
+            imp_chunk.calc(exposures, impact_funcs, haz_chunk, save_mat)
+            imp_chunks.append(imp_chunk)
+            if store_intensity:
+                inten_chunks.append(haz_chunk.intensity)
+
+        impact = Impact()
+        impact.unit = exposures.value_unit
+        impact.event_id = self.event_id
+        impact.event_name = self.event_name
+        impact.date = self.date
+        impact.coord_exp = np.stack([exposures.latitude.values,
+                                     exposures.longitude.values], axis=1)
+        impact.frequency = self.frequency
+        impact.tag = {'exp': exposures.tag, 'if_set': impact_funcs.tag,
+                      'haz': self.tag}
+        impact.crs = exposures.crs
+        impact.at_event = np.concatenate([np.zeros(0)]
+                                         + [imp.at_event for imp in imp_chunks])
+        impact.eai_exp = np.sum([np.zeros(exposures.value.size)]
+                                + [imp.eai_exp for imp in imp_chunks], axis=0)
+        impact.tot_value = imp_chunks[0].tot_value if imp_chunks else 0
+        impact.aai_agg = np.sum(impact.at_event * impact.frequency)
+        if save_mat:
+            impact.imp_mat = sparse.vstack(
+                [imp.imp_mat for imp in imp_chunks]
+                + [sparse.csr_matrix((0, exposures.value.size))], format='csr')
+
+        if store_intensity and inten_chunks:
+            self.intensity = sparse.vstack(inten_chunks, format='csr')
+            self.fraction = self.intensity.copy()
+            self.fraction.data.fill(1)
+        return impact
+
+    def _tracks_intensity(self, tracks, in_reach, centroids, centr_idx, mod_id, pool=None):
+        """Hazard with the intensity of tracks at selected centroids.
+
+        Parameters:
+            tracks (list(xr.Dataset)): tropical cyclone tracks
+            in_reach (np.array): whether each track can reach any centroid
+            centroids (Centroids): centroids of the hazard
+            centr_idx (np.array): indices of the centroids where the
+                intensity is computed
+            mod_id (int): windfield model id, see MODEL_VANG
+            pool (pathos.pool, optional): pool computing the windfields
+
+        Returns:
+            TropCyclone
+        """
+        num_tracks = len(tracks)
+        centr_coord = centroids.coord[centr_idx]
+        args = (tracks, in_reach, itertools.repeat(centr_coord, num_tracks),
+                itertools.repeat(mod_id, num_tracks),
+                itertools.repeat(self.intensity_thres, num_tracks))
+        if pool:
+            chunksize = max(min(num_tracks // pool.ncpus, 1000), 1)
+            inten_tracks = pool.map(_track_intensity, *args, chunksize=chunksize)
+        else:
+            inten_tracks = list(map(_track_intensity, *args))
+
+        inten = np.array(inten_tracks).reshape(num_tracks, centr_idx.size)
+        haz = TropCyclone()
+        haz.centroids = centroids
+        haz.intensity = sparse.csr_matrix(
+            (inten.reshape(-1), np.tile(centr_idx, num_tracks),
+             np.arange(num_tracks + 1) * centr_idx.size),
+            shape=(num_tracks, centroids.size))
+        haz.intensity.eliminate_zeros()
+        haz.fraction = haz.intensity.copy()
+        haz.fraction.data.fill(1)
+        return haz
+
     def set_climate_scenario_knu(self, ref_year=2050, rcp_scenario=45):
         """Compute future events for given RCP scenario and year. RCP 4.5
         from Knutson et al 2015.
@@ -186,6 +387,29 @@ class TropCyclone(Hazard):
         'from Knutson et al 2015.' % (str(ref_year), str(rcp_scenario))
         return haz_cc
 
+    def set_climate_scenarios_knu(self, ref_years=(2050,), rcp_scenarios=(45,)):
+        """Compute future events for every combination of given RCP scenarios
+        and years from Knutson et al 2015. The selection of events is done only
+        once. All the returned hazards share centroids and unchanged variables
+        with this hazard, so these should not be modified in place.
+        Parameters:
+            ref_years (list(int)): years between 2000 ad 2100. Default: [2050]
+            rcp_scenarios (list(int)): 26 for RCP 2.6, 45 for RCP 4.5,
+                60 for RCP 6.0 and 85 for RCP 8.5. Default: [45]
+        Returns:
+            dict((ref_year, rcp_scenario): TropCyclone)
+        """
+        chg_select = self._criterion_selection(get_knutson_criterion())
+        haz_sce = dict()
+        for rcp_scenario in rcp_scenarios:
+            for ref_year in ref_years:
+                scale = calc_scale_knutson(ref_year, rcp_scenario)
+                haz_cc = self._scale_variables(chg_select, scale, share=True)
+                haz_cc.tag.description = 'climate change scenario for year %s and RCP %s '\
+                'from Knutson et al 2015.' % (str(ref_year), str(rcp_scenario))
+                haz_sce[(ref_year, rcp_scenario)] = haz_cc
+        return haz_sce
+
     @staticmethod
     def video_intensity(track_name, tracks, centroids, file_name=None,
                         writer=animation.PillowWriter(bitrate=500),
@@ -271,19 +495,23 @@ class TropCyclone(Hazard):
         """Set hazard frequency from tracks data.
 
         Parameters:
-            tracks (list of xarray.Dataset)
+            tracks (list of xarray.Dataset or PackedTracks)
         """
         if not tracks:
             return
-        year_max = np.amax([t.time.dt.year.values.max() for t in tracks])
-        year_min = np.amin([t.time.dt.year.values.min() for t in tracks])
+        if isinstance(tracks, PackedTracks):
+            years = tracks.time.astype('datetime64[Y]').astype(int) + 1970
+            year_max, year_min = years.max(), years.min()
+        else:
+            year_max = np.amax([t.time.dt.year.values.max() for t in tracks])
+            year_min = np.amin([t.time.dt.year.values.min() for t in tracks])
         year_delta = year_max - year_min + 1
         num_orig = np.count_nonzero(self.orig)
         ens_size = (self.event_id.size / num_orig) if num_orig > 0 else 1
         self.frequency = np.ones(self.event_id.size) / (year_delta * ens_size)
 
     def _tc_from_track(self, track, centroids, coastal_idx, model='H08',
-                       store_windfields=False):
+                       store_windfields=False, cache=None, centr_key=None):
         """Generate windfield hazard from a single track dataset
 
         Parameters:
@@ -293,6 +521,10 @@ class TropCyclone(Hazard):
             model (str, optional): Windfield model. Default: H08.
             store_windfields (boolean, optional): If True, store windfields.
                 Default: False.
+            cache (WindfieldCache, optional): cache of track intensities.
+                Default: None.
+            centr_key (str, optional): hash of centroids and coastal_idx,
+                required if cache is provided. Default: None.
 
         Raises:
             ValueError, KeyError
@@ -306,22 +538,35 @@ class TropCyclone(Hazard):
             LOGGER.error('Model not implemented: %s.', model)
             raise ValueError
         ncentroids = centroids.coord.shape[0]
-        coastal_centr = centroids.coord[coastal_idx]
-        windfields = compute_windfields(track, coastal_centr, mod_id)
-        npositions = windfields.shape[0]
-        intensity = np.zeros(ncentroids)
-        intensity[coastal_idx] = np.linalg.norm(windfields, axis=-1)\
-                                                .max(axis=0)
-        intensity[intensity < self.intensity_thres] = 0
 
         new_haz = TropCyclone()
         new_haz.tag = TagHazard(HAZ_TYPE, 'Name: ' + track.name)
-        new_haz.intensity = sparse.csr_matrix(intensity.reshape(1, -1))
-        if store_windfields:
+        cache_key, cached = None, None
+        if cache is not None and not store_windfields:
+            cache_key = cache.track_key(track, centr_key, model, self.intensity_thres)
+            cached = cache.get(cache_key)
+        if cached is not None:
+            new_haz.intensity = cached
+        elif store_windfields:
+            coastal_centr = centroids.coord[coastal_idx]
+            windfields = compute_windfields(track, coastal_centr, mod_id)
+            npositions = windfields.shape[0]
+            intensity = np.zeros(ncentroids)
+            intensity[coastal_idx] = np.linalg.norm(windfields, axis=-1)\
+                                                    .max(axis=0)
+            intensity[intensity < self.intensity_thres] = 0
+            new_haz.intensity = sparse.csr_matrix(intensity.reshape(1, -1))
             wf_full = np.zeros((npositions, ncentroids, 2))
             wf_full[:, coastal_idx, :] = windfields
             new_haz.windfields = [
                 sparse.csr_matrix(wf_full.reshape(npositions, -1))]
+        else:
+            intensity = np.zeros(ncentroids)
+            intensity[coastal_idx] = compute_intensity(
+                track, centroids.coord[coastal_idx], mod_id, self.intensity_thres)
+            new_haz.intensity = sparse.csr_matrix(intensity.reshape(1, -1))
+            if cache_key:
+                cache.put(cache_key, new_haz.intensity)
         new_haz.units = 'm/s'
         new_haz.centroids = centroids
         new_haz.event_id = np.array([1])
@@ -331,9 +576,9 @@ class TropCyclone(Hazard):
         new_haz.fraction.data.fill(1)
         # store first day of track as date
         new_haz.date = np.array([
-            dt.datetime(track.time.dt.year[0],
-                        track.time.dt.month[0],
-                        track.time.dt.day[0]).toordinal()
+            dt.datetime(track.time.dt.year.values[0],
+                        track.time.dt.month.values[0],
+                        track.time.dt.day.values[0]).toordinal()
         ])
         new_haz.orig = np.array([track.orig_event_flag])
         new_haz.category = np.array([track.category])
@@ -348,26 +593,119 @@ class TropCyclone(Hazard):
         Returns:
             TropCyclone
         """
-        haz_cc = copy.deepcopy(self)
+        return self._scale_variables(self._criterion_selection(criterion), scale)
+
+    def _criterion_selection(self, criterion):
+        """Events selected by each change defined in criterion
+        Parameters:
+            criterion (list(dict)): list of criteria
+        Returns:
+            list((dict, np.array)): each change with its events mask
+        """
+        chg_select = list()
         for chg in criterion:
-            # filter criteria
-            select = np.ones(haz_cc.size, bool)
+            select = np.ones(self.size, bool)
             for var_name, cri_val in chg['criteria'].items():
-                var_val = getattr(haz_cc, var_name)
+                var_val = getattr(self, var_name)
                 if isinstance(var_val, list):
                     var_val = np.array(var_val)
-                tmp_select = np.logical_or.reduce([var_val == val for val in cri_val])
-                select = select & tmp_select
+                select &= np.isin(var_val, cri_val)
+            chg_select.append((chg, select))
+        return chg_select
+
+    def _scale_variables(self, chg_select, scale, share=False):
+        """Hazard with changed variables.
+        Parameters:
+            chg_select (list((dict, np.array))): output of _criterion_selection
+            scale (float): scale parameter because of chosen year and RCP
+            share (bool, optional): the new hazard shares all the attributes
+                but the changed variables (and the sparsity structure of the
+                intensity) with this hazard, instead of copies. Default: False
+        Returns:
+            TropCyclone
+        """
+        factors = dict()
+        for chg, select in chg_select:
             if chg['function'] == np.multiply:
                 change = 1 + (chg['change'] - 1) * scale
             elif chg['function'] == np.add:
                 change = chg['change'] * scale
             if select.any():
-                new_val = getattr(haz_cc, chg['variable'])
-                new_val[select] *= change
-                setattr(haz_cc, chg['variable'], new_val)
+                fact = factors.setdefault(chg['variable'], np.ones(self.size))
+                fact[select] *= change
+
+        haz_cc = copy.copy(self)
+        haz_cc.tag = copy.copy(self.tag)
+        if not share:
+            # the changed variables are replaced below, the pool is kept
+            for var_name, var_val in vars(self).items():
+                if var_name not in factors and var_name != 'pool':
+                    setattr(haz_cc, var_name, copy.deepcopy(var_val))
+        for var_name, fact in factors.items():
+            var_val = getattr(self, var_name)
+            if sparse.issparse(var_val):
+                # row scaling, with the sparsity structure of var_val
+                var_val = var_val.tocsr()
+                new_val = sparse.csr_matrix(
+                    (var_val.data * np.repeat(fact, np.diff(var_val.indptr)),
+                     var_val.indices, var_val.indptr), shape=var_val.shape,
+                    copy=not share)
+            else:
+                new_val = np.asarray(var_val) * fact
+            setattr(haz_cc, var_name, new_val)
         return haz_cc
 
+def compute_intensity(track, centroids, model, intensity_thres):
+    """Compute maximum 1-minute sustained winds (in m/s) along a track
+
+    Only centroids within the padded rectangular region around the track are
+    passed to `compute_windfields`, so that memory scales with the centroids
+    in reach of the track instead of all centroids.
+
+    Parameters:
+        track (xr.Dataset): track infomation
+        centroids (2d np.array): each row is a centroid [lat, lon]
+        model (int): Holland model selection according to MODEL_VANG
+        intensity_thres (float): winds below this value are set to 0
+
+    Returns:
+        np.array
+    """
+    intensity = np.zeros(centroids.shape[0])
+    t_lat, t_lon = track.lat.values, track.lon.values.copy()
+    if t_lon.size < 2:
+        return intensity
+
+    # same longitude normalization as in compute_windfields
+    t_lon[t_lon <= -180] += 360
+    if t_lon.min() > 180:
+        t_lon -= 360
+
+    close_idx = _close_centroids(t_lat, t_lon, centroids).nonzero()[0]
+    if close_idx.size == 0:
+        return intensity
+    windfields = compute_windfields(track, centroids[close_idx], model)
+    intensity[close_idx] = np.linalg.norm(windfields, axis=-1).max(axis=0)
+    intensity[intensity < intensity_thres] = 0
+    return intensity
+
+def _track_intensity(track, in_reach, centr_coord, mod_id, intensity_thres):
+    """Intensity of a track at given centroids, zero if out of reach.
+
+    Parameters:
+        track (xr.Dataset): single tropical cyclone track
+        in_reach (bool): whether the track can reach any centroid
+        centr_coord (np.array): centroids' coordinates [lat, lon]
+        mod_id (int): windfield model id, see MODEL_VANG
+        intensity_thres (float): intensity threshold
+
+    Returns:
+        np.array
+    """
+    if not in_reach:
+        return np.zeros(centr_coord.shape[0])
+    return compute_intensity(track, centr_coord, mod_id, intensity_thres)
+
 def compute_windfields(track, centroids, model):
     """Compute 1-minute sustained winds (in m/s) at 10 meters above ground
 
@@ -474,6 +812,84 @@ def compute_windfields(track, centroids, model):
     windfields[1:, track_centr_idx, :] = v_full
     return windfields
 
+def tracks_in_reach(tracks, centroids, deg_res=1.0):
+    """Determine which tracks can have windfields at any of the centroids
+
+    A track is out of reach if no centroid lies within the padded rectangular
+    region around the track that is used in `compute_windfields`. The test
+    is done for all tracks at once against a grid of centroid counts with
+    resolution deg_res. It is conservative: tracks close to the centroids
+    might be considered in reach even if no centroid is in the region.
+
+    Parameters:
+        tracks (list(xr.Dataset) or PackedTracks): tropical cyclone tracks
+        centroids (2d np.array): each row is a centroid [lat, lon]
+        deg_res (float, optional): grid resolution in degrees. Default: 1.
+
+    Returns:
+        np.array (mask)
+    """
+    if isinstance(tracks, PackedTracks):
+        sizes = tracks.sizes
+    else:
+        sizes = np.array([track.lat.size for track in tracks], int)
+    in_reach = np.zeros(sizes.size, bool)
+    # windfields are only computed for tracks with at least two nodes
+    valid = (sizes >= 2).nonzero()[0]
+    if not valid.size or not centroids.shape[0]:
+        return in_reach
+    if isinstance(tracks, PackedTracks):
+        valid_nodes = np.repeat(sizes >= 2, sizes)
+        t_lat = tracks.nodes['lat'][valid_nodes]
+        t_lon = tracks.nodes['lon'][valid_nodes]
+    else:
+        t_lat = np.concatenate([tracks[i].lat.values for i in valid])
+        t_lon = np.concatenate([tracks[i].lon.values for i in valid])
+    sizes = sizes[valid]
+    offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+
+    # same longitude normalization as in compute_windfields and _close_centroids
+    t_lon[t_lon <= -180] += 360
+    t_lon[np.repeat(np.minimum.reduceat(t_lon, offsets) > 180, sizes)] -= 360
+    cross = np.logical_or.reduceat(t_lon < -170, offsets) \
+            & np.logical_or.reduceat(t_lon > 170, offsets)
+    t_lon[np.repeat(cross, sizes) & (t_lon < 0)] += 360
+
+    lat_min = np.fmin.reduceat(t_lat, offsets) - CENTR_NODE_MAX_DIST_DEG
+    lat_max = np.fmax.reduceat(t_lat, offsets) + CENTR_NODE_MAX_DIST_DEG
+    lon_min = np.fmin.reduceat(t_lon, offsets) - CENTR_NODE_MAX_DIST_DEG
+    lon_max = np.fmax.reduceat(t_lon, offsets) + CENTR_NODE_MAX_DIST_DEG
+    # tracks without valid coordinates are not rejected
+    undef = np.isnan(lat_min) | np.isnan(lon_min)
+    for bound in [lat_min, lat_max, lon_min, lon_max]:
+        bound[undef] = 0
+
+    # summed area table of centroid counts on a global grid
+    n_lat, n_lon = int(np.ceil(180 / deg_res)), int(np.ceil(360 / deg_res))
+    c_row = np.clip(np.floor((centroids[:, 0] + 90) / deg_res), 0, n_lat - 1).astype(int)
+    c_col = np.floor(((centroids[:, 1] + 180) % 360) / deg_res).astype(int) % n_lon
+    counts = np.zeros((n_lat, n_lon))
+    np.add.at(counts, (c_row, c_col), 1)
+    sat = np.zeros((n_lat + 1, n_lon + 1))
+    sat[1:, 1:] = counts.cumsum(axis=0).cumsum(axis=1)
+
+    row_0 = np.clip(np.floor((lat_min + 90) / deg_res), 0, n_lat - 1).astype(int)
+    row_1 = np.clip(np.floor((lat_max + 90) / deg_res), 0, n_lat - 1).astype(int)
+    col_0 = np.floor((lon_min + 180) / deg_res).astype(int)
+    col_1 = np.floor((lon_max + 180) / deg_res).astype(int)
+    # longitude ranges exceeding the grid are split in two
+    col_1 = np.mod(col_0, n_lon) + np.fmin(col_1 - col_0, n_lon - 1)
+    col_0 = np.mod(col_0, n_lon)
+    col_1_a = np.fmin(col_1, n_lon - 1)
+    count = sat[row_1 + 1, col_1_a + 1] - sat[row_0, col_1_a + 1] \
+            - sat[row_1 + 1, col_0] + sat[row_0, col_0]
+    wrap = (col_1 >= n_lon).nonzero()[0]
+    col_1_b = col_1[wrap] - n_lon
+    count[wrap] += sat[row_1[wrap] + 1, col_1_b + 1] - sat[row_0[wrap], col_1_b + 1] \
+                   - sat[row_1[wrap] + 1, 0] + sat[row_0[wrap], 0]
+    in_reach[valid] = (count > 0) | undef
+    return in_reach
+
 def _close_centroids(t_lat, t_lon, centroids):
     """Choose centroids within padded rectangular region around track
 
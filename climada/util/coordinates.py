@@ -20,6 +20,7 @@ Define functions to handle with coordinates
 """
 
 import copy
+import hashlib
 import logging
 import math
 from multiprocessing import cpu_count
@@ -39,6 +40,7 @@ import rasterio.features
 import rasterio.mask
 import rasterio.warp
 import scipy.interpolate
+import scipy.ndimage
 from shapely.geometry import Polygon, MultiPolygon, Point, box
 import shapely.ops
 import shapely.vectorized
@@ -72,6 +74,12 @@ DEM_NODATA = -9999
 MAX_DEM_TILES_DOWN = 300
 """Maximum DEM tiles to dowload"""
 
+LAND_RASTER_RES = 0.05
+"""Default resolution in degrees of rasterized land geometries, see land_raster"""
+
+_LAND_RASTER_CACHE = dict()
+"""Rasters of the last land geometries, see land_raster"""
+
 def latlon_to_geosph_vector(lat, lon, rad=False, basis=False):
     """Convert lat/lon coodinates to radial vectors (on geosphere)
 
@@ -509,7 +517,44 @@ def get_land_geometry(country_names=None, extent=None, resolution=10):
         geom = MultiPolygon([geom])
     return geom
 
-def coord_on_land(lat, lon, land_geom=None):
+def land_raster(land_geom, res=LAND_RASTER_RES):
+    """Rasterize land geometry. Cells whose center is on land get value 1,
+    cells crossed by the coastline (or next to such cells) get 2 added. The
+    raster of the last land geometries is kept in memory.
+
+    Parameters:
+        land_geom (shapely.geometry.multipolygon.MultiPolygon): profiles of
+            land
+        res (float, optional): resolution in degrees. Default: LAND_RASTER_RES
+
+    Returns:
+        np.array (uint8), rasterio.Affine
+    """
+    # equal geometries share a raster, also when loaded again
+    key = (hashlib.sha1(land_geom.wkb).hexdigest(), res)
+    if key in _LAND_RASTER_CACHE:
+        return _LAND_RASTER_CACHE[key]
+
+    bounds = np.array(land_geom.bounds)
+    bounds[:2] = np.floor(bounds[:2] / res) * res - res
+    bounds[2:] = np.ceil(bounds[2:] / res) * res + res
+    width = int(round((bounds[2] - bounds[0]) / res))
+    height = int(round((bounds[3] - bounds[1]) / res))
+    transform = rasterio.Affine(res, 0, bounds[0], 0, -res, bounds[3])
+    raster = rasterio.features.rasterize([(land_geom, 1)], out_shape=(height, width),
+                                         transform=transform, dtype=np.uint8)
+    coast = rasterio.features.rasterize([(land_geom.boundary, 1)], out_shape=(height, width),
+                                        transform=transform, all_touched=True,
+                                        dtype=np.uint8).astype(bool)
+    coast = scipy.ndimage.binary_dilation(coast, structure=np.ones((3, 3), bool))
+    raster[coast] += 2
+
+    if len(_LAND_RASTER_CACHE) >= 4:
+        _LAND_RASTER_CACHE.pop(next(iter(_LAND_RASTER_CACHE)))
+    _LAND_RASTER_CACHE[key] = (raster, transform)
+    return raster, transform
+
+def coord_on_land(lat, lon, land_geom=None, raster_res=None, exact_coast=True):
     """Check if point is on land (True) or water (False) of provided coordinates.
     All globe considered if no input countries.
 
@@ -518,6 +563,12 @@ def coord_on_land(lat, lon, land_geom=None):
         lon (np.array): longitude of points in epsg:4326
         land_geom (shapely.geometry.multipolygon.MultiPolygon, optional):
             profiles of land.
+        raster_res (float, optional): if provided, look up points in a land
+            raster of this resolution in degrees (see `land_raster`) instead
+            of testing them against the polygons. Default: None
+        exact_coast (bool, optional): if raster_res is provided, test points
+            in raster cells at the coast against the polygons, which gives
+            the same result as without raster. Default: True
 
     Returns:
         np.array(bool)
@@ -534,7 +585,20 @@ def coord_on_land(lat, lon, land_geom=None):
                     np.min(lat) - delta_deg,
                     np.max(lat) + delta_deg),
             resolution=10)
-    return shapely.vectorized.contains(land_geom, lon, lat)
+    if raster_res is None:
+        return shapely.vectorized.contains(land_geom, lon, lat)
+
+    raster, transform = land_raster(land_geom, raster_res)
+    row = np.floor((transform.f - lat) / raster_res).astype(int)
+    col = np.floor((lon - transform.c) / raster_res).astype(int)
+    inside = (row >= 0) & (row < raster.shape[0]) & (col >= 0) & (col < raster.shape[1])
+    value = np.zeros(lat.shape, np.uint8)
+    value[inside] = raster[row[inside], col[inside]]
+    on_land = (value & 1).astype(bool)
+    if exact_coast:
+        coast = (value & 2).astype(bool)
+        on_land[coast] = shapely.vectorized.contains(land_geom, lon[coast], lat[coast])
+    return on_land
 
 def nat_earth_resolution(resolution):
     """Check if resolution is available in Natural Earth. Build string.
@@ -25,6 +25,7 @@ import geopandas as gpd
 import unittest
 import numpy as np
 import shapely
+import shapely.wkb
 import geopandas
 from shapely.geometry import box
 from rasterio.windows import Window
@@ -45,6 +46,7 @@ from climada.util.coordinates import convert_wgs_to_utm, \
                                      get_land_geometry, \
                                      get_resolution, \
                                      grid_is_regular, \
+                                     land_raster, \
                                      latlon_bounds, \
                                      latlon_to_geosph_vector, \
                                      lon_normalize, \
@@ -194,6 +196,30 @@ class TestFunc(unittest.TestCase):
         epsg = convert_wgs_to_utm(lon, lat)
         self.assertEqual(epsg, 32631)
 
+    def test_on_land_raster_pass(self):
+        """Test raster lookup of points on land gives polygon result"""
+        land_geom = shapely.geometry.MultiPolygon([
+            shapely.geometry.Point(-60, 15).buffer(3, resolution=64),
+            shapely.geometry.Polygon([(-80, 20), (-70, 25), (-75, 30), (-85, 28)]),
+            shapely.geometry.Point(-62.3, 13.1).buffer(0.02)])
+        raster, transform = land_raster(land_geom, 0.05)
+        self.assertEqual(raster.dtype, np.uint8)
+        self.assertEqual(transform.a, 0.05)
+        self.assertIs(land_raster(land_geom, 0.05)[0], raster)
+        self.assertIs(land_raster(shapely.wkb.loads(land_geom.wkb), 0.05)[0], raster)
+        self.assertIsNot(land_raster(land_geom.buffer(0.1), 0.05)[0], raster)
+        self.assertIsNot(land_raster(land_geom, 0.1)[0], raster)
+
+        rnd = np.random.RandomState(1)
+        lat = rnd.uniform(10, 32, 50000)
+        lon = rnd.uniform(-90, -55, 50000)
+        ref = coord_on_land(lat, lon, land_geom)
+        res = coord_on_land(lat, lon, land_geom, raster_res=0.05)
+        self.assertTrue(np.array_equal(res, ref))
+        self.assertTrue(0 < np.count_nonzero(ref) < ref.size)
+        res = coord_on_land(lat, lon, land_geom, raster_res=0.05, exact_coast=False)
+        self.assertLess(np.count_nonzero(res != ref), 0.01 * ref.size)
+
 class TestGetGeodata(unittest.TestCase):
     def test_nat_earth_resolution_pass(self):
         """Correct resolution."""